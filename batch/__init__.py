@@ -0,0 +1,21 @@
+__all__ = [
+    "Neighbourhood",
+    "extract",
+    "neighbourhood",
+    "open_model",
+    "read_ids",
+    "run",
+    "write_graphml",
+    "write_jsonl",
+]
+
+from .extract import (
+    Neighbourhood,
+    extract,
+    neighbourhood,
+    open_model,
+    read_ids,
+    run,
+    write_graphml,
+    write_jsonl,
+)
@@ -0,0 +1,298 @@
+import json
+import multiprocessing
+import sys
+import time
+import zipfile
+from collections import deque
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from itertools import islice
+from multiprocessing.pool import AsyncResult
+from pathlib import Path
+from typing import IO
+from xml.sax.saxutils import escape, quoteattr
+
+from loguru import logger
+
+import cgmes
+from cgmes.cache import DATABASE, SNAPSHOT
+from graphs.nx import NodeDetails, node_details
+
+# same as the explorer, per direction
+MAX_NODES = 100
+# identifiers sent to a worker process at once
+CHUNK = 64
+# chunks given to each worker process at once: identifiers are read as the
+# workers need them, rather than all of them first
+IN_FLIGHT = 2
+
+GRAPHML_KEYS = [
+    ("type", "node"),
+    ("name", "node"),
+    ("file", "node"),
+    ("properties", "node"),
+    ("relation", "edge"),
+]
+
+
+@dataclass
+class Node:
+    id: str
+    hops: int
+    type: str = ""
+    name: str = ""
+    file: str = ""
+    properties: dict = field(default_factory=dict)
+
+
+@dataclass
+class Edge:
+    source: str
+    target: str
+    relation: str
+
+
+@dataclass
+class Neighbourhood:
+    """
+    Elements within depth hops of id, following references both ways like
+    the explorer does, and the references between them. error is set, and
+    the rest left empty, when id is not in the model.
+    """
+
+    id: str
+    depth: int
+    nodes: list[Node] = field(default_factory=list)
+    edges: list[Edge] = field(default_factory=list)
+    error: str = ""
+
+
+def open_model(
+    path: Path | str,
+    workers: int = 1,
+    cache_dir: Path | str = "cache",
+    cache_size: int | None = None,
+    store: str = SNAPSHOT,
+) -> cgmes.Graph:
+    """
+    Model of a snapshot or database file as written to the cache, or of a zip
+    file or folder, loaded through the cache like the explorer does.
+    """
+    path = Path(path)
+    if path.suffix == f".{SNAPSHOT}":
+        return cgmes.load_snapshot(path)
+    if path.suffix == f".{DATABASE}":
+        return cgmes.load_database(path)
+    cache = cgmes.CacheManager(cache_dir, max_size=cache_size, store=store)
+    if zipfile.is_zipfile(path):
+        return cgmes.IncrementalModel(path, cache, workers).load()
+    return cache.load(path, workers=workers)
+
+
+def neighbourhood(
+    graph: cgmes.Graph, rdfid: str, depth: int, max_nodes: int = MAX_NODES
+) -> Neighbourhood:
+    """Neighbourhood of rdfid, with at most max_nodes nodes per direction."""
+    found = Neighbourhood(rdfid, depth)
+    if "rdf:type" not in graph.properties(":" + rdfid).props:
+        found.error = "unknown element"
+        return found
+
+    hops: dict[str, int] = {}
+    for direction in ("out", "in"):
+        reached = graph.neighbourhood(":" + rdfid, direction, depth, max_nodes)
+        for identifier, distance in reached.items():
+            id = identifier.split(":")[1]
+            hops[id] = min(distance, hops.get(id, distance))
+
+    properties = graph.properties_many([":" + id for id in hops])
+    for id, distance in hops.items():
+        node = properties[":" + id]
+        if "rdf:type" not in node.props:
+            # referenced but defined in no file of the model
+            found.nodes.append(Node(id, distance))
+            continue
+        details = node_details(graph, node)
+        found.nodes.append(_node(details, distance))
+        for relation, child in details.children:
+            target = child.split(":")[1]
+            if target in hops:
+                found.edges.append(Edge(id, target, relation))
+    return found
+
+
+def extract(
+    graph: cgmes.Graph,
+    rdfids: Iterable[str],
+    depth: int,
+    max_nodes: int = MAX_NODES,
+    workers: int = 1,
+) -> Iterator[Neighbourhood]:
+    """
+    Neighbourhood of each of rdfids, in their order, resolved by workers
+    processes. Workers are forked once graph is loaded, so that they share
+    it, and get rdfids in chunks as they are read, at most IN_FLIGHT chunks
+    per worker at a time: results are streamed, and rdfids read as they are
+    resolved, whatever their number.
+    """
+    resolve = partial(_resolve_chunk, depth=depth, max_nodes=max_nodes)
+    chunks = _chunks(rdfids, CHUNK)
+    if workers > 1 and "fork" not in multiprocessing.get_all_start_methods():
+        logger.warning("worker processes need fork, extracting from one process")
+        workers = 1
+    if workers == 1:
+        _init_worker(graph)
+        for chunk in chunks:
+            yield from resolve(chunk)
+        return
+
+    logger.info(f"extracting neighbourhoods with {workers} processes")
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers, _init_worker, (graph,)) as pool:
+        pending: deque[AsyncResult[list[Neighbourhood]]] = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(resolve, (chunk,)))
+            while pending and (
+                len(pending) >= IN_FLIGHT * workers or pending[0].ready()
+            ):
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def write_jsonl(neighbourhoods: Iterable[Neighbourhood], out: IO[str]) -> int:
+    """Write one JSON object per neighbourhood. The number written."""
+    count = 0
+    for found in neighbourhoods:
+        out.write(json.dumps(asdict(found), default=str) + "\n")
+        count += 1
+    return count
+
+
+def write_graphml(neighbourhoods: Iterable[Neighbourhood], out: IO[str]) -> int:
+    """
+    Write the union of neighbourhoods as one GraphML graph, each node and edge
+    once, as they come. Node properties are a JSON object. The number of
+    neighbourhoods written.
+    """
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    out.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+    for key, kind in GRAPHML_KEYS:
+        out.write(
+            f'  <key id="{key}" for="{kind}" attr.name="{key}" attr.type="string"/>\n'
+        )
+    out.write('  <graph id="neighbourhoods" edgedefault="directed">\n')
+
+    nodes: set[str] = set()
+    edges: set[tuple[str, str, str]] = set()
+    count = 0
+    for found in neighbourhoods:
+        count += 1
+        if found.error:
+            logger.warning(f"{found.id}: {found.error}")
+        for node in found.nodes:
+            if node.id in nodes:
+                continue
+            nodes.add(node.id)
+            values = {
+                "type": node.type,
+                "name": node.name,
+                "file": node.file,
+                "properties": json.dumps(node.properties, default=str),
+            }
+            out.write(f"    <node id={quoteattr(node.id)}>{_data(values)}</node>\n")
+        for edge in found.edges:
+            if (edge.source, edge.target, edge.relation) in edges:
+                continue
+            edges.add((edge.source, edge.target, edge.relation))
+            out.write(
+                f"    <edge source={quoteattr(edge.source)}"
+                f" target={quoteattr(edge.target)}>"
+                f"{_data({'relation': edge.relation})}</edge>\n"
+            )
+    out.write("  </graph>\n</graphml>\n")
+    return count
+
+
+FORMATS = {"jsonl": write_jsonl, "graphml": write_graphml}
+
+
+def run(
+    model: Path | str,
+    ids: Path | str,
+    output: Path | str | None = None,
+    depth: int = 2,
+    max_nodes: int = MAX_NODES,
+    format: str = "jsonl",
+    workers: int = 1,
+    cache_dir: Path | str = "cache",
+    cache_size: int | None = None,
+    store: str = SNAPSHOT,
+):
+    """
+    Write the neighbourhoods of the RDFIDs listed in ids ("-" for stdin) to
+    output (stdout by default), in format (see FORMATS), without the web
+    server. workers processes load the model then resolve neighbourhoods.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"unknown format {format}, expected one of {list(FORMATS)}")
+    graph = open_model(model, workers, cache_dir, cache_size, store)
+    start = time.perf_counter()
+    with ExitStack() as files:
+        source = sys.stdin if str(ids) == "-" else files.enter_context(open(ids))
+        out = sys.stdout if output is None else files.enter_context(open(output, "w"))
+        found = extract(graph, read_ids(source), depth, max_nodes, workers)
+        count = FORMATS[format](found, out)
+    seconds = time.perf_counter() - start
+    logger.info(
+        f"{count} neighbourhoods extracted in {seconds:.1f}s"
+        f" ({count / max(seconds, 1e-9):.0f}/s)"
+    )
+
+
+def read_ids(lines: Iterable[str]) -> Iterator[str]:
+    """RDFIDs of lines, one per line, skipping blank lines and # comments."""
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+_graph: cgmes.Graph | None = None
+
+
+def _init_worker(graph: cgmes.Graph):
+    global _graph
+    _graph = graph
+
+
+def _resolve_chunk(
+    rdfids: list[str], depth: int, max_nodes: int
+) -> list[Neighbourhood]:
+    assert _graph is not None
+    return [neighbourhood(_graph, rdfid, depth, max_nodes) for rdfid in rdfids]
+
+
+def _chunks(items: Iterable[str], size: int) -> Iterator[list[str]]:
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+def _node(details: NodeDetails, hops: int) -> Node:
+    return Node(
+        details.id,
+        hops,
+        details.type,
+        details.name,
+        details.file,
+        details.properties,
+    )
+
+
+def _data(values: dict[str, str]) -> str:
+    return "".join(
+        f'<data key="{key}">{escape(value)}</data>' for key, value in values.items()
+    )
@@ -0,0 +1,3 @@
+__all__ = ["write_model"]
+
+from .synthetic import write_model
@@ -0,0 +1,83 @@
+import argparse
+import sys
+
+from loguru import logger
+
+from bench import suite
+from bench.synthetic import write_model
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m bench", description="Benchmark loading and exploring models"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="write a synthetic CGMES zip")
+    generate.add_argument("file", help="zip file to write")
+    generate.add_argument("--size", type=int, default=100, help="number of substations")
+    generate.add_argument("--seed", type=int, default=0, help="random seed")
+
+    run = commands.add_parser("run", help="run the benchmarks and store results")
+    run.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="numbers of substations of the benchmarked models",
+    )
+    run.add_argument("--repeat", type=int, default=5, help="repetitions of each query")
+    run.add_argument(
+        "--load-repeat", type=int, default=1, help="repetitions of load_zip"
+    )
+    run.add_argument(
+        "--queries", type=int, default=suite.QUERIES, help="elements explored"
+    )
+    run.add_argument("--seed", type=int, default=0, help="random seed")
+    run.add_argument(
+        "--models", default=suite.MODELS_FOLDER, help="folder of generated models"
+    )
+    run.add_argument(
+        "--results", default=suite.RESULTS_FILE, help="JSON lines file of results"
+    )
+    run.add_argument(
+        "--no-store", action="store_true", help="do not append to the results file"
+    )
+    run.add_argument(
+        "--check",
+        action="store_true",
+        help="exit with an error if a benchmark regressed",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="WARNING",
+        help="level of the logs, kept low so that they do not weigh on timings",
+    )
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    if args.command == "generate":
+        write_model(args.file, args.size, args.seed)
+        sys.exit()
+
+    previous = suite.load_results(args.results)
+    results = suite.run(
+        args.sizes,
+        repeat=args.repeat,
+        load_repeat=args.load_repeat,
+        queries=args.queries,
+        seed=args.seed,
+        folder=args.models,
+    )
+    print(suite.report(results, previous))
+    if not args.no_store:
+        suite.store_results(results, args.results)
+
+    slower = suite.regressions(results, previous)
+    for result, before in slower:
+        print(
+            f"{result.benchmark} ({result.size} substations) regressed: "
+            f"{before.median:.3g}s at {before.commit or '?'} -> {result.median:.3g}s"
+        )
+    if args.check and slower:
+        sys.exit(1)
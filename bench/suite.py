@@ -0,0 +1,286 @@
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+import cgmes
+from bench.synthetic import write_model
+from graphs import Containment
+from graphs.layout import ALGORITHMS, Layouts
+from visu.default import (
+    load_aggregated,
+    load_elements,
+    max_nodes_one_way,
+    place,
+)
+from visu.sessions import Session
+
+RESULTS_FILE = Path(__file__).parent / "results.jsonl"
+MODELS_FOLDER = Path(__file__).parent / "models"
+# a benchmark regresses when its median gets slower than this ratio of the
+# last stored median for the same size
+REGRESSION = 1.2
+QUERIES = 20
+DEPTH = 3
+
+
+@dataclass
+class Result:
+    """Timing of one benchmark, in seconds per operation."""
+
+    benchmark: str
+    size: int
+    triples: int
+    operations: int
+    repeat: int
+    best: float
+    median: float
+    commit: str
+    python: str
+    timestamp: str
+
+
+def model(size: int, seed: int = 0, folder: Path | str = MODELS_FOLDER) -> Path:
+    """Synthetic model of size substations, generated on first use."""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / f"synthetic-{size}-{seed}.zip"
+    if not path.exists():
+        write_model(path.with_suffix(".tmp"), size, seed).rename(path)
+    return path
+
+
+def run(
+    sizes: Iterable[int],
+    repeat: int = 5,
+    load_repeat: int = 1,
+    queries: int = QUERIES,
+    seed: int = 0,
+    folder: Path | str = MODELS_FOLDER,
+) -> list[Result]:
+    """
+    Time loading and exploring synthetic models of each size.
+
+    :param load_repeat: repetitions of load_zip, which dominates the run time
+    :param queries: elements explored by the query benchmarks, picked at
+    random among the named elements
+    """
+    results = []
+    for size in sizes:
+        path = model(size, seed, folder)
+        logger.info(f"benchmarking {path}")
+        results += _run_model(path, size, repeat, load_repeat, queries, seed)
+    return results
+
+
+def _run_model(
+    path: Path, size: int, repeat: int, load_repeat: int, queries: int, seed: int
+) -> list[Result]:
+    measures: list[tuple[str, int, int, list[float]]] = []
+
+    def measure(name: str, operations: int, times: int, operation: Callable):
+        logger.info(f"{name}...")
+        seconds = []
+        for _ in range(times):
+            start = time.perf_counter()
+            operation()
+            seconds.append((time.perf_counter() - start) / operations)
+        measures.append((name, operations, times, seconds))
+
+    loaded: list[cgmes.Graph] = []
+    measure("load_zip", 1, load_repeat, lambda: loaded.append(cgmes.load_zip(path)))
+    graph = loaded[-1]
+    measure("elements", 1, repeat, graph.build_catalog)
+
+    rng = np.random.default_rng(seed)
+    catalog = graph.elements
+    picks = rng.choice(len(catalog), size=min(queries, len(catalog)), replace=False)
+    rdfids = [catalog[i].rdfid for i in picks.tolist()]
+
+    def cold(operation: Callable[[str], object]) -> Callable[[], None]:
+        def run_all():
+            graph.node_cache.clear()
+            for rdfid in rdfids:
+                operation(rdfid)
+
+        return run_all
+
+    measure(
+        "properties", len(rdfids), repeat, cold(lambda i: graph.properties(":" + i))
+    )
+    measure(
+        "ascendants",
+        len(rdfids),
+        repeat,
+        cold(lambda i: graph.ascendants(":" + i, DEPTH, max_nodes_one_way)),
+    )
+    measure(
+        "descendants",
+        len(rdfids),
+        repeat,
+        cold(lambda i: graph.descendants(":" + i, DEPTH, max_nodes_one_way)),
+    )
+    measure(
+        "load_elements",
+        len(rdfids),
+        repeat,
+        cold(lambda i: load_elements(graph, i, depth=DEPTH)),
+    )
+
+    built: list[Containment] = []
+    measure("containment", 1, repeat, lambda: built.append(Containment.build(graph)))
+    containment = built[-1]
+    measure(
+        "load_aggregated",
+        len(rdfids),
+        repeat,
+        cold(lambda i: load_aggregated(graph, containment, i, depth=DEPTH)),
+    )
+
+    explorations = [load_elements(graph, rdfid, depth=DEPTH) for rdfid in rdfids]
+    for algorithm in ALGORITHMS:
+        measure(
+            f"layout_{algorithm}",
+            len(explorations),
+            repeat,
+            lambda algorithm=algorithm: [
+                place(Layouts(), elements, algorithm, containment)
+                for elements in explorations
+            ],
+        )
+
+    sessions = []
+    for elements in explorations:
+        session = Session()
+        session.explore(elements)
+        sessions.append(session)
+
+    def hide_and_show():
+        # hide half of the types of each exploration, then show them again
+        for session in sessions:
+            types = session.types()
+            session.hidden_types = types[: len(types) // 2]
+            session.update_view()
+            session.hidden_types = []
+            session.update_view()
+
+    measure("hide_elements", 2 * len(sessions), repeat, hide_and_show)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = Path(tmp) / "model.snapshot"
+        measure(
+            "save_snapshot", 1, repeat, lambda: cgmes.save_snapshot(graph, snapshot)
+        )
+        measure("load_snapshot", 1, repeat, lambda: cgmes.load_snapshot(snapshot))
+
+        database = Path(tmp) / "model.database"
+
+        def load_database():
+            loaded = cgmes.load_zip(path, backend="sqlite", database=database)
+            cgmes.save_database(loaded, database)
+
+        measure("load_zip_database", 1, load_repeat, load_database)
+        measure("open_database", 1, repeat, lambda: cgmes.load_database(database))
+        stored = cgmes.load_database(database)
+
+        def properties_database():
+            stored.node_cache.clear()
+            for rdfid in rdfids:
+                stored.properties(":" + rdfid)
+
+        measure("properties_database", len(rdfids), repeat, properties_database)
+
+    assert graph.index is not None
+    triples = len(graph.index)
+    commit = _commit()
+    now = datetime.now().isoformat(timespec="seconds")
+    return [
+        Result(
+            benchmark=name,
+            size=size,
+            triples=triples,
+            operations=operations,
+            repeat=times,
+            best=min(seconds),
+            median=statistics.median(seconds),
+            commit=commit,
+            python=platform.python_version(),
+            timestamp=now,
+        )
+        for name, operations, times, seconds in measures
+    ]
+
+
+def load_results(path: Path | str = RESULTS_FILE) -> list[Result]:
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path) as f:
+        return [Result(**json.loads(line)) for line in f if line.strip()]
+
+
+def store_results(results: Iterable[Result], path: Path | str = RESULTS_FILE):
+    """Append results to the JSON lines of path."""
+    with open(path, "a") as f:
+        f.writelines(json.dumps(asdict(result)) + "\n" for result in results)
+
+
+def regressions(
+    results: Iterable[Result],
+    previous: Iterable[Result],
+    ratio: float = REGRESSION,
+) -> list[tuple[Result, Result]]:
+    """
+    (result, last previous result) pairs of the benchmarks whose median got
+    slower than ratio times the last previous one of the same size.
+    """
+    last = {(r.benchmark, r.size): r for r in previous}
+    slower = []
+    for result in results:
+        before = last.get((result.benchmark, result.size))
+        if before is not None and result.median > ratio * before.median:
+            slower.append((result, before))
+    return slower
+
+
+def report(results: Iterable[Result], previous: Iterable[Result] = ()) -> str:
+    last = {(r.benchmark, r.size): r for r in previous}
+    lines = [f"{'benchmark':<20}{'size':>8}{'triples':>12}{'median':>12}{'change':>10}"]
+    for r in results:
+        before = last.get((r.benchmark, r.size))
+        change = f"{r.median / before.median - 1:+.0%}" if before else ""
+        lines.append(
+            f"{r.benchmark:<20}{r.size:>8}{r.triples:>12}"
+            f"{_duration(r.median):>12}{change:>10}"
+        )
+    return "\n".join(lines)
+
+
+def _duration(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}us"
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
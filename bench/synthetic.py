@@ -0,0 +1,424 @@
+import io
+import random
+import uuid
+import zipfile
+from collections.abc import Iterator
+from pathlib import Path
+
+from loguru import logger
+
+CIM = "http://iec.ch/TC57/2013/CIM-schema-cim16#"
+MD = "http://iec.ch/TC57/61970-552/ModelDescription/1#"
+RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+PROFILES = {
+    "EQ": "http://entsoe.eu/CIM/EquipmentCore/3/1",
+    "TP": "http://entsoe.eu/CIM/Topology/4/1",
+    "SSH": "http://entsoe.eu/CIM/SteadyStateHypothesis/1/1",
+    "SV": "http://entsoe.eu/CIM/StateVariables/4/1",
+}
+VOLTAGES = (400.0, 225.0)
+# feeders of each voltage level, besides the busbar: loads and generators
+FEEDERS = (2, 6)
+OPEN_SWITCHES = 0.05
+# namespace of the generated rdfids, so that a given size and seed always
+# produce the same model
+ID_NAMESPACE = uuid.UUID("6f1c1f0e-4a43-4d8e-9a7c-3c5a0f2b7d11")
+
+
+def write_model(
+    path: Path | str, substations: int, seed: int = 0, name: str = "synthetic"
+) -> Path:
+    """
+    Write a synthetic CGMES model as a zip of EQ, TP, SSH and SV files.
+
+    Each substation has a voltage level per entry of VOLTAGES, linked by a
+    power transformer; each voltage level has a busbar and breaker bays
+    feeding loads and generators, and the first voltage levels of consecutive
+    substations are linked by lines, in a ring. A substation is about 90
+    objects and 500 triples, so sizes go from hundreds of objects (a few
+    substations) to millions (tens of thousands).
+
+    :param substations: size of the model
+    :param seed: drives the number of feeders, the open switches and the
+    values of the SSH and SV profiles
+    """
+    path = Path(path)
+    network = Network(substations, random.Random(seed))
+    logger.info(f"writing a model of {substations} substations to {path}")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for profile, body in (
+            ("EQ", network.eq),
+            ("TP", network.tp),
+            ("SSH", network.ssh),
+            ("SV", network.sv),
+        ):
+            member = f"{name}_{profile}.xml"
+            with (
+                archive.open(member, "w", force_zip64=True) as raw,
+                io.TextIOWrapper(raw, encoding="utf-8") as f,
+            ):
+                f.write(_header(profile, name))
+                f.writelines(body())
+                f.write("</rdf:RDF>\n")
+    return path
+
+
+def _header(profile: str, name: str) -> str:
+    depends = (
+        ""
+        if profile == "EQ"
+        else f'  <md:Model.DependentOn rdf:resource="urn:uuid:{_model_id(name, "EQ")}"/>\n'
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<rdf:RDF xmlns:cim="{CIM}" xmlns:md="{MD}" xmlns:rdf="{RDF}">\n'
+        f'<md:FullModel rdf:about="urn:uuid:{_model_id(name, profile)}">\n'
+        f"  <md:Model.profile>{PROFILES[profile]}</md:Model.profile>\n"
+        f"{depends}"
+        "</md:FullModel>\n"
+    )
+
+
+def _model_id(name: str, profile: str) -> uuid.UUID:
+    return uuid.uuid5(ID_NAMESPACE, f"{name}/{profile}")
+
+
+def _id(*parts) -> str:
+    return f"_{uuid.uuid5(ID_NAMESPACE, '/'.join(map(str, parts)))}"
+
+
+def _object(cls: str, rdfid: str, *properties: str, about: bool = False) -> str:
+    head = f'rdf:about="#{rdfid}"' if about else f'rdf:ID="{rdfid}"'
+    return f"<cim:{cls} {head}>\n{''.join(properties)}</cim:{cls}>\n"
+
+
+def _value(name: str, value) -> str:
+    return f"  <cim:{name}>{value}</cim:{name}>\n"
+
+
+def _ref(name: str, rdfid: str) -> str:
+    return f'  <cim:{name} rdf:resource="#{rdfid}"/>\n'
+
+
+def _named(name: str) -> str:
+    return _value("IdentifiedObject.name", name)
+
+
+class Network:
+    """
+    Identifiers and random draws of a synthetic model, so that the profiles
+    written one after another agree with each other.
+    """
+
+    def __init__(self, substations: int, rng: random.Random):
+        self.substations = substations
+        self.feeders = [
+            [rng.randint(*FEEDERS) for _ in VOLTAGES] for _ in range(substations)
+        ]
+        self.open = {
+            (s, v, f)
+            for s, counts in enumerate(self.feeders)
+            for v, count in enumerate(counts)
+            for f in range(count)
+            if rng.random() < OPEN_SWITCHES
+        }
+        self.rng = rng
+
+    def bays(self) -> Iterator[tuple[int, int, int]]:
+        """(substation, voltage level, feeder) of each breaker bay."""
+        for s, counts in enumerate(self.feeders):
+            for v, count in enumerate(counts):
+                for f in range(count):
+                    yield s, v, f
+
+    def line_bay(self, v: int, f: int) -> bool:
+        """Whether a bay feeds the lines of its substation, not a feeder."""
+        return f == 0 and v == 0 and self.substations > 1
+
+    def lines(self) -> Iterator[tuple[int, int]]:
+        """Substations linked by each line."""
+        if self.substations < 2:
+            return
+        for s in range(self.substations if self.substations > 2 else 1):
+            yield s, (s + 1) % self.substations
+
+    def eq(self) -> Iterator[str]:
+        yield _object("GeographicalRegion", _id("region"), _named("Region"))
+        yield _object(
+            "SubGeographicalRegion",
+            _id("subregion"),
+            _named("Subregion"),
+            _ref("SubGeographicalRegion.Region", _id("region")),
+        )
+        for v, voltage in enumerate(VOLTAGES):
+            yield _object(
+                "BaseVoltage",
+                _id("bv", v),
+                _named(f"{voltage:g} kV"),
+                _value("BaseVoltage.nominalVoltage", voltage),
+            )
+
+        for s in range(self.substations):
+            yield _object(
+                "Substation",
+                _id("ss", s),
+                _named(f"SS{s}"),
+                _ref("Substation.Region", _id("subregion")),
+            )
+            for v, voltage in enumerate(VOLTAGES):
+                yield from self._voltage_level(s, v, voltage)
+            yield from self._transformer(s)
+
+        for s, t in self.lines():
+            line = _id("line", s)
+            yield _object(
+                "ACLineSegment",
+                line,
+                _named(f"L{s}-{t}"),
+                _ref("ConductingEquipment.BaseVoltage", _id("bv", 0)),
+                _value("Conductor.length", 10 + s % 90),
+                _value("ACLineSegment.r", 0.01 * (1 + s % 7)),
+                _value("ACLineSegment.x", 0.1 * (1 + s % 7)),
+            )
+            yield _terminal(_id("line", s, "t", 0), line, 1, _id("cn", s, 0, "line"))
+            yield _terminal(_id("line", s, "t", 1), line, 2, _id("cn", t, 0, "line"))
+
+        for s, v, f in self.bays():
+            yield from self._bay(s, v, f)
+
+    def _voltage_level(self, s: int, v: int, voltage: float) -> Iterator[str]:
+        vl = _id("vl", s, v)
+        yield _object(
+            "VoltageLevel",
+            vl,
+            _named(f"SS{s} {voltage:g} kV"),
+            _ref("VoltageLevel.Substation", _id("ss", s)),
+            _ref("VoltageLevel.BaseVoltage", _id("bv", v)),
+        )
+        busbar = _id("cn", s, v, "busbar")
+        yield _object(
+            "ConnectivityNode",
+            busbar,
+            _named(f"SS{s} {voltage:g} kV busbar"),
+            _ref("ConnectivityNode.ConnectivityNodeContainer", vl),
+        )
+        yield _object(
+            "BusbarSection",
+            _id("bbs", s, v),
+            _named(f"SS{s} {voltage:g} kV BBS"),
+            _ref("Equipment.EquipmentContainer", vl),
+            _ref("ConductingEquipment.BaseVoltage", _id("bv", v)),
+        )
+        yield _terminal(_id("bbs", s, v, "t"), _id("bbs", s, v), 1, busbar)
+        if self.line_bay(v, 0):
+            # line ends, through a breaker bay like the other feeders
+            yield _object(
+                "ConnectivityNode",
+                _id("cn", s, v, "line"),
+                _named(f"SS{s} line"),
+                _ref("ConnectivityNode.ConnectivityNodeContainer", vl),
+            )
+
+    def _transformer(self, s: int) -> Iterator[str]:
+        transformer = _id("tr", s)
+        yield _object(
+            "PowerTransformer",
+            transformer,
+            _named(f"SS{s} TR"),
+            _ref("Equipment.EquipmentContainer", _id("ss", s)),
+        )
+        for v, voltage in enumerate(VOLTAGES):
+            terminal = _id("tr", s, "t", v)
+            yield _terminal(terminal, transformer, v + 1, _id("cn", s, v, "busbar"))
+            yield _object(
+                "PowerTransformerEnd",
+                _id("tr", s, "end", v),
+                _named(f"SS{s} TR {voltage:g} kV"),
+                _ref("PowerTransformerEnd.PowerTransformer", transformer),
+                _ref("TransformerEnd.Terminal", terminal),
+                _ref("TransformerEnd.BaseVoltage", _id("bv", v)),
+                _value("TransformerEnd.endNumber", v + 1),
+                _value("PowerTransformerEnd.ratedU", voltage),
+            )
+
+    def _bay(self, s: int, v: int, f: int) -> Iterator[str]:
+        vl = _id("vl", s, v)
+        bay = _id("bay", s, v, f)
+        feeder = _id("cn", s, v, f)
+        breaker = _id("br", s, v, f)
+        yield _object(
+            "Bay",
+            bay,
+            _named(f"SS{s} bay {v}.{f}"),
+            _ref("Bay.VoltageLevel", vl),
+        )
+        yield _object(
+            "Breaker",
+            breaker,
+            _named(f"SS{s} BR {v}.{f}"),
+            _ref("Equipment.EquipmentContainer", bay),
+            _ref("ConductingEquipment.BaseVoltage", _id("bv", v)),
+            _value("Switch.normalOpen", "false"),
+        )
+        yield _terminal(
+            _id("br", s, v, f, "t", 0), breaker, 1, _id("cn", s, v, "busbar")
+        )
+        if self.line_bay(v, f):
+            # the first bay feeds the lines of the substation
+            yield _terminal(
+                _id("br", s, v, f, "t", 1), breaker, 2, _id("cn", s, v, "line")
+            )
+            return
+        yield _terminal(_id("br", s, v, f, "t", 1), breaker, 2, feeder)
+        yield _object(
+            "ConnectivityNode",
+            feeder,
+            _named(f"SS{s} feeder {v}.{f}"),
+            _ref("ConnectivityNode.ConnectivityNodeContainer", vl),
+        )
+        equipment = _id("eq", s, v, f)
+        if f % 3 == 2:
+            unit = _id("gu", s, v, f)
+            yield _object(
+                "GeneratingUnit",
+                unit,
+                _named(f"SS{s} GU {v}.{f}"),
+                _ref("Equipment.EquipmentContainer", bay),
+                _value("GeneratingUnit.maxOperatingP", 500),
+                _value("GeneratingUnit.minOperatingP", 0),
+            )
+            yield _object(
+                "SynchronousMachine",
+                equipment,
+                _named(f"SS{s} GEN {v}.{f}"),
+                _ref("Equipment.EquipmentContainer", bay),
+                _ref("RotatingMachine.GeneratingUnit", unit),
+                _value("RotatingMachine.ratedS", 600),
+            )
+        else:
+            yield _object(
+                "EnergyConsumer",
+                equipment,
+                _named(f"SS{s} LOAD {v}.{f}"),
+                _ref("Equipment.EquipmentContainer", bay),
+                _ref("ConductingEquipment.BaseVoltage", _id("bv", v)),
+            )
+        yield _terminal(_id("eq", s, v, f, "t"), equipment, 1, feeder)
+
+    def terminals(self) -> Iterator[tuple[str, int, int]]:
+        """(terminal, substation, voltage level) of each terminal."""
+        for s in range(self.substations):
+            for v in range(len(VOLTAGES)):
+                yield _id("bbs", s, v, "t"), s, v
+                yield _id("tr", s, "t", v), s, v
+        for s, t in self.lines():
+            yield _id("line", s, "t", 0), s, 0
+            yield _id("line", s, "t", 1), t, 0
+        for s, v, f in self.bays():
+            yield _id("br", s, v, f, "t", 0), s, v
+            yield _id("br", s, v, f, "t", 1), s, v
+            if not self.line_bay(v, f):
+                yield _id("eq", s, v, f, "t"), s, v
+
+    def tp(self) -> Iterator[str]:
+        # a topological node per voltage level, merging all its nodes
+        for s in range(self.substations):
+            for v, voltage in enumerate(VOLTAGES):
+                yield _object(
+                    "TopologicalNode",
+                    _id("tn", s, v),
+                    _named(f"SS{s} {voltage:g} kV TN"),
+                    _ref("TopologicalNode.ConnectivityNodeContainer", _id("vl", s, v)),
+                    _ref("TopologicalNode.BaseVoltage", _id("bv", v)),
+                )
+                nodes = [_id("cn", s, v, "busbar")]
+                if self.line_bay(v, 0):
+                    nodes.append(_id("cn", s, v, "line"))
+                nodes += [
+                    _id("cn", s, v, f)
+                    for f in range(self.feeders[s][v])
+                    if not self.line_bay(v, f)
+                ]
+                for node in nodes:
+                    yield _object(
+                        "ConnectivityNode",
+                        node,
+                        _ref("ConnectivityNode.TopologicalNode", _id("tn", s, v)),
+                        about=True,
+                    )
+        for terminal, s, v in self.terminals():
+            yield _object(
+                "Terminal",
+                terminal,
+                _ref("Terminal.TopologicalNode", _id("tn", s, v)),
+                about=True,
+            )
+
+    def ssh(self) -> Iterator[str]:
+        for terminal, _, _ in self.terminals():
+            yield _object(
+                "Terminal",
+                terminal,
+                _value("ACDCTerminal.connected", "true"),
+                about=True,
+            )
+        for s, v, f in self.bays():
+            is_open = "true" if (s, v, f) in self.open else "false"
+            yield _object(
+                "Breaker",
+                _id("br", s, v, f),
+                _value("Switch.open", is_open),
+                about=True,
+            )
+            if self.line_bay(v, f):
+                continue
+            if f % 3 == 2:
+                yield _object(
+                    "SynchronousMachine",
+                    _id("eq", s, v, f),
+                    _value("RotatingMachine.p", round(self.rng.uniform(-500, 0), 2)),
+                    _value("RotatingMachine.q", round(self.rng.uniform(-50, 50), 2)),
+                    about=True,
+                )
+            else:
+                yield _object(
+                    "EnergyConsumer",
+                    _id("eq", s, v, f),
+                    _value("EnergyConsumer.p", round(self.rng.uniform(0, 100), 2)),
+                    _value("EnergyConsumer.q", round(self.rng.uniform(0, 20), 2)),
+                    about=True,
+                )
+
+    def sv(self) -> Iterator[str]:
+        for s in range(self.substations):
+            for v, voltage in enumerate(VOLTAGES):
+                yield _object(
+                    "SvVoltage",
+                    _id("sv", s, v),
+                    _value(
+                        "SvVoltage.v", round(voltage * self.rng.uniform(0.95, 1.05), 3)
+                    ),
+                    _value("SvVoltage.angle", round(self.rng.uniform(-30, 30), 3)),
+                    _ref("SvVoltage.TopologicalNode", _id("tn", s, v)),
+                )
+        for s, v, f in self.bays():
+            if self.line_bay(v, f):
+                continue
+            yield _object(
+                "SvPowerFlow",
+                _id("svpf", s, v, f),
+                _value("SvPowerFlow.p", round(self.rng.uniform(-500, 100), 2)),
+                _value("SvPowerFlow.q", round(self.rng.uniform(-50, 50), 2)),
+                _ref("SvPowerFlow.Terminal", _id("eq", s, v, f, "t")),
+            )
+
+
+def _terminal(rdfid: str, equipment: str, number: int, node: str) -> str:
+    return _object(
+        "Terminal",
+        rdfid,
+        _named(f"T{number}"),
+        _ref("Terminal.ConductingEquipment", equipment),
+        _ref("Terminal.ConnectivityNode", node),
+        _value("ACDCTerminal.sequenceNumber", number),
+    )
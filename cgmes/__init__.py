@@ -1,3 +1,23 @@
-__all__ = ["load_folder", "load_zip", "Graph"]
+__all__ = [
+    "load_folder",
+    "load_zip",
+    "Graph",
+    "CacheManager",
+    "Progress",
+    "load_snapshot",
+    "save_snapshot",
+    "snapshot_is_current",
+    "load_database",
+    "save_database",
+    "database_is_current",
+    "Workspace",
+    "IncrementalModel",
+]
 
 from .explorer import load_folder, load_zip, Graph
+from .cache import CacheManager
+from .progress import Progress
+from .snapshot import load_snapshot, save_snapshot, snapshot_is_current
+from .database import load_database, save_database, database_is_current
+from .workspace import Workspace
+from .incremental import IncrementalModel
@@ -0,0 +1,428 @@
+import hashlib
+import json
+import os
+import sys
+import time
+import zipfile
+from collections.abc import Callable, Collection, Mapping
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import IO
+
+from loguru import logger
+
+from .database import database_is_current, load_database, save_database
+from .explorer import Graph, load_folder, load_zip
+from .progress import Progress
+from .snapshot import load_snapshot, save_snapshot, snapshot_is_current
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+INDEX_FILE = "index.json"
+SNAPSHOT = "snapshot"
+DATABASE = "database"
+STORES = (SNAPSHOT, DATABASE)
+
+
+class CacheManager:
+    """
+    Snapshots of loaded models, stored in folder.
+
+    Sources are identified by (path, size, mtime): their content hash, which
+    names the snapshot, is only recomputed when that key changes and is kept in
+    the index.json sidecar, together with the last use of each snapshot and
+    hit/miss statistics. Least recently used snapshots are evicted once the
+    folder holds more than max_size bytes.
+
+    Models are stored as memory-mapped snapshots or, with store="database",
+    as SQLite databases (see SQLiteIndex) into which they are streamed while
+    loading, for models that do not fit in memory.
+    """
+
+    def __init__(
+        self,
+        folder: Path | str = "cache",
+        max_size: int | None = None,
+        store: str = SNAPSHOT,
+    ):
+        if store not in STORES:
+            raise ValueError(f"unknown store {store}, expected one of {STORES}")
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.store = store
+
+    def load(
+        self,
+        source: Path | str,
+        workers: int = 1,
+        progress: Progress | None = None,
+        include: Collection[str] | None = None,
+    ) -> Graph:
+        """
+        :param progress: receives the "checksum" stage, then either "open
+        <store>" or the stages of loading source and "save <store>"
+        :param include: names of the files of source to load, all by default;
+        each selection of files is cached separately
+        """
+        progress = progress or Progress()
+        source = Path(source)
+        self._remove_stale()
+        with progress.stage("checksum"):
+            key = self.content_hash(source)
+            if include is not None:
+                selection = "\0".join(sorted(include)).encode()
+                key += "-" + hashlib.md5(selection).hexdigest()[:12]
+            snapshot = self.folder / f"{key}.{self.store}"
+
+        if not self._is_current(snapshot):
+            with _lock(snapshot.with_suffix(".lock")):
+                # another process may have built it while we were waiting
+                if not self._is_current(snapshot):
+                    return self._build(source, snapshot, workers, progress, include)
+
+        start = time.perf_counter()
+        with progress.stage(f"open {self.store}"):
+            graph = self._open(snapshot)
+        self._record(snapshot, True, time.perf_counter() - start)
+        return graph
+
+    def load_members(
+        self,
+        source: Path | str,
+        workers: int = 1,
+        progress: Progress | None = None,
+        include: Collection[str] | None = None,
+        loaded: Mapping[str, Graph] | None = None,
+    ) -> dict[str, Graph]:
+        """
+        Graph of each member of the zip file source, by member key (see
+        member_key): members of loaded are reused, the others are opened from
+        the cache or, when they changed, parsed in parallel and cached. The keys
+        come from the zip directory, so nothing is read to find the members
+        that did not change.
+
+        :param progress: receives "open <member>" or "parse <member>" stages
+        :param include: names of the members to load, all by default
+        """
+        progress = progress or Progress()
+        source = Path(source)
+        loaded = loaded or {}
+        self._remove_stale()
+        keys = member_keys(source, include)
+        snapshots = {
+            key: self.folder / f"{key}.{self.store}"
+            for key in keys.values()
+            if key not in loaded
+        }
+        stale = [
+            member
+            for member, key in keys.items()
+            if key in snapshots and not self._is_current(snapshots[key])
+        ]
+        for member, key in keys.items():
+            if key in snapshots:
+                progress.add(f"parse {member}" if member in stale else f"open {member}")
+
+        with ExitStack() as locks:
+            # locks are taken in a fixed order, so that processes loading the
+            # same members cannot deadlock
+            for member in sorted(stale, key=keys.__getitem__):
+                locks.enter_context(_lock(snapshots[keys[member]].with_suffix(".lock")))
+            # another process may have built some while we were waiting
+            stale = [m for m in stale if not self._is_current(snapshots[keys[m]])]
+            if stale:
+                self._build_members(source, stale, keys, snapshots, workers, progress)
+
+        graphs = {}
+        for member, key in keys.items():
+            if key in loaded:
+                graphs[key] = loaded[key]
+            elif member in stale:
+                graphs[key] = self._open(snapshots[key])
+            else:
+                start = time.perf_counter()
+                with progress.stage(f"open {member}"):
+                    graphs[key] = self._open(snapshots[key])
+                self._record(snapshots[key], True, time.perf_counter() - start)
+        if stale:
+            # after all the members are open, none of them being evicted
+            self._evict(
+                keep=[self.folder / f"{key}.{self.store}" for key in keys.values()]
+            )
+        return graphs
+
+    def _build_members(
+        self,
+        source: Path,
+        members: list[str],
+        keys: dict[str, str],
+        snapshots: dict[str, Path],
+        workers: int,
+        progress: Progress,
+    ):
+        logger.info(f"{len(members)} changed member(s) in {source}")
+        start = time.perf_counter()
+        workers = max(1, min(workers, len(members)))
+        if workers == 1:
+            for member in members:
+                with progress.stage(f"parse {member}"):
+                    _store(source, snapshots[keys[member]], self.store, [member])
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                futures = []
+                for member in members:
+                    progress.start(f"parse {member}")
+                    future = pool.submit(
+                        _store, source, snapshots[keys[member]], self.store, [member]
+                    )
+                    future.add_done_callback(_report(progress, f"parse {member}"))
+                    futures.append(future)
+                for future in futures:
+                    future.result()
+
+        seconds = (time.perf_counter() - start) / len(members)
+        for member in members:
+            self._record(snapshots[keys[member]], False, seconds)
+
+    def content_hash(self, source: Path) -> str:
+        key = _stat_key(source)
+        entry = self._read_index()["sources"].get(str(source.absolute()))
+        if entry and entry["key"] == key:
+            return entry["hash"]
+
+        logger.info(f"computing checksum of {source}")
+        checksum = _md5(source)
+
+        def update(index: dict):
+            index["sources"][str(source.absolute())] = {"key": key, "hash": checksum}
+
+        self._update_index(update)
+        return checksum
+
+    def stats(self) -> dict:
+        return self._read_index()["stats"]
+
+    def _build(
+        self,
+        source: Path,
+        snapshot: Path,
+        workers: int,
+        progress: Progress,
+        include: Collection[str] | None,
+    ) -> Graph:
+        start = time.perf_counter()
+        graph = _load_source(source, snapshot, self.store, include, workers, progress)
+        logger.info("saving to cache")
+        with progress.stage(f"save {self.store}"):
+            _save(graph, snapshot, self.store)
+        self._record(snapshot, False, time.perf_counter() - start)
+        self._evict(keep=[snapshot])
+        return self._open(snapshot)
+
+    def _is_current(self, snapshot: Path) -> bool:
+        if self.store == DATABASE:
+            return database_is_current(snapshot)
+        return snapshot_is_current(snapshot)
+
+    def _open(self, snapshot: Path) -> Graph:
+        if self.store == DATABASE:
+            return load_database(snapshot)
+        return load_snapshot(snapshot)
+
+    def _record(self, snapshot: Path, hit: bool, seconds: float):
+        outcome = "hits" if hit else "misses"
+
+        def update(index: dict):
+            stats = index["stats"]
+            stats[outcome] = stats.get(outcome, 0) + 1
+            stats[f"{outcome}_seconds"] = stats.get(f"{outcome}_seconds", 0) + seconds
+            index["entries"][snapshot.name] = {
+                "size": snapshot.stat().st_size,
+                "last_used": time.time(),
+            }
+
+        stats = self._update_index(update)["stats"]
+        logger.info(
+            f"cache {'hit' if hit else 'miss'}, loaded in {seconds:.2f}s"
+            f" ({stats.get('hits', 0)} hits, {stats.get('misses', 0)} misses)"
+        )
+
+    def _evict(self, keep: Collection[Path]):
+        if self.max_size is None:
+            return
+
+        def update(index: dict):
+            entries = index["entries"]
+            for name in list(entries):
+                if not (self.folder / name).exists():
+                    del entries[name]
+
+            total = sum(entry["size"] for entry in entries.values())
+            by_age = sorted(entries, key=lambda name: entries[name]["last_used"])
+            for name in by_age:
+                if total <= self.max_size:
+                    break
+                if name in {path.name for path in keep}:
+                    continue
+                logger.info(f"evicting {name} from cache")
+                (self.folder / name).unlink(missing_ok=True)
+                _remove_lock((self.folder / name).with_suffix(".lock"))
+                total -= entries.pop(name)["size"]
+
+        self._update_index(update)
+
+    def _remove_stale(self):
+        for stale in self.folder.glob("*.pickle"):
+            logger.warning(f"removing {stale}, pickled graphs are not used anymore")
+            stale.unlink(missing_ok=True)
+
+    def _read_index(self) -> dict:
+        index: dict = {"sources": {}, "entries": {}, "stats": {}}
+        try:
+            with open(self.folder / INDEX_FILE) as f:
+                index |= json.load(f)
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            logger.warning(f"ignoring corrupted {self.folder / INDEX_FILE}")
+        return index
+
+    def _update_index(self, update: Callable[[dict], None]) -> dict:
+        with _lock(self.folder / f"{INDEX_FILE}.lock"):
+            index = self._read_index()
+            update(index)
+            tmp = self.folder / f"{INDEX_FILE}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(index, f, indent=1)
+            os.replace(tmp, self.folder / INDEX_FILE)
+        return index
+
+
+@contextmanager
+def _lock(path: Path):
+    """
+    Exclusive lock between processes on path. The kernel releases it when the
+    process holding it exits, crashed or killed included, so that no lock is
+    ever left over. path is recreated if it was removed (see _remove_lock)
+    while we were waiting for it.
+    """
+    while True:
+        with open(path, "a+b") as f:
+            if not _try_lock(f):
+                logger.info(f"waiting for {path}")
+                while not _try_lock(f):
+                    time.sleep(0.1)
+            if os.fstat(f.fileno()).st_nlink > 0:
+                yield
+                return
+
+
+def _try_lock(f: IO[bytes]) -> bool:
+    try:
+        if sys.platform == "win32":
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def _remove_lock(path: Path):
+    """Remove the lock file path of an evicted snapshot, unless it is in use."""
+    try:
+        with open(path, "rb") as f:
+            if _try_lock(f):
+                path.unlink()
+    except OSError:
+        # missing, or still open elsewhere on Windows: left in place
+        pass
+
+
+def member_key(info: zipfile.ZipInfo) -> str:
+    """
+    Cache key of a zip member: its name, CRC32 and size, as stored in the zip
+    directory. The name of the zip is left out, so that a member keeps its key
+    in the next versions of the zip as long as it does not change.
+    """
+    key = f"{info.filename}\0{info.CRC:08x}\0{info.file_size}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def member_keys(
+    source: Path | str, include: Collection[str] | None = None
+) -> dict[str, str]:
+    """Keys of the members of the zip file source, by name."""
+    with zipfile.ZipFile(source) as archive:
+        return {
+            info.filename: member_key(info)
+            for info in archive.infolist()
+            if include is None or info.filename in include
+        }
+
+
+def _load_source(
+    source: Path,
+    snapshot: Path,
+    store: str,
+    include: Collection[str] | None,
+    workers: int = 1,
+    progress: Progress | None = None,
+) -> Graph:
+    options: dict = {"include": include, "workers": workers, "progress": progress}
+    if store == DATABASE:
+        # a database is filled while the model loads, a snapshot written after
+        options |= {"backend": "sqlite", "database": snapshot}
+    if source.is_dir():
+        logger.info("loading folder")
+        return load_folder(source, **options)
+    logger.info("loading zip")
+    return load_zip(source, **options)
+
+
+def _save(graph: Graph, snapshot: Path, store: str):
+    if store == DATABASE:
+        save_database(graph, snapshot)
+    else:
+        save_snapshot(graph, snapshot)
+
+
+def _store(source: Path, snapshot: Path, store: str, include: Collection[str]):
+    """Load the files include of source into snapshot, in a worker process."""
+    _save(_load_source(source, snapshot, store, include), snapshot, store)
+
+
+def _report(progress: Progress, stage: str) -> Callable[[Future], None]:
+    def report(future: Future):
+        if future.exception() is None:
+            progress.done(stage)
+        else:
+            progress.fail(stage, str(future.exception()))
+
+    return report
+
+
+def _files(source: Path) -> list[Path]:
+    if source.is_dir():
+        return sorted(source.glob("*.xml"))
+    return [source]
+
+
+def _stat_key(source: Path) -> list:
+    return [[f.name, f.stat().st_size, f.stat().st_mtime_ns] for f in _files(source)]
+
+
+def _md5(source: Path) -> str:
+    hash_md5 = hashlib.md5()
+    for f in _files(source):
+        if source.is_dir():
+            hash_md5.update(f.name.encode())
+        with open(f, "rb") as content:
+            for chunk in iter(lambda: content.read(1 << 20), b""):
+                hash_md5.update(chunk)
+    return hash_md5.hexdigest()
@@ -0,0 +1,114 @@
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from typing import overload
+
+import numpy as np
+from loguru import logger
+from numpy.random import randint
+
+from .terms import StringArray
+
+Row = tuple[str, str, str, int]
+
+
+@dataclass
+class Element:
+    rdfid: str
+    cim_type: str
+    name: str
+
+
+class Catalog(Sequence[Element]):
+    """
+    Named elements of a model, stored by column: RDFIDs and names as packed
+    strings, CIM types as codes into types and source files as indexes into
+    Graph.filenames.
+    """
+
+    def __init__(
+        self,
+        ids: StringArray,
+        names: StringArray,
+        types: list[str],
+        type_codes: np.ndarray,
+        file_codes: np.ndarray,
+    ):
+        self.ids = ids
+        self.names = names
+        self.types = types
+        self.type_codes = type_codes
+        self.file_codes = file_codes
+
+    @classmethod
+    def build(cls, rows: Iterable[Row]) -> "Catalog":
+        """rows are (rdfid, cim type, name, file index) tuples"""
+        logger.info("loading elements...")
+        ids, names, type_codes, file_codes = [], [], [], []
+        types: dict[str, int] = {}
+        for rdfid, cim_type, name, file in rows:
+            ids.append(rdfid)
+            names.append(name)
+            type_codes.append(types.setdefault(cim_type, len(types)))
+            file_codes.append(file)
+
+        catalog = cls(
+            StringArray.from_strings(ids),
+            StringArray.from_strings(names),
+            list(types),
+            np.array(type_codes, dtype=np.int32),
+            np.array(file_codes, dtype=np.int32),
+        )
+        logger.info(f"{len(catalog)} elements loaded")
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self.type_codes)
+
+    @overload
+    def __getitem__(self, i: int) -> Element: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[Element]: ...
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return Element(self.ids[i], self.types[self.type_codes[i]], self.names[i])
+
+    def rows(self) -> Iterator[Row]:
+        """(rdfid, cim type, name, file index) of each element, as given to build."""
+        for i in range(len(self)):
+            element = self[i]
+            yield element.rdfid, element.cim_type, element.name, int(self.file_codes[i])
+
+    def type_code(self, cim_type: str) -> int | None:
+        try:
+            return self.types.index(cim_type)
+        except ValueError:
+            return None
+
+    def count_by_type(self) -> dict[str, int]:
+        counts = np.bincount(self.type_codes, minlength=len(self.types))
+        return dict(zip(self.types, counts.tolist()))
+
+    def filter(
+        self, cim_type: str | None = None, file: int | None = None
+    ) -> np.ndarray:
+        """Boolean mask of the elements of the given CIM type and file index."""
+        mask = np.ones(len(self), dtype=bool)
+        if cim_type is not None:
+            mask &= self.type_codes == self.type_code(cim_type)
+        if file is not None:
+            mask &= self.file_codes == file
+        return mask
+
+    def sample(self, k: int = 1, cim_type: str | None = None) -> list[Element]:
+        if cim_type is None:
+            if len(self) == 0:
+                return []
+            return [self[i] for i in randint(len(self), size=k).tolist()]
+
+        candidates = np.flatnonzero(self.filter(cim_type))
+        if len(candidates) == 0:
+            return []
+        return [self[i] for i in candidates[randint(len(candidates), size=k)].tolist()]
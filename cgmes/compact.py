@@ -0,0 +1,165 @@
+import bisect
+import functools
+from array import array
+from collections.abc import Iterable
+
+import numpy as np
+from loguru import logger
+from rdflib import term
+
+from .index import Edge, Index
+from .terms import StringArray, Triple, decode_term, encode_term
+
+
+class CompactIndex:
+    """
+    Triples stored as integers: terms are interned in a sorted table of encoded
+    strings and each triple is a (subject, predicate, object) triple of term
+    ids. Edges are grouped in CSR arrays, forward by subject and backward by
+    object, so a lookup is a binary search followed by a slice.
+
+    A term costs its encoded bytes plus an offset, and a triple four integers
+    per direction, instead of the Python objects and dict entries of
+    TripleIndex or the rdflib store.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        self.arrays = arrays
+        self._texts = StringArray(arrays["term_offsets"], arrays["term_blob"])
+        self._out_ptr = arrays["out_ptr"]
+        self._out_p = arrays["out_p"]
+        self._out_o = arrays["out_o"]
+        self._in_ptr = arrays["in_ptr"]
+        self._in_p = arrays["in_p"]
+        self._in_o = arrays["in_o"]
+        self.term = functools.lru_cache(maxsize=1 << 16)(self._term)
+
+    @classmethod
+    def from_index(cls, index: Index) -> "CompactIndex":
+        if isinstance(index, CompactIndex):
+            return index
+        builder = CompactIndexBuilder()
+        builder.add_all(
+            (s, p, o) for s in index.subjects() for p, o in index.outgoing(s)
+        )
+        return builder.build()
+
+    def _term(self, id: int) -> term.Node:
+        return decode_term(self._texts[id])
+
+    def id(self, node: term.Node) -> int | None:
+        key = encode_term(node)
+        i = bisect.bisect_left(self._texts, key)
+        if i < len(self._texts) and self._texts[i] == key:
+            return i
+        return None
+
+    def _edges(
+        self, ptr: np.ndarray, p: np.ndarray, o: np.ndarray, node: term.Node
+    ) -> list[Edge]:
+        id = self.id(node)
+        if id is None:
+            return []
+        start, stop = ptr[id], ptr[id + 1]
+        return [
+            (self.term(pid), self.term(oid))
+            for pid, oid in zip(p[start:stop].tolist(), o[start:stop].tolist())
+        ]
+
+    def outgoing(self, s: term.Node) -> list[Edge]:
+        return self._edges(self._out_ptr, self._out_p, self._out_o, s)
+
+    def incoming(self, o: term.Node) -> list[Edge]:
+        """Edges pointing to o, which can also be a literal, e.g. a name."""
+        return self._edges(self._in_ptr, self._in_p, self._in_o, o)
+
+    def subjects_with(self, p: term.Node, o: term.Node) -> list[term.Node]:
+        """Subjects of the (p, o) pair: instances of a type, elements of a name..."""
+        pid, oid = self.id(p), self.id(o)
+        if pid is None or oid is None:
+            return []
+        start, stop = self._in_ptr[oid], self._in_ptr[oid + 1]
+        matches = self._in_o[start:stop][self._in_p[start:stop] == pid]
+        return [self.term(id) for id in matches.tolist()]
+
+    def pairs(self, p: term.Node) -> list[tuple[term.Node, term.Node]]:
+        """(subject, object) of every triple with predicate p."""
+        pid = self.id(p)
+        if pid is None:
+            return []
+        positions = np.flatnonzero(self._out_p == pid)
+        subjects = np.searchsorted(self._out_ptr, positions, side="right") - 1
+        return [
+            (self.term(s), self.term(o))
+            for s, o in zip(subjects.tolist(), self._out_o[positions].tolist())
+        ]
+
+    def subjects(self) -> Iterable[term.Node]:
+        for id in np.flatnonzero(np.diff(self._out_ptr)).tolist():
+            yield self.term(id)
+
+    def __len__(self) -> int:
+        return len(self._out_p)
+
+    @property
+    def terms(self) -> int:
+        return len(self._texts)
+
+
+class CompactIndexBuilder:
+    """
+    Collects triples while a model is loaded, then sorts them into a
+    CompactIndex. Terms are interned as they arrive, so only one object per
+    distinct term is kept until build.
+    """
+
+    def __init__(self):
+        self._ids: dict[term.Node, int] = {}
+        self._spo = array("I")
+
+    def add_all(self, triples: Iterable[Triple]):
+        ids = self._ids
+        spo = self._spo
+        for triple in triples:
+            for node in triple:
+                id = ids.get(node)
+                if id is None:
+                    id = ids[node] = len(ids)
+                spo.append(id)
+
+    def build(self) -> CompactIndex:
+        logger.info("compacting triples...")
+        texts = [encode_term(node) for node in self._ids]
+        self._ids = {}
+        order = sorted(range(len(texts)), key=texts.__getitem__)
+        remap = np.empty(len(texts), dtype=np.int32)
+        remap[order] = np.arange(len(texts), dtype=np.int32)
+        spo = remap[np.frombuffer(self._spo, dtype=np.uint32)].reshape(-1, 3)
+        self._spo = array("I")
+
+        arrays = {}
+        terms = StringArray.from_strings(texts[i] for i in order)
+        arrays["term_offsets"] = terms.offsets
+        arrays["term_blob"] = terms.blob
+        arrays |= _csr("out", spo[:, 0], spo[:, 1], spo[:, 2], len(terms))
+        arrays |= _csr("in", spo[:, 2], spo[:, 1], spo[:, 0], len(terms))
+        index = CompactIndex(arrays)
+        logger.info(f"{index.terms} terms, {len(index)} triples indexed")
+        return index
+
+
+def _csr(
+    name: str, keys: np.ndarray, p: np.ndarray, o: np.ndarray, size: int
+) -> dict[str, np.ndarray]:
+    """
+    Edges grouped by key: the edges of term i are (p, o)[ptr[i] : ptr[i + 1]],
+    o being the other end of the edge.
+    """
+    order = np.argsort(keys, kind="stable")
+    ptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=ptr[1:])
+    return {
+        f"{name}_ptr": ptr,
+        f"{name}_p": np.ascontiguousarray(p[order]),
+        f"{name}_o": np.ascontiguousarray(o[order]),
+    }
@@ -0,0 +1,106 @@
+import json
+import sqlite3
+from pathlib import Path
+
+from loguru import logger
+
+from .explorer import LOADER_VERSION, FilePrefix, Graph
+from .sqlite import (
+    SQLiteCatalog,
+    SQLiteFileIndex,
+    SQLiteIndex,
+    SQLiteIndexBuilder,
+    connect,
+    write_meta,
+)
+
+FORMAT_VERSION = 1
+
+
+def save_database(graph: Graph, path: Path | str):
+    """
+    Write graph to the SQLite database at path: its triples, the element
+    catalog, the files of each RDFID, then the metadata (format, file names and
+    namespaces) that marks the database as complete.
+
+    A graph loaded with the sqlite backend into path already holds everything
+    but the metadata there, so nothing is copied.
+    """
+    assert graph.index is not None
+    path = Path(path)
+    index = graph.index
+    if graph.catalog is None:
+        # into the database, with the sqlite backend
+        graph.build_catalog()
+    if not isinstance(index, SQLiteIndex) or index.path.resolve() != path.resolve():
+        logger.info(f"writing database {path}")
+        builder = SQLiteIndexBuilder(path)
+        builder.add_all(
+            (s, p, o) for s in index.subjects() for p, o in index.outgoing(s)
+        )
+        if graph.files is not None:
+            builder.files.update(graph.files)
+        index = builder.build()
+        SQLiteCatalog.build(index, graph.elements.rows())
+
+    connection = connect(path, bulk=True)
+    with connection:
+        write_meta(
+            connection,
+            {
+                "filenames": json.dumps(
+                    [[f.filename, f.prefix] for f in graph.filenames]
+                ),
+                "namespaces": json.dumps(
+                    [[prefix, str(ns)] for prefix, ns in graph.graph.namespaces()]
+                ),
+                "loader": LOADER_VERSION,
+                "format": FORMAT_VERSION,
+            },
+        )
+    connection.close()
+    logger.info(f"database written: {index.terms} terms, {len(index)} triples")
+
+
+def load_database(path: Path | str) -> Graph:
+    """
+    Open a database written by save_database. Nothing is read up front but its
+    metadata and the element counts by type: triples, elements and names are
+    queried on demand, so opening is immediate and memory use stays bounded.
+    """
+    index = SQLiteIndex(path)
+    graph = Graph(backend="sqlite", database=path)
+    for prefix, ns in json.loads(index.meta("namespaces") or "[]"):
+        graph.graph.bind(prefix, ns, override=True, replace=True)
+    graph.filenames = [
+        FilePrefix(name, prefix)
+        for name, prefix in json.loads(index.meta("filenames") or "[]")
+    ]
+    graph.index = index
+    graph.files = SQLiteFileIndex(index)
+    graph.catalog = SQLiteCatalog(index)
+    return graph
+
+
+def database_is_current(path: Path | str) -> bool:
+    """
+    Whether path is a complete database written by this version of the
+    loader. Anything else (missing file, interrupted load, older format) has
+    to be rebuilt.
+    """
+    path = Path(path)
+    if not path.exists():
+        return False
+    try:
+        index = SQLiteIndex(path)
+        format, loader = index.meta("format"), index.meta("loader")
+    except sqlite3.DatabaseError as e:
+        logger.warning(f"{path} is not a valid database: {e}")
+        return False
+    if format is None:
+        logger.warning(f"{path} is incomplete")
+        return False
+    if format != str(FORMAT_VERSION) or loader != str(LOADER_VERSION):
+        logger.warning(f"{path} was written by another version of the loader")
+        return False
+    return True
@@ -1,15 +1,41 @@
-import functools
 import zipfile
+from collections import defaultdict
+from collections.abc import Callable, Collection, Iterable, Mapping
+from concurrent.futures import Future, ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
+from typing import IO
 
 import rdflib as rdf
 from loguru import logger
-from numpy.random import rand
-from rdflib import term
+from rdflib import RDF, term
 from rdflib.query import ResultRow
 
+from .catalog import Catalog, Element, Row
+from .compact import CompactIndexBuilder
+from .files import FileIndex, MappedFileIndex, UnionFileIndex
+from .index import Index, TripleIndex
+from .lru import LRUCache
+from .metrics import timed
+from .names import NameIndex
+from .progress import Progress
+from .reader import CGMESReader
+from .sqlite import (
+    SQLiteCatalog,
+    SQLiteFileIndex,
+    SQLiteIndex,
+    SQLiteIndexBuilder,
+    SQLiteNameIndex,
+)
+from .terms import Triple, TripleBatch
+from .traversal import breadth_first
+
 FILE_NS = "NSFILE_"
+# bump when loading produces different triples or identifiers, so that cached
+# snapshots get rebuilt
+LOADER_VERSION = 1
+NODE_CACHE_SIZE = 10_000
+BACKENDS = ("compact", "dict", "sqlite")
 
 
 @dataclass
@@ -44,33 +70,145 @@ class CGMESNode:
         return rep
 
 
-@dataclass
-class Element:
-    rdfid: str
-    cim_type: str
-    name: str
-
-
 class Graph:
-    def __init__(self):
+    index: Index | None = None
+    catalog: Catalog | SQLiteCatalog | None = None
+    name_index: NameIndex | SQLiteNameIndex | None = None
+    files: FileIndex | MappedFileIndex | SQLiteFileIndex | UnionFileIndex | None = None
+
+    def __init__(
+        self,
+        node_cache_size: int = NODE_CACHE_SIZE,
+        backend: str = "compact",
+        database: Path | str | None = None,
+    ):
+        """
+        :param backend: how the index stores triples, "compact" (integer
+        arrays, see CompactIndex), "dict" (rdflib terms, see TripleIndex) or
+        "sqlite" (the SQLite file database, see SQLiteIndex)
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown backend {backend}, expected one of {BACKENDS}")
+        if backend == "sqlite" and database is None:
+            raise ValueError("the sqlite backend needs a database path")
         self.graph = rdf.Graph()
         self.filenames: list[FilePrefix] = []
-        self.ids: dict[str, str] = {}
+        self.node_cache: LRUCache[str, CGMESNode] = LRUCache(node_cache_size)
+        self.backend = backend
+        self.database = database
+        self._pending: TripleIndex | CompactIndexBuilder | SQLiteIndexBuilder | None = (
+            None
+        )
+
+    def _new_index(self) -> TripleIndex | CompactIndexBuilder | SQLiteIndexBuilder:
+        if self.backend == "sqlite":
+            assert self.database is not None
+            return SQLiteIndexBuilder(self.database)
+        return TripleIndex() if self.backend == "dict" else CompactIndexBuilder()
+
+    def build_index(self):
+        """
+        Finish the index of the triples given to add_file or, if there are
+        none, index the triples of the rdflib store.
+        """
+        if self._pending is None:
+            self._pending = self._new_index()
+            self._pending.add_all(self.graph)
+            self.files = FileIndex.from_triples(self.graph, self._file_namespaces())
+
+        if isinstance(self._pending, SQLiteIndexBuilder):
+            if isinstance(self.files, FileIndex):
+                self._pending.files.update(self.files)
+            self.index = self._pending.build()
+            self.files = SQLiteFileIndex(self.index)
+        elif isinstance(self._pending, CompactIndexBuilder):
+            self.index = self._pending.build()
+            if isinstance(self.files, FileIndex):
+                self.files = MappedFileIndex(*self.files.to_arrays())
+        else:
+            self.index = self._pending
+        self._pending = None
+
+    def add_file(
+        self,
+        filename: str,
+        namespace: str,
+        triples: Iterable[Triple],
+        namespaces: Mapping[str, str] | Iterable[tuple[str, str]] = (),
+    ):
+        """
+        Index the triples of one CGMES file, without going through the rdflib
+        store. namespaces is read once the triples are consumed, so it can be
+        filled while they are parsed. The index is usable after build_index.
+        """
+        if self._pending is None:
+            self._pending = self._new_index()
+        if self.files is None:
+            if isinstance(self._pending, SQLiteIndexBuilder):
+                self.files = self._pending.files
+            else:
+                self.files = FileIndex()
+        assert isinstance(self.files, FileIndex | SQLiteFileIndex)
+        file = self.filenames.index(self.prefix_from_filename(filename))
+        self._pending.add_all(self.files.track(triples, namespace, file))
+        self.bind_file(filename, namespace, namespaces)
+
+    def bind_file(
+        self,
+        filename: str,
+        namespace: str,
+        namespaces: Mapping[str, str] | Iterable[tuple[str, str]] = (),
+    ):
+        if isinstance(namespaces, Mapping):
+            namespaces = namespaces.items()
+        for prefix, ns in namespaces:
+            self.graph.bind(prefix, ns, override=False)
+        self.graph.bind(FILE_NS + self.prefix_from_filename(filename).prefix, namespace)
+
+    def _file_namespaces(self) -> dict[str, int]:
+        namespaces = {}
+        for i, f in enumerate(self.filenames):
+            ns = self.graph.store.namespace(FILE_NS + f.prefix)
+            if ns is not None:
+                namespaces[str(ns)] = i
+        return namespaces
+
+    def _files_of(self, identifier: str) -> list[FilePrefix]:
+        """Files defining or referencing the RDFID of identifier."""
+        if self.files is None:
+            return self.filenames
+        return [self.filenames[i] for i in self.files.files(identifier.split(":")[1])]
 
     def _ids(self, identifier: str):
         id = identifier.split(":")[1]
-        return [f"{FILE_NS}{el.prefix}:{id}" for el in self.filenames]
+        return [f"{FILE_NS}{el.prefix}:{id}" for el in self._files_of(identifier)]
 
-        # if not self.ids:
-        #     self.load_ids()
-
-        # return [self.ids[identifier[identifier.index(":")+1:]]]
+    def _uris(self, identifier: str) -> list[rdf.URIRef]:
+        id = identifier.split(":")[1]
+        namespaces = [
+            self.graph.store.namespace(FILE_NS + el.prefix)
+            for el in self._files_of(identifier)
+        ]
+        return [rdf.URIRef(ns + id) for ns in namespaces if ns is not None]
 
     @property
-    @functools.cache
-    def elements(self) -> list[Element]:
-        logger.info("loading elements...")
-        _elements = []
+    def elements(self) -> Catalog | SQLiteCatalog:
+        if self.catalog is None:
+            self.build_catalog()
+        assert self.catalog is not None
+        return self.catalog
+
+    def build_catalog(self):
+        if isinstance(self.index, SQLiteIndex):
+            self.catalog = SQLiteCatalog.build(
+                self.index, self._elements_from_index(self.index)
+            )
+        elif self.index is not None:
+            self.catalog = Catalog.build(self._elements_from_index(self.index))
+        else:
+            self.catalog = Catalog.build(self._elements_from_sparql())
+
+    def _elements_from_sparql(self) -> Iterable[Row]:
         query = """
             SELECT ?s ?t ?n
             WHERE {
@@ -80,116 +218,227 @@ class Graph:
             LIMIT 10000000
             """
 
-        for res in self.graph.query(query):
+        files = self._file_indexes()
+        for res in self._query(query):
             assert isinstance(res, ResultRow)
             if not isinstance(res["s"], rdf.URIRef):
                 continue
             rdfid = self._n3(res["s"])
-            kind = res["t"]
-            name = res["n"]
             if rdfid.startswith(FILE_NS):
-                _elements.append(Element(rdfid.split(":")[1].strip(), kind, name))
-        logger.info(f"{len(_elements)} elements loaded")
-        return _elements
+                yield _row(files, rdfid, res["t"], res["n"])
+
+    def _elements_from_index(self, index: Index) -> Iterable[Row]:
+        cim = self.graph.store.namespace("cim")
+        if cim is None:
+            return
+        name_predicate = rdf.URIRef(cim + "IdentifiedObject.name")
+
+        named: Iterable[tuple[term.Node, term.Node, term.Node]]
+        if isinstance(index, SQLiteIndex):
+            named = index.named(RDF.type, name_predicate)
+        else:
+            named = _named(index, name_predicate)
+
+        files = self._file_indexes()
+        for s, kind, name in named:
+            if not isinstance(s, rdf.URIRef):
+                continue
+            rdfid = self._n3(s)
+            if rdfid.startswith(FILE_NS):
+                yield _row(files, rdfid, kind, name)
 
+    def _file_indexes(self) -> dict[str, int]:
+        return {f.prefix: i for i, f in enumerate(self.filenames)}
+
+    @property
+    def names(self) -> NameIndex | SQLiteNameIndex:
+        if self.name_index is None:
+            self.build_names()
+        assert self.name_index is not None
+        return self.name_index
+
+    def build_names(self):
+        if isinstance(self.elements, SQLiteCatalog):
+            self.name_index = SQLiteNameIndex(self.elements)
+        else:
+            self.name_index = NameIndex(self.elements)
+
+    @timed("graph.elem_with_name", method=True)
     def elem_with_name(self, name: str) -> Element | None:
         logger.info(f"looking for element with name [{name}]")
-        for e in self.elements:
-            if e.name.strip() == name:
-                return e
-
-        return None
+        found = self.names.exact(name)
+        return found[0] if found else None
 
-    def random_element(self):
-        return self.elements[int(rand() * len(self.elements))]
+    @timed("graph.random_element", method=True)
+    def random_element(self) -> Element:
+        return self.elements.sample()[0]
 
-    @functools.cache
+    @timed("graph.properties", method=True)
     def properties(self, identifier: str) -> CGMESNode:
+        return self.properties_many([identifier])[identifier]
+
+    @timed("graph.properties_many", method=True)
+    def properties_many(self, identifiers: Iterable[str]) -> dict[str, CGMESNode]:
+        """
+        Properties of several nodes at once: cached nodes are reused and the
+        others are resolved in a single pass.
+        """
+        nodes = {}
+        missing = []
+        for identifier in identifiers:
+            node = self.node_cache.get(identifier)
+            if node is None:
+                missing.append(identifier)
+            else:
+                nodes[identifier] = node
+
+        if missing:
+            if self.index is not None:
+                found = self._properties_index(self.index, missing)
+            else:
+                found = self._properties_sparql(missing)
+            for identifier, node in found.items():
+                self.node_cache.put(identifier, node)
+            nodes |= found
+
+        return nodes
+
+    def _properties_index(
+        self, index: Index, identifiers: list[str]
+    ) -> dict[str, CGMESNode]:
+        nodes = {}
+        for identifier in identifiers:
+            node = nodes[identifier] = CGMESNode(identifier)
+            for s in self._uris(identifier):
+                for raw_p, raw_o in index.outgoing(s):
+                    self._add_to_node(node, s, raw_p, raw_o)
+        return nodes
+
+    def _properties_sparql(self, identifiers: list[str]) -> dict[str, CGMESNode]:
         query = """
     SELECT ?s ?p ?o
     WHERE {
       VALUES ?s { $ID }
     ?s ?p ?o.
     }
-    LIMIT 1000
             """
 
-        query = query.replace("$ID", " ".join(self._ids(identifier)))
+        ids = [id for identifier in identifiers for id in self._ids(identifier)]
+        query = query.replace("$ID", " ".join(ids))
 
-        node = CGMESNode(identifier)
+        nodes = {identifier: CGMESNode(identifier) for identifier in identifiers}
+        by_rdfid: dict[str, list[CGMESNode]] = defaultdict(list)
+        for identifier, node in nodes.items():
+            by_rdfid[identifier.split(":")[1]].append(node)
 
-        for res in self.graph.query(query):
+        for res in self._query(query):
             assert isinstance(res, ResultRow)
-            raw_p = res.get("p")
-            p = self._n3(raw_p)
-            raw_o = res.get("o")
-            o = self._n3(raw_o)
-
-            if p == "rdf:type":
-                node.id = self._n3(res.get("s"))
-                node.add_value(p, o)
-            elif isinstance(raw_o, rdf.Literal):
-                node.add_value(p, raw_o.value)
-            elif isinstance(raw_o, rdf.URIRef):
-                node.add_child(p, o)
+            raw_s = res.get("s")
+            for node in by_rdfid[self._n3(raw_s).split(":")[1]]:
+                self._add_to_node(node, raw_s, res.get("p"), res.get("o"))
 
-        return node
+        return nodes
 
+    def _add_to_node(
+        self,
+        node: CGMESNode,
+        raw_s: term.Node | None,
+        raw_p: term.Node | None,
+        raw_o: term.Node | None,
+    ):
+        p = self._n3(raw_p)
+        o = self._n3(raw_o)
+
+        if p == "rdf:type":
+            node.id = self._n3(raw_s)
+            node.add_value(p, o)
+        elif isinstance(raw_o, rdf.Literal):
+            node.add_value(p, raw_o.value)
+        elif isinstance(raw_o, rdf.URIRef):
+            node.add_child(p, o)
+
+    @timed("graph.ascendants", method=True)
     def ascendants(self, identifier: str, depth=1000, max_seen=5) -> list[str]:
-        query = """
-    SELECT ?p ?o
-    WHERE {
-      VALUES ?s { $ID }
-    ?o ?p ?s.
-    }
-    LIMIT 10000
-            """
-        return self.rec_search(query, identifier, [], depth, max_seen)
+        return list(self.neighbourhood(identifier, "in", depth, max_seen))
 
+    @timed("graph.descendants", method=True)
     def descendants(self, identifier: str, depth=1000, max_seen=5) -> list[str]:
-        query = """
+        return list(self.neighbourhood(identifier, "out", depth, max_seen))
+
+    @timed("graph.neighbourhood", method=True)
+    def neighbourhood(
+        self, identifier: str, direction: str = "out", depth=1000, max_nodes=5
+    ) -> dict[str, int]:
+        """
+        Nodes reachable from identifier by following references forward
+        (direction="out") or backward (direction="in"), with their hop distance.
+        At most max_nodes nodes are returned, the nearest ones first.
+        """
+        if self.index is not None:
+            lookup = self._index_lookup(self.index, direction)
+        else:
+            lookup = self._sparql_lookup(direction)
+
+        def neighbours(frontier: list[str]) -> Iterable[str]:
+            for o in lookup(frontier):
+                if not isinstance(o, rdf.URIRef):
+                    continue
+                childid = self._n3(o)
+                if childid.startswith(FILE_NS):
+                    yield childid
+
+        return breadth_first(
+            identifier, neighbours, depth, max_nodes, key=lambda i: i.split(":")[1]
+        )
+
+    @timed("graph.sparql", method=True)
+    def _query(self, query: str) -> list:
+        """Rows of a SPARQL query, all evaluated here so that they are timed."""
+        return list(self.graph.query(query))
+
+    def _sparql_lookup(
+        self, direction: str
+    ) -> Callable[[list[str]], Iterable[term.Node]]:
+        if direction == "out":
+            query = """
     SELECT ?s ?p ?o
     WHERE {
       VALUES ?s { $ID }.
     ?s ?p ?o.
     }
-    LIMIT 1000
             """
-        return self.rec_search(query, identifier, [], depth, max_seen)
-
-    def rec_search(
-        self,
-        query: str,
-        identifier: str,
-        seen: list[str],
-        depth: int,
-        max_seen: int,
-    ):
-        if depth == 0:
-            return []
-        if identifier in seen:
-            return []
-        if len(seen) >= max_seen:
-            return []
+        else:
+            query = """
+    SELECT ?p ?o
+    WHERE {
+      VALUES ?s { $ID }
+    ?o ?p ?s.
+    }
+            """
 
-        seen.append(identifier)
+        def lookup(frontier: list[str]) -> Iterable[term.Node]:
+            ids = [id for identifier in frontier for id in self._ids(identifier)]
+            q = query.replace("$ID", " ".join(ids))
+            for res in self._query(q):
+                assert isinstance(res, rdf.query.ResultRow)
+                yield res["o"]
 
-        q = query.replace("$ID", " ".join(self._ids(identifier)))
+        return lookup
 
-        for res in self.graph.query(q):
-            assert isinstance(res, rdf.query.ResultRow)
-            o = res.get("o")
-            childid = self._n3(o)
+    def _index_lookup(
+        self, index: Index, direction: str
+    ) -> Callable[[list[str]], Iterable[term.Node]]:
+        edges = index.outgoing if direction == "out" else index.incoming
 
-            if childid.startswith(FILE_NS) and isinstance(o, rdf.URIRef):
-                self.rec_search(query, childid, seen, depth - 1, max_seen)
-                if len(seen) >= max_seen:
-                    logger.warning("max nodes reached. results will be troncated")
-                    return seen
+        def lookup(frontier: list[str]) -> Iterable[term.Node]:
+            for identifier in frontier:
+                for uri in self._uris(identifier):
+                    for _, o in edges(uri):
+                        yield o
 
-        return seen
+        return lookup
 
-    def _n3(self, rdf_result: term.Identifier | None) -> str:
+    def _n3(self, rdf_result: term.Node | None) -> str:
         if not rdf_result:
             return "NONE"
         return rdf_result.n3(self.graph.namespace_manager)
@@ -233,31 +482,197 @@ class Graph:
         return text.split(":")[1]
 
 
-def load_zip(filepath: Path | str) -> Graph:
-    graph = Graph()
+def _named(
+    index: Index, name_predicate: rdf.URIRef
+) -> Iterable[tuple[term.Node, term.Node, term.Node]]:
+    """(subject, type, name) of the subjects having a type and a name."""
+    for s in index.subjects():
+        edges = index.outgoing(s)
+        kinds = [o for p, o in edges if p == RDF.type]
+        names = [o for p, o in edges if p == name_predicate]
+        for kind in kinds:
+            for name in names:
+                yield s, kind, name
+
+
+def _row(files: dict[str, int], rdfid: str, kind: term.Node, name: term.Node) -> Row:
+    prefix, id = rdfid.removeprefix(FILE_NS).split(":", 1)
+    return id.strip(), str(kind), str(name), files[prefix]
+
+
+PARSERS = ("stream", "rdflib")
+
+
+def load_zip(
+    filepath: Path | str,
+    workers: int = 1,
+    parser: str = "stream",
+    backend: str = "compact",
+    progress: Progress | None = None,
+    database: Path | str | None = None,
+    include: Collection[str] | None = None,
+) -> Graph:
+    """
+    :param progress: receives a "parse <member>" stage per zip member, then
+    the "index" and "catalog" stages
+    :param database: file of the sqlite backend, into which triples are
+    streamed as they are parsed
+    :param include: names of the zip members to load, all by default
+    """
+    progress = progress or Progress()
+    graph = Graph(backend=backend, database=database)
     archive = zipfile.ZipFile(filepath)
-    for file in archive.filelist:
-        logger.info(f"loading {file.filename}")
-        with archive.open(file) as f:
-            graph.graph.parse(f, format="xml")
-            graph.graph.bind(
-                FILE_NS + graph.prefix_from_filename(f.name).prefix,
-                f"{f.name}#",
-            )
+    members = [file.filename for file in archive.filelist]
+    if include is not None:
+        members = [member for member in members if member in include]
+    for member in members:
+        progress.add(f"parse {member}")
+    progress.add("index")
+    progress.add("catalog")
+    if workers > 1:
+        with _pool(workers, len(members)) as pool:
+            futures = [
+                _submit(
+                    pool, progress, member, _parse_member, str(filepath), member, parser
+                )
+                for member in members
+            ]
+            for member, future in zip(members, futures):
+                _merge(graph, future.result(), member, f"{member}#", parser)
+    else:
+        for member in members:
+            logger.info(f"loading {member}")
+            with progress.stage(f"parse {member}"), archive.open(member) as f:
+                _parse_into(graph, f, member, member, parser)
+
+    _finish(graph, progress)
     return graph
 
 
-def load_folder(cgmes_folder: Path | str) -> Graph:
+def load_folder(
+    cgmes_folder: Path | str,
+    workers: int = 1,
+    parser: str = "stream",
+    backend: str = "compact",
+    progress: Progress | None = None,
+    database: Path | str | None = None,
+    include: Collection[str] | None = None,
+) -> Graph:
+    """
+    :param progress: receives a "parse <file>" stage per XML file, then the
+    "index" and "catalog" stages
+    :param database: file of the sqlite backend, into which triples are
+    streamed as they are parsed
+    :param include: names of the XML files to load, all by default
+    """
+    progress = progress or Progress()
     cgmes_folder = Path(cgmes_folder)
 
-    graph = Graph()
+    graph = Graph(backend=backend, database=database)
+
+    files = list(cgmes_folder.glob("*.xml"))
+    if include is not None:
+        files = [f for f in files if f.name in include]
+    for f in files:
+        progress.add(f"parse {f.name}")
+    progress.add("index")
+    progress.add("catalog")
+    if workers > 1:
+        with _pool(workers, len(files)) as pool:
+            futures = [
+                _submit(pool, progress, f.name, _parse_file, str(f), parser)
+                for f in files
+            ]
+            for f, future in zip(files, futures):
+                _merge(
+                    graph, future.result(), f.name, f"{f.absolute().as_uri()}#", parser
+                )
+    else:
+        for f in files:
+            logger.info(f"loading {f}")
+            with progress.stage(f"parse {f.name}"):
+                _parse_into(graph, f, f.name, f.absolute().as_uri(), parser)
+
+    _finish(graph, progress)
+    return graph
 
-    for f in cgmes_folder.glob("*.xml"):
-        logger.info(f"loading {f}")
-        graph.graph.parse(f)
-        graph.graph.bind(
-            FILE_NS + graph.prefix_from_filename(f.name).prefix,
-            f"{f.absolute().as_uri()}#",
-        )
 
-    return graph
+def _finish(graph: Graph, progress: Progress):
+    with progress.stage("index"):
+        graph.build_index()
+    with progress.stage("catalog"):
+        graph.build_catalog()
+
+
+def _submit(
+    pool: ProcessPoolExecutor,
+    progress: Progress,
+    filename: str,
+    parse: Callable[..., TripleBatch],
+    *args,
+) -> Future:
+    stage = f"parse {filename}"
+    progress.start(stage)
+    future = pool.submit(parse, *args)
+
+    def report(future: Future):
+        if future.exception() is None:
+            progress.done(stage)
+        else:
+            progress.fail(stage, str(future.exception()))
+
+    future.add_done_callback(report)
+    return future
+
+
+def _parse_into(
+    graph: Graph, source: Path | IO[bytes], filename: str, base: str, parser: str
+):
+    if parser == "rdflib":
+        graph.graph.parse(source, format="xml")
+        graph.bind_file(filename, f"{base}#")
+    else:
+        reader = CGMESReader(source, base)
+        graph.add_file(filename, f"{base}#", reader, reader.namespaces)
+
+
+def _pool(workers: int, files: int) -> ProcessPoolExecutor:
+    workers = max(1, min(workers, files))
+    logger.info(f"parsing {files} files with {workers} workers")
+    return ProcessPoolExecutor(workers)
+
+
+def _parse_member(filepath: str, member: str, parser: str) -> TripleBatch:
+    logger.info(f"loading {member}")
+    with zipfile.ZipFile(filepath) as archive, archive.open(member) as f:
+        return _batch(f, member, parser)
+
+
+def _parse_file(filepath: str, parser: str) -> TripleBatch:
+    logger.info(f"loading {filepath}")
+    path = Path(filepath)
+    return _batch(path, path.absolute().as_uri(), parser)
+
+
+def _batch(source: Path | IO[bytes], base: str, parser: str) -> TripleBatch:
+    if parser == "rdflib":
+        parsed = rdf.Graph()
+        parsed.parse(source, format="xml")
+        batch = TripleBatch.from_triples(parsed)
+        batch.namespaces = [(prefix, str(ns)) for prefix, ns in parsed.namespaces()]
+        return batch
+
+    reader = CGMESReader(source, base)
+    batch = TripleBatch.from_triples(reader)
+    batch.namespaces = list(reader.namespaces.items())
+    return batch
+
+
+def _merge(
+    graph: Graph, batch: TripleBatch, filename: str, namespace: str, parser: str
+):
+    if parser == "rdflib":
+        graph.graph.addN((s, p, o, graph.graph) for s, p, o in batch)
+        graph.bind_file(filename, namespace, batch.namespaces)
+    else:
+        graph.add_file(filename, namespace, batch, batch.namespaces)
@@ -0,0 +1,111 @@
+import bisect
+from collections.abc import Iterable, Iterator, Mapping
+from typing import Protocol
+
+import numpy as np
+import rdflib as rdf
+
+from .terms import StringArray, Triple
+
+
+class Files(Protocol):
+    """Files defining or referencing RDFIDs, as indexes of Graph.filenames."""
+
+    def files(self, rdfid: str) -> list[int]: ...
+
+
+class FileIndex:
+    """
+    Files defining or referencing each RDFID, as bitmasks over the indexes of
+    Graph.filenames. Filled while the triples of each file are loaded.
+    """
+
+    def __init__(self):
+        self.masks: dict[str, int] = {}
+
+    def track(
+        self, triples: Iterable[Triple], namespace: str, file: int
+    ) -> Iterator[Triple]:
+        """
+        Pass triples through, recording the RDFIDs of the resources of
+        namespace (the namespace of file) they mention.
+        """
+        bit = 1 << file
+        masks = self.masks
+        length = len(namespace)
+        for triple in triples:
+            s, _, o = triple
+            if isinstance(s, rdf.URIRef) and s.startswith(namespace):
+                rdfid = s[length:]
+                masks[rdfid] = masks.get(rdfid, 0) | bit
+            if isinstance(o, rdf.URIRef) and o.startswith(namespace):
+                rdfid = o[length:]
+                masks[rdfid] = masks.get(rdfid, 0) | bit
+            yield triple
+
+    @classmethod
+    def from_triples(
+        cls, triples: Iterable[Triple], namespaces: Mapping[str, int]
+    ) -> "FileIndex":
+        """namespaces maps the namespace of each file to its index"""
+        index = cls()
+        masks = index.masks
+        for s, _, o in triples:
+            for node in (s, o):
+                if not isinstance(node, rdf.URIRef):
+                    continue
+                namespace, _, rdfid = node.rpartition("#")
+                file = namespaces.get(namespace + "#")
+                if file is not None:
+                    masks[rdfid] = masks.get(rdfid, 0) | (1 << file)
+        return index
+
+    def files(self, rdfid: str) -> list[int]:
+        mask = self.masks.get(rdfid, 0)
+        return [file for file in range(mask.bit_length()) if mask >> file & 1]
+
+    def to_arrays(self) -> tuple[StringArray, np.ndarray, np.ndarray]:
+        """
+        Sorted RDFIDs with, in CSR form, their files: the files of the i-th
+        RDFID are codes[ptr[i] : ptr[i + 1]].
+        """
+        rdfids = sorted(self.masks)
+        files = [self.files(rdfid) for rdfid in rdfids]
+        ptr = np.zeros(len(rdfids) + 1, dtype=np.int64)
+        np.cumsum([len(f) for f in files], out=ptr[1:])
+        codes = np.array([file for f in files for file in f], dtype=np.int16)
+        return StringArray.from_strings(rdfids), ptr, codes
+
+
+class MappedFileIndex:
+    """FileIndex stored as the arrays of FileIndex.to_arrays, e.g. in a snapshot."""
+
+    def __init__(self, rdfids: StringArray, ptr: np.ndarray, codes: np.ndarray):
+        self.rdfids = rdfids
+        self.ptr = ptr
+        self.codes = codes
+
+    def files(self, rdfid: str) -> list[int]:
+        i = bisect.bisect_left(self.rdfids, rdfid)
+        if i == len(self.rdfids) or self.rdfids[i] != rdfid:
+            return []
+        return self.codes[self.ptr[i] : self.ptr[i + 1]].tolist()
+
+
+class UnionFileIndex:
+    """
+    Files of several graphs seen as one: the files of the i-th part are
+    numbered from offsets[i] on.
+    """
+
+    def __init__(self, parts: list[Files | None], offsets: list[int]):
+        self.parts = parts
+        self.offsets = offsets
+
+    def files(self, rdfid: str) -> list[int]:
+        return [
+            offset + file
+            for part, offset in zip(self.parts, self.offsets)
+            if part is not None
+            for file in part.files(rdfid)
+        ]
@@ -0,0 +1,76 @@
+from collections.abc import Collection
+from pathlib import Path
+
+from loguru import logger
+
+from .cache import CacheManager, member_keys
+from .explorer import Graph
+from .progress import Progress
+from .workspace import merge
+
+MERGE = "merge"
+
+
+class IncrementalModel:
+    """
+    Model of a zip file cached member by member, keyed by the name, CRC32 and
+    size of each member (see member_key). A new version of the zip, e.g. with
+    SSH and SV profiles republished every hour and the same EQ, only has its
+    changed members parsed.
+
+    load() gives the model as a view over the graphs of its members (see
+    merge). Called again once the zip changed, it reuses the graphs of the
+    unchanged members and swaps in the changed ones, into a new view: graphs
+    given out before are left as they are.
+    """
+
+    def __init__(
+        self,
+        source: Path | str,
+        cache: CacheManager | None = None,
+        workers: int = 1,
+        include: Collection[str] | None = None,
+    ):
+        """
+        :param include: names of the zip members to load, all by default
+        """
+        self.source = Path(source)
+        self.cache = cache or CacheManager()
+        self.workers = workers
+        self.include = include
+        self._parts: dict[str, Graph] = {}
+        self._stat: tuple[int, int] | None = None
+
+    def changed(self) -> bool:
+        """
+        Whether the zip changed since it was last loaded. Only the zip
+        directory is read, and only when its size or mtime changed.
+        """
+        if self._stat is None:
+            return True
+        if _stat(self.source) == self._stat:
+            return False
+        return set(member_keys(self.source, self.include).values()) != set(self._parts)
+
+    def load(self, progress: Progress | None = None) -> Graph:
+        """
+        :param progress: receives the stages of CacheManager.load_members, then
+        "merge"
+        """
+        progress = progress or Progress()
+        stat = _stat(self.source)
+        parts = self.cache.load_members(
+            self.source, self.workers, progress, self.include, self._parts
+        )
+        if self._parts:
+            changed = len(parts.keys() - self._parts.keys())
+            logger.info(f"reloaded {self.source}, {changed} member(s) changed")
+        with progress.stage(MERGE):
+            graph = merge(list(parts.values()))
+        self._parts, self._stat = parts, stat
+        return graph
+
+
+def _stat(source: Path) -> tuple[int, int]:
+    stat = source.stat()
+    return stat.st_size, stat.st_mtime_ns
@@ -0,0 +1,62 @@
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from typing import Protocol
+
+import rdflib as rdf
+from loguru import logger
+from rdflib import term
+
+Edge = tuple[term.Node, term.Node]
+
+
+class Index(Protocol):
+    """Read access to the triples of a model, as used by Graph."""
+
+    def outgoing(self, s: term.Node) -> Sequence[Edge]: ...
+
+    def incoming(self, o: term.Node) -> Sequence[Edge]: ...
+
+    def subjects(self) -> Iterable[term.Node]: ...
+
+    def __len__(self) -> int: ...
+
+
+class TripleIndex:
+    """
+    In-memory adjacency over the triples of a model: each subject maps to its
+    outgoing (predicate, object) pairs and each referenced resource to its
+    incoming (predicate, subject) pairs, so a lookup costs O(degree).
+    """
+
+    def __init__(self):
+        self.out: dict[term.Node, list[Edge]] = defaultdict(list)
+        self.inc: dict[term.Node, list[Edge]] = defaultdict(list)
+
+    def add(self, s: term.Node, p: term.Node, o: term.Node):
+        self.out[s].append((p, o))
+        if not isinstance(o, rdf.Literal):
+            self.inc[o].append((p, s))
+
+    def add_all(self, triples: Iterable[tuple[term.Node, term.Node, term.Node]]):
+        for s, p, o in triples:
+            self.add(s, p, o)
+
+    def outgoing(self, s: term.Node) -> list[Edge]:
+        return self.out.get(s, [])
+
+    def incoming(self, o: term.Node) -> list[Edge]:
+        return self.inc.get(o, [])
+
+    def subjects(self) -> Iterable[term.Node]:
+        return self.out.keys()
+
+    def __len__(self) -> int:
+        return sum(len(edges) for edges in self.out.values())
+
+    @classmethod
+    def from_graph(cls, graph: rdf.Graph) -> "TripleIndex":
+        logger.info("indexing triples...")
+        index = cls()
+        index.add_all(graph)
+        logger.info(f"{len(index.out)} subjects indexed")
+        return index
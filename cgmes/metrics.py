@@ -0,0 +1,214 @@
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Sized
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import ParamSpec, TypeVar
+
+from loguru import logger
+
+# upper bounds of the latency histograms, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SLOW_SECONDS = 1.0
+# longest argument text logged for a slow operation
+MAX_DESCRIPTION = 2000
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+@dataclass
+class Histogram:
+    counts: list[int] = field(default_factory=lambda: [0] * (len(BUCKETS) + 1))
+    total: float = 0.0
+    slow: int = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class Metrics:
+    """
+    Call counts and latency histograms of named operations, for the whole
+    process. Operations slower than slow seconds are logged as warnings.
+
+    Once shared (see share), the metrics of forked worker processes are
+    summed: each process flushes its own histograms to a file of a common
+    folder, and histograms() reads them all, whichever process is asked.
+    """
+
+    def __init__(self, slow: float = SLOW_SECONDS):
+        self.slow = slow
+        self._histograms: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._folder: Path | None = None
+        self._dirty = False
+        os.register_at_fork(before=self.flush, after_in_child=self._after_fork_in_child)
+
+    def share(self, folder: Path | str):
+        """
+        Sum the metrics of the processes sharing folder, this one and those
+        forked from it. Files of exited processes are kept, so that counters
+        never go down.
+        """
+        self._folder = Path(folder)
+        self._folder.mkdir(parents=True, exist_ok=True)
+        self._dirty = True
+        self.flush()
+
+    def flush(self):
+        """Write the histograms of this process to the shared folder."""
+        if self._folder is None or not self._dirty:
+            return
+        # one writer at a time, so that the file is never older than the
+        # histograms of the last flush
+        with self._flush_lock:
+            with self._lock:
+                histograms = {n: asdict(h) for n, h in self._histograms.items()}
+                self._dirty = False
+            path = self._folder / f"{os.getpid()}.json"
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(histograms))
+            os.replace(tmp, path)
+
+    def _after_fork_in_child(self):
+        # the parent keeps its own observations in its file
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._histograms = {}
+        self._dirty = False
+
+    def observe(self, operation: str, seconds: float, describe: Callable[[], str]):
+        """
+        :param describe: text of the call (query, arguments, result size),
+        only computed for slow operations
+        """
+        slow = seconds >= self.slow
+        with self._lock:
+            histogram = self._histograms.setdefault(operation, Histogram())
+            histogram.counts[bisect_left(BUCKETS, seconds)] += 1
+            histogram.total += seconds
+            histogram.slow += slow
+            self._dirty = True
+        if slow:
+            logger.warning(f"slow {operation} ({seconds:.3f}s): {describe()}")
+
+    def histograms(self) -> dict[str, Histogram]:
+        """Histograms of this process or, once shared, of all processes."""
+        if self._folder is None:
+            with self._lock:
+                return {
+                    name: Histogram(list(h.counts), h.total, h.slow)
+                    for name, h in self._histograms.items()
+                }
+
+        self.flush()
+        summed: dict[str, Histogram] = {}
+        for path in self._folder.glob("*.json"):
+            try:
+                histograms = json.loads(path.read_text())
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"ignoring metrics {path}: {e}")
+                continue
+            for name, values in histograms.items():
+                h = summed.setdefault(name, Histogram())
+                h.counts = [a + b for a, b in zip(h.counts, values["counts"])]
+                h.total += values["total"]
+                h.slow += values["slow"]
+        return summed
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._dirty = True
+
+    def prometheus(self) -> str:
+        """The histograms in the Prometheus text exposition format."""
+        lines = [
+            "# HELP cgmes_operation_seconds Latency of queries and callbacks.",
+            "# TYPE cgmes_operation_seconds histogram",
+        ]
+        histograms = self.histograms()
+        for name, h in sorted(histograms.items()):
+            label = f'operation="{_escape(name)}"'
+            cumulated = 0
+            for bound, count in zip(BUCKETS, h.counts):
+                cumulated += count
+                lines.append(
+                    f'cgmes_operation_seconds_bucket{{{label},le="{bound}"}} {cumulated}'
+                )
+            lines.append(
+                f'cgmes_operation_seconds_bucket{{{label},le="+Inf"}} {h.count}'
+            )
+            lines.append(f"cgmes_operation_seconds_sum{{{label}}} {h.total}")
+            lines.append(f"cgmes_operation_seconds_count{{{label}}} {h.count}")
+
+        lines += [
+            f"# HELP cgmes_slow_operations_total Operations slower than {self.slow}s.",
+            "# TYPE cgmes_slow_operations_total counter",
+        ]
+        for name, h in sorted(histograms.items()):
+            lines.append(
+                f'cgmes_slow_operations_total{{operation="{_escape(name)}"}} {h.slow}'
+            )
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def timed(
+    operation: str, method: bool = False
+) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """
+    Record the latency of each call of the decorated function in METRICS,
+    describing slow calls by their arguments and the size of their result.
+
+    :param method: whether the function is a method, whose first argument
+    is left out of descriptions
+    """
+
+    def decorate(f: Callable[P, R]) -> Callable[P, R]:
+        @functools.wraps(f)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            start = time.perf_counter()
+            result = f(*args, **kwargs)
+            METRICS.observe(
+                operation,
+                time.perf_counter() - start,
+                lambda: describe(args[method:], kwargs, result),
+            )
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def describe(args: tuple, kwargs: dict, result) -> str:
+    arguments = [_text(a) for a in args]
+    arguments += [f"{k}={_text(v)}" for k, v in kwargs.items()]
+    text = ", ".join(arguments)
+    if len(text) > MAX_DESCRIPTION:
+        text = text[:MAX_DESCRIPTION] + "..."
+    if isinstance(result, Sized) and not isinstance(result, str):
+        return f"({text}) -> {len(result)} results"
+    return f"({text})"
+
+
+def _text(value) -> str:
+    if isinstance(value, str):
+        return repr(" ".join(value.split()))  # queries on one line
+    if isinstance(value, Sized) and len(value) > 10:
+        return f"<{len(value)} {type(value).__name__}>"
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,94 @@
+import bisect
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
+from itertools import chain, takewhile
+
+import numpy as np
+from loguru import logger
+
+from .catalog import Element
+
+
+def normalize(name: str) -> str:
+    return name.strip().casefold()
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex:
+    """
+    Search elements by name: exact and prefix matches on the sorted names, and
+    substring matches through a trigram index. Matching ignores case and
+    surrounding spaces.
+    """
+
+    def __init__(self, elements: Sequence[Element]):
+        logger.info("indexing names...")
+        self.elements = elements
+        self._names = [normalize(str(e.name)) for e in elements]
+        self._order = sorted(range(len(elements)), key=self._names.__getitem__)
+        self._sorted = [self._names[i] for i in self._order]
+
+        postings: dict[str, list[int]] = defaultdict(list)
+        for i, name in enumerate(self._names):
+            for trigram in trigrams(name):
+                postings[trigram].append(i)
+        self._trigrams = {
+            trigram: np.array(ids, dtype=np.int32) for trigram, ids in postings.items()
+        }
+        logger.info(f"{len(self._trigrams)} trigrams indexed")
+
+    def exact(self, name: str) -> list[Element]:
+        name = normalize(name)
+        return [
+            self.elements[i]
+            for i in takewhile(lambda i: self._names[i] == name, self._prefixed(name))
+        ]
+
+    def search(
+        self, query: str, limit: int = 20, cim_type: str | None = None
+    ) -> list[Element]:
+        """
+        Elements whose name matches query: names starting with query, the exact
+        matches first, then names containing it, the shortest first. cim_type
+        optionally restricts the search to the elements of that type.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+
+        found: dict[int, None] = {}
+        for i in chain(self._prefixed(query), self._containing(query)):
+            if cim_type is not None and self.elements[i].cim_type != cim_type:
+                continue
+            found[i] = None
+            if len(found) >= limit:
+                break
+
+        return [self.elements[i] for i in found]
+
+    def _prefixed(self, query: str) -> Iterator[int]:
+        start = bisect.bisect_left(self._sorted, query)
+        for position in range(start, len(self._sorted)):
+            if not self._sorted[position].startswith(query):
+                break
+            yield self._order[position]
+
+    def _containing(self, query: str) -> Iterator[int]:
+        if len(query) < 3:
+            return
+        postings = []
+        for trigram in trigrams(query):
+            ids = self._trigrams.get(trigram)
+            if ids is None:
+                return
+            postings.append(ids)
+        postings.sort(key=len)
+        candidates = postings[0]
+        for ids in postings[1:]:
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+
+        found = [i for i in candidates.tolist() if query in self._names[i]]
+        yield from sorted(found, key=lambda i: len(self._names[i]))
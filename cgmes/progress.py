@@ -0,0 +1,95 @@
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from copy import copy
+from dataclasses import dataclass, replace
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class Stage:
+    name: str
+    status: str = PENDING
+    started: float | None = None
+    finished: float | None = None
+    error: str = ""
+
+    @property
+    def seconds(self) -> float | None:
+        if self.started is None:
+            return None
+        return (self.finished or time.monotonic()) - self.started
+
+
+class Progress:
+    """
+    Stages of loading a model (parsing each file, indexing, building the
+    catalog...), updated by the loader and readable from other threads.
+    """
+
+    def __init__(self):
+        self._stages: dict[str, Stage] = {}
+        self._lock = threading.Lock()
+        self._prefix = ""
+
+    def scoped(self, prefix: str) -> "Progress":
+        """
+        View of the same stages whose names are prefixed by prefix, for a
+        loader running next to others.
+        """
+        scoped = copy(self)
+        scoped._prefix = self._prefix + prefix
+        return scoped
+
+    def add(self, name: str):
+        """Declare a stage that will run later."""
+        name = self._prefix + name
+        with self._lock:
+            self._stages.setdefault(name, Stage(name))
+
+    def start(self, name: str):
+        name = self._prefix + name
+        with self._lock:
+            stage = self._stages.setdefault(name, Stage(name))
+            stage.status = RUNNING
+            stage.started = time.monotonic()
+
+    def done(self, name: str):
+        name = self._prefix + name
+        with self._lock:
+            stage = self._stages.setdefault(name, Stage(name))
+            stage.status = DONE
+            stage.finished = time.monotonic()
+
+    def fail(self, name: str, error: str):
+        name = self._prefix + name
+        with self._lock:
+            stage = self._stages.setdefault(name, Stage(name))
+            stage.status = FAILED
+            stage.finished = time.monotonic()
+            stage.error = error
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self.start(name)
+        try:
+            yield
+        except BaseException as e:
+            self.fail(name, str(e))
+            raise
+        self.done(name)
+
+    def stages(self) -> list[Stage]:
+        with self._lock:
+            return [replace(stage) for stage in self._stages.values()]
+
+    def is_done(self, name: str) -> bool:
+        name = self._prefix + name
+        with self._lock:
+            stage = self._stages.get(name)
+            return stage is not None and stage.status == DONE
@@ -0,0 +1,133 @@
+import os
+import xml.etree.ElementTree as ET
+from collections.abc import Generator, Iterator
+from typing import IO
+from urllib.parse import urldefrag, urljoin
+
+import rdflib as rdf
+from rdflib import RDF, term
+
+from .terms import Triple
+
+RDF_NS = "{" + str(RDF) + "}"
+XML_NS = "{http://www.w3.org/XML/1998/namespace}"
+
+RDF_ROOT = RDF_NS + "RDF"
+DESCRIPTION = RDF_NS + "Description"
+ID = RDF_NS + "ID"
+ABOUT = RDF_NS + "about"
+NODE_ID = RDF_NS + "nodeID"
+RESOURCE = RDF_NS + "resource"
+DATATYPE = RDF_NS + "datatype"
+PARSE_TYPE = RDF_NS + "parseType"
+XML_BASE = XML_NS + "base"
+XML_LANG = XML_NS + "lang"
+
+NODE_ATTRIBUTES = {ID, ABOUT, NODE_ID}
+
+
+class CGMESReader:
+    """
+    Streaming reader for the RDF/XML subset used by CGMES files: top level
+    elements identified by rdf:ID or rdf:about, whose children are literals or
+    rdf:resource references.
+
+    Each top level element is turned into triples as soon as it is closed and
+    then dropped, so memory stays bounded whatever the size of the file. URIs
+    are resolved against base exactly like rdflib's RDF/XML parser does.
+    """
+
+    def __init__(self, source: str | os.PathLike | IO[bytes], base: str):
+        self.source = source
+        self.base = base
+        self.namespaces: dict[str, str] = {}
+        self._uris: dict[str, rdf.URIRef] = {}
+        self._bnodes: dict[str, rdf.BNode] = {}
+        self._set_base(base)
+
+    def __iter__(self) -> Iterator[Triple]:
+        depth = 0
+        root = None
+        events = ET.iterparse(self.source, events=("start-ns", "start", "end"))
+        for event, elem in events:
+            if event == "start-ns":
+                prefix, uri = elem
+                self.namespaces[prefix] = uri
+            elif event == "start":
+                if root is None:
+                    root = elem
+                    self._set_base(elem.get(XML_BASE, self.base))
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 1 and root is not None and root.tag == RDF_ROOT:
+                    yield from self._node(elem)
+                    root.clear()
+                elif depth == 0 and elem.tag != RDF_ROOT:
+                    yield from self._node(elem)
+
+    def _set_base(self, base: str):
+        self._base = base
+        self._document = urldefrag(base)[0]
+
+    def _resolve(self, reference: str) -> rdf.URIRef:
+        if reference.startswith("#"):
+            return rdf.URIRef(self._document + reference)
+        return rdf.URIRef(urljoin(self._base, reference))
+
+    def _uri(self, tag: str) -> rdf.URIRef:
+        uri = self._uris.get(tag)
+        if uri is None:
+            uri = self._uris[tag] = rdf.URIRef(tag[1:].replace("}", "", 1))
+        return uri
+
+    def _bnode(self, node_id: str) -> rdf.BNode:
+        bnode = self._bnodes.get(node_id)
+        if bnode is None:
+            bnode = self._bnodes[node_id] = rdf.BNode()
+        return bnode
+
+    def _subject(self, elem: ET.Element) -> term.Node:
+        if (id := elem.get(ID)) is not None:
+            return self._resolve("#" + id)
+        if (about := elem.get(ABOUT)) is not None:
+            return self._resolve(about)
+        if (node_id := elem.get(NODE_ID)) is not None:
+            return self._bnode(node_id)
+        return rdf.BNode()
+
+    def _node(self, elem: ET.Element) -> Generator[Triple, None, term.Node]:
+        s = self._subject(elem)
+        if elem.tag != DESCRIPTION:
+            yield s, RDF.type, self._uri(elem.tag)
+        for name, value in elem.attrib.items():
+            if name not in NODE_ATTRIBUTES and not name.startswith(XML_NS):
+                yield s, self._uri(name), rdf.Literal(value)
+        yield from self._properties(s, elem)
+        return s
+
+    def _properties(
+        self, s: term.Node, elem: ET.Element
+    ) -> Generator[Triple, None, None]:
+        for prop in elem:
+            o = yield from self._object(prop)
+            yield s, self._uri(prop.tag), o
+
+    def _object(self, prop: ET.Element) -> Generator[Triple, None, term.Node]:
+        if (resource := prop.get(RESOURCE)) is not None:
+            return self._resolve(resource)
+        if (node_id := prop.get(NODE_ID)) is not None:
+            return self._bnode(node_id)
+        if prop.get(PARSE_TYPE) == "Resource":
+            o = rdf.BNode()
+            yield from self._properties(o, prop)
+            return o
+        if len(prop) > 0:
+            return (yield from self._node(prop[0]))
+
+        datatype = prop.get(DATATYPE)
+        return rdf.Literal(
+            prop.text or "",
+            lang=prop.get(XML_LANG),
+            datatype=self._resolve(datatype) if datatype else None,
+        )
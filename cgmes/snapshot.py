@@ -0,0 +1,188 @@
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from .catalog import Catalog
+from .compact import CompactIndex
+from .explorer import LOADER_VERSION, FilePrefix, Graph
+from .files import FileIndex, Files, MappedFileIndex
+from .sqlite import file_rdfids
+from .terms import StringArray
+
+MAGIC = b"CGMESNAP"
+FORMAT_VERSION = 4
+ALIGNMENT = 8
+
+
+def save_snapshot(graph: Graph, path: Path | str):
+    """
+    Write the indexed triples of graph to path: a JSON header followed by the
+    arrays of a CompactIndex of its triples, the columns of the element catalog
+    and the files of each RDFID.
+
+    Graphs of the other backends, and workspace views, are converted first:
+    their triples, catalog and files are then all read into memory.
+    """
+    assert graph.index is not None
+    path = Path(path)
+    logger.info(f"writing snapshot {path}")
+
+    index = CompactIndex.from_index(graph.index)
+    sections = dict(index.arrays)
+
+    catalog = graph.elements
+    if not isinstance(catalog, Catalog):
+        catalog = Catalog.build(catalog.rows())
+    sections |= _strings("catalog_id", catalog.ids)
+    sections |= _strings("catalog_name", catalog.names)
+    sections["catalog_types"] = catalog.type_codes
+    sections["catalog_files"] = catalog.file_codes
+
+    if graph.files is not None:
+        files = graph.files
+        if not isinstance(files, MappedFileIndex):
+            files = MappedFileIndex(*_file_index(files).to_arrays())
+        sections |= _strings("files_id", files.rdfids)
+        sections["files_ptr"] = files.ptr
+        sections["files_codes"] = files.codes
+
+    header: dict = {
+        "format": FORMAT_VERSION,
+        "loader": LOADER_VERSION,
+        "filenames": [[f.filename, f.prefix] for f in graph.filenames],
+        "namespaces": [[prefix, str(ns)] for prefix, ns in graph.graph.namespaces()],
+        "types": catalog.types,
+        "sections": {},
+    }
+    offset = 0
+    for name, array in sections.items():
+        header["sections"][name] = [array.dtype.str, len(array), offset]
+        offset = _align(offset + array.nbytes)
+
+    raw_header = json.dumps(header).encode()
+    start = _align(len(MAGIC) + 4 + len(raw_header))
+
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(raw_header)) + raw_header)
+        for name, array in sections.items():
+            f.seek(start + header["sections"][name][2])
+            f.write(array.tobytes())
+    os.replace(tmp, path)
+    logger.info(f"snapshot written: {index.terms} terms, {len(index)} triples")
+
+
+def load_snapshot(path: Path | str) -> Graph:
+    """
+    Open a snapshot written by save_snapshot. Arrays are memory-mapped, so
+    opening is immediate and pages are read, and shared between processes,
+    on demand.
+    """
+    index = SnapshotIndex(path)
+    graph = Graph()
+    for prefix, ns in index.header["namespaces"]:
+        graph.graph.bind(prefix, ns, override=True, replace=True)
+    graph.filenames = [
+        FilePrefix(name, prefix) for name, prefix in index.header["filenames"]
+    ]
+    graph.index = index
+    arrays = index.arrays
+    graph.catalog = Catalog(
+        _string_array(arrays, "catalog_id"),
+        _string_array(arrays, "catalog_name"),
+        index.header["types"],
+        arrays["catalog_types"],
+        arrays["catalog_files"],
+    )
+    if "files_ptr" in arrays:
+        graph.files = MappedFileIndex(
+            _string_array(arrays, "files_id"),
+            arrays["files_ptr"],
+            arrays["files_codes"],
+        )
+    return graph
+
+
+def snapshot_is_current(path: Path | str) -> bool:
+    """
+    Whether path is a snapshot written by this version of the loader. Anything
+    else (missing file, older format, pickled graph) has to be rebuilt.
+    """
+    path = Path(path)
+    if not path.exists():
+        return False
+    try:
+        with open(path, "rb") as f:
+            header = _read_header(f.read(len(MAGIC) + 4), f)
+    except ValueError as e:
+        logger.warning(f"{path} is not a valid snapshot: {e}")
+        return False
+    if header["format"] != FORMAT_VERSION or header["loader"] != LOADER_VERSION:
+        logger.warning(f"{path} was written by another version of the loader")
+        return False
+    return True
+
+
+class SnapshotIndex(CompactIndex):
+    """CompactIndex over the arrays of a memory-mapped snapshot."""
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.header = _read_header(self._mmap[: len(MAGIC) + 4], self._mmap)
+        raw_header_length = struct.unpack_from("<I", self._mmap, len(MAGIC))[0]
+        start = _align(len(MAGIC) + 4 + raw_header_length)
+        super().__init__(
+            {
+                name: np.frombuffer(
+                    self._mmap, dtype=dtype, count=count, offset=start + offset
+                )
+                for name, (dtype, count, offset) in self.header["sections"].items()
+            }
+        )
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+
+def _file_index(files: Files) -> FileIndex:
+    if isinstance(files, FileIndex):
+        return files
+    index = FileIndex()
+    for rdfid in file_rdfids(files):
+        for file in files.files(rdfid):
+            index.masks[rdfid] = index.masks.get(rdfid, 0) | (1 << file)
+    return index
+
+
+def _strings(name: str, strings: StringArray) -> dict[str, np.ndarray]:
+    return {f"{name}_offsets": strings.offsets, f"{name}_blob": strings.blob}
+
+
+def _string_array(arrays: dict[str, np.ndarray], name: str) -> StringArray:
+    return StringArray(arrays[f"{name}_offsets"], arrays[f"{name}_blob"])
+
+
+def _read_header(prefix: bytes, source) -> dict:
+    if len(prefix) < len(MAGIC) + 4 or not prefix.startswith(MAGIC):
+        raise ValueError("unknown file format")
+    length = struct.unpack_from("<I", prefix, len(MAGIC))[0]
+    if isinstance(source, mmap.mmap):
+        raw = source[len(MAGIC) + 4 : len(MAGIC) + 4 + length]
+    else:
+        raw = source.read(length)
+    return json.loads(raw)
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,569 @@
+import functools
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from pathlib import Path
+from typing import overload
+
+import numpy as np
+from loguru import logger
+from rdflib import term
+
+from .catalog import Element, Row
+from .files import FileIndex, Files, MappedFileIndex, UnionFileIndex
+from .index import Edge
+from .names import normalize
+from .terms import Triple, decode_term, encode_term
+
+# triples sent to SQLite at once while loading
+CHUNK = 100_000
+# pages of the database kept in memory by each connection, in KiB
+CACHE_KIB = 64 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS triples (
+    s INTEGER NOT NULL, p INTEGER NOT NULL, o INTEGER NOT NULL,
+    PRIMARY KEY (s, p, o)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS files (
+    rdfid TEXT NOT NULL, file INTEGER NOT NULL, PRIMARY KEY (rdfid, file)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS elements (
+    id INTEGER PRIMARY KEY,
+    rdfid TEXT NOT NULL,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    normalized TEXT NOT NULL,
+    file INTEGER NOT NULL
+);
+"""
+
+# created once the triples are loaded, which is faster than maintaining them
+# while inserting; the primary key of triples already covers lookups by
+# subject, and secondary indexes of a WITHOUT ROWID table hold the whole key
+TRIPLE_INDEXES = """
+CREATE INDEX IF NOT EXISTS triples_by_object ON triples (o, p);
+CREATE INDEX IF NOT EXISTS triples_by_predicate ON triples (p);
+"""
+ELEMENT_INDEXES = """
+CREATE INDEX IF NOT EXISTS elements_by_type ON elements (type, normalized);
+CREATE INDEX IF NOT EXISTS elements_by_name ON elements (normalized);
+"""
+# substring search, when SQLite has FTS5
+NAME_SEARCH = """
+CREATE VIRTUAL TABLE IF NOT EXISTS element_names USING fts5(
+    normalized, content='elements', content_rowid='id', tokenize='trigram'
+);
+INSERT INTO element_names (element_names) VALUES ('rebuild');
+"""
+
+
+class SQLiteIndex:
+    """
+    Triples of a model in a SQLite file, read on demand: terms are interned in
+    a table of encoded strings and triples are rows of term ids, indexed by
+    subject, by object and by predicate. Memory use is bounded by the page
+    cache of SQLite, whatever the size of the model.
+
+    Each thread (and each forked process) gets its own connection, which only
+    reads, except while the catalog is stored.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._local = threading.local()
+        self.term = functools.lru_cache(maxsize=1 << 16)(decode_term)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.connection = connect(self.path)
+            local.pid = os.getpid()
+        return local.connection
+
+    def meta(self, key: str) -> str | None:
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def outgoing(self, s: term.Node) -> list[Edge]:
+        rows = self.connection.execute(
+            """
+            SELECT p.term, o.term FROM terms AS s
+            JOIN triples AS t ON t.s = s.id
+            JOIN terms AS p ON p.id = t.p
+            JOIN terms AS o ON o.id = t.o
+            WHERE s.term = ?
+            """,
+            (encode_term(s),),
+        )
+        return [(self.term(p), self.term(o)) for p, o in rows]
+
+    def incoming(self, o: term.Node) -> list[Edge]:
+        """Edges pointing to o, which can also be a literal, e.g. a name."""
+        rows = self.connection.execute(
+            """
+            SELECT p.term, s.term FROM terms AS o
+            JOIN triples AS t INDEXED BY triples_by_object ON t.o = o.id
+            JOIN terms AS p ON p.id = t.p
+            JOIN terms AS s ON s.id = t.s
+            WHERE o.term = ?
+            """,
+            (encode_term(o),),
+        )
+        return [(self.term(p), self.term(s)) for p, s in rows]
+
+    def pairs(self, p: term.Node) -> list[tuple[term.Node, term.Node]]:
+        """(subject, object) of every triple with predicate p."""
+        rows = self.connection.execute(
+            """
+            SELECT s.term, o.term FROM terms AS p
+            JOIN triples AS t INDEXED BY triples_by_predicate ON t.p = p.id
+            JOIN terms AS s ON s.id = t.s
+            JOIN terms AS o ON o.id = t.o
+            WHERE p.term = ?
+            """,
+            (encode_term(p),),
+        )
+        return [(self.term(s), self.term(o)) for s, o in rows]
+
+    def named(
+        self, type_predicate: term.Node, name_predicate: term.Node
+    ) -> Iterator[tuple[term.Node, term.Node, term.Node]]:
+        """(subject, type, name) of the subjects having both predicates."""
+        rows = self.connection.execute(
+            """
+            SELECT s.term, k.term, n.term FROM triples AS t
+            JOIN triples AS named ON named.s = t.s AND named.p = :name
+            JOIN terms AS s ON s.id = t.s
+            JOIN terms AS k ON k.id = t.o
+            JOIN terms AS n ON n.id = named.o
+            WHERE t.p = :type
+            """,
+            {"type": self._id(type_predicate), "name": self._id(name_predicate)},
+        )
+        for s, kind, name in rows:
+            yield decode_term(s), self.term(kind), decode_term(name)
+
+    def subjects(self) -> Iterator[term.Node]:
+        rows = self.connection.execute(
+            """
+            SELECT terms.term FROM (SELECT DISTINCT s FROM triples) AS subjects
+            JOIN terms ON terms.id = subjects.s
+            """
+        )
+        for (text,) in rows:
+            yield decode_term(text)
+
+    def _id(self, node: term.Node) -> int | None:
+        row = self.connection.execute(
+            "SELECT id FROM terms WHERE term = ?", (encode_term(node),)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def __len__(self) -> int:
+        return int(self.meta("triples") or 0)
+
+    @property
+    def terms(self) -> int:
+        return int(self.meta("terms") or 0)
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+
+class SQLiteIndexBuilder:
+    """
+    Streams the triples of a model into a new SQLite file while it is loaded,
+    a chunk at a time: terms are interned and triples deduplicated by SQLite,
+    so memory use does not grow with the model.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        for suffix in ("", "-journal"):
+            Path(f"{self.path}{suffix}").unlink(missing_ok=True)
+        self.connection = connect(self.path, bulk=True)
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(
+            "CREATE TEMP TABLE staged (s TEXT NOT NULL, p TEXT NOT NULL, o TEXT NOT NULL)"
+        )
+        self.files = SQLiteFileIndex(self)
+
+    def add_all(self, triples: Iterable[Triple]):
+        encoded = (
+            (encode_term(s), encode_term(p), encode_term(o)) for s, p, o in triples
+        )
+        while chunk := list(islice(encoded, CHUNK)):
+            self._insert(chunk)
+
+    def _insert(self, chunk: list[tuple[str, str, str]]):
+        with self.connection:
+            self.connection.executemany("INSERT INTO staged VALUES (?, ?, ?)", chunk)
+            self.connection.execute(
+                """
+                INSERT OR IGNORE INTO terms (term)
+                SELECT s FROM staged UNION SELECT p FROM staged UNION SELECT o FROM staged
+                """
+            )
+            self.connection.execute(
+                """
+                INSERT OR IGNORE INTO triples
+                SELECT s.id, p.id, o.id FROM staged
+                JOIN terms AS s ON s.term = staged.s
+                JOIN terms AS p ON p.term = staged.p
+                JOIN terms AS o ON o.term = staged.o
+                """
+            )
+            self.connection.execute("DELETE FROM staged")
+
+    def build(self) -> SQLiteIndex:
+        logger.info("indexing triples in the database...")
+        self.files.flush()
+        with self.connection:
+            self.connection.executescript(TRIPLE_INDEXES)
+            triples = self.connection.execute("SELECT count(*) FROM triples")
+            terms = self.connection.execute("SELECT count(*) FROM terms")
+            write_meta(
+                self.connection,
+                {"triples": triples.fetchone()[0], "terms": terms.fetchone()[0]},
+            )
+        self.connection.execute("ANALYZE")
+        self.connection.close()
+        index = SQLiteIndex(self.path)
+        logger.info(f"{index.terms} terms, {len(index)} triples stored in {self.path}")
+        return index
+
+
+class SQLiteFileIndex:
+    """
+    FileIndex stored in the files table: the files defining or referencing
+    each RDFID, as (rdfid, file) rows.
+
+    :param database: SQLiteIndexBuilder while the model loads, SQLiteIndex
+    once it is read
+    """
+
+    def __init__(self, database: SQLiteIndex | SQLiteIndexBuilder):
+        self.database = database
+        self._pending: set[tuple[str, int]] = set()
+
+    def track(
+        self, triples: Iterable[Triple], namespace: str, file: int
+    ) -> Iterator[Triple]:
+        """
+        Pass triples through, recording the RDFIDs of the resources of
+        namespace (the namespace of file) they mention.
+        """
+        pending = self._pending
+        length = len(namespace)
+        for triple in triples:
+            s, _, o = triple
+            if isinstance(s, term.URIRef) and s.startswith(namespace):
+                pending.add((s[length:], file))
+            if isinstance(o, term.URIRef) and o.startswith(namespace):
+                pending.add((o[length:], file))
+            if len(pending) >= CHUNK:
+                self.flush()
+            yield triple
+
+    def update(self, index: Files):
+        """Store the files of another index, e.g. filled from the rdflib store."""
+        for rdfid in file_rdfids(index):
+            self._pending.update((rdfid, file) for file in index.files(rdfid))
+            if len(self._pending) >= CHUNK:
+                self.flush()
+        self.flush()
+
+    def rdfids(self) -> Iterator[str]:
+        rows = self.database.connection.execute("SELECT DISTINCT rdfid FROM files")
+        for (rdfid,) in rows:
+            yield rdfid
+
+    def flush(self):
+        with self.database.connection as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO files VALUES (?, ?)", self._pending
+            )
+        self._pending = set()
+
+    def files(self, rdfid: str) -> list[int]:
+        rows = self.database.connection.execute(
+            "SELECT file FROM files WHERE rdfid = ?", (rdfid,)
+        )
+        return [file for (file,) in rows]
+
+
+def file_rdfids(files: Files) -> Iterable[str]:
+    """RDFIDs of a file index of any kind, those of whom it knows files."""
+    if isinstance(files, FileIndex):
+        return files.masks
+    if isinstance(files, MappedFileIndex):
+        return files.rdfids
+    if isinstance(files, SQLiteFileIndex):
+        return files.rdfids()
+    if isinstance(files, UnionFileIndex):
+        return {
+            rdfid
+            for part in files.parts
+            if part is not None
+            for rdfid in file_rdfids(part)
+        }
+    raise ValueError(f"cannot list the RDFIDs of {type(files).__name__}")
+
+
+class SQLiteCatalog:
+    """
+    Catalog stored in the elements table of the database of index: element i
+    is the row of id i + 1. Elements are read on demand, by position, CIM type
+    or name.
+    """
+
+    def __init__(self, index: SQLiteIndex):
+        self.index = index
+        connection = index.connection
+        self._length = connection.execute("SELECT count(*) FROM elements").fetchone()[0]
+        self._counts = dict(
+            connection.execute(
+                "SELECT type, count(*) FROM elements GROUP BY type ORDER BY type"
+            ).fetchall()
+        )
+        self.types = list(self._counts)
+        self.searchable = (
+            connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'element_names'"
+            ).fetchone()
+            is not None
+        )
+
+    @classmethod
+    def build(cls, index: SQLiteIndex, rows: Iterable[Row]) -> "SQLiteCatalog":
+        """rows are (rdfid, cim type, name, file index) tuples"""
+        logger.info("storing elements...")
+        # written by the connection reading rows, which another connection
+        # could not do without waiting for it
+        connection = index.connection
+        connection.execute("PRAGMA query_only = OFF")
+        try:
+            with connection:
+                connection.execute("DELETE FROM elements")
+                records = (
+                    (rdfid, cim_type, name, normalize(name), file)
+                    for rdfid, cim_type, name, file in rows
+                )
+                while chunk := list(islice(records, CHUNK)):
+                    connection.executemany(
+                        """
+                        INSERT INTO elements (rdfid, type, name, normalized, file)
+                        VALUES (?, ?, ?, ?, ?)
+                        """,
+                        chunk,
+                    )
+                connection.executescript(ELEMENT_INDEXES)
+            try:
+                with connection:
+                    connection.executescript(NAME_SEARCH)
+            except sqlite3.OperationalError as e:
+                logger.warning(f"no substring search on names, {e}")
+        finally:
+            connection.execute("PRAGMA query_only = ON")
+
+        catalog = cls(index)
+        logger.info(f"{len(catalog)} elements stored")
+        return catalog
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, i: int) -> Element: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[Element]: ...
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        element = self.get_many([i + 1])
+        if not element:
+            raise IndexError(i)
+        return element[0]
+
+    def __iter__(self) -> Iterator[Element]:
+        rows = self.index.connection.execute(
+            "SELECT rdfid, type, name FROM elements ORDER BY id"
+        )
+        for row in rows:
+            yield Element(*row)
+
+    def rows(self) -> Iterator[Row]:
+        """(rdfid, cim type, name, file index) of each element, as given to build."""
+        yield from self.index.connection.execute(
+            "SELECT rdfid, type, name, file FROM elements ORDER BY id"
+        )
+
+    def get_many(self, ids: list[int]) -> list[Element]:
+        """Elements of the given row ids, in that order."""
+        found = {}
+        connection = self.index.connection
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            rows = connection.execute(
+                "SELECT id, rdfid, type, name FROM elements "
+                f"WHERE id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for id, rdfid, cim_type, name in rows:
+                found[id] = Element(rdfid, cim_type, name)
+        return [found[id] for id in ids if id in found]
+
+    def type_code(self, cim_type: str) -> int | None:
+        try:
+            return self.types.index(cim_type)
+        except ValueError:
+            return None
+
+    def count_by_type(self) -> dict[str, int]:
+        return dict(self._counts)
+
+    def filter(
+        self, cim_type: str | None = None, file: int | None = None
+    ) -> np.ndarray:
+        """Boolean mask of the elements of the given CIM type and file index."""
+        conditions: list[str] = []
+        values: list[str | int] = []
+        if cim_type is not None:
+            conditions.append("type = ?")
+            values.append(cim_type)
+        if file is not None:
+            conditions.append("file = ?")
+            values.append(file)
+        mask = np.zeros(len(self), dtype=bool)
+        if not conditions:
+            mask[:] = True
+            return mask
+        rows = self.index.connection.execute(
+            f"SELECT id FROM elements WHERE {' AND '.join(conditions)}", values
+        )
+        ids = np.fromiter((id for (id,) in rows), dtype=np.int64)
+        mask[ids - 1] = True
+        return mask
+
+    def sample(self, k: int = 1, cim_type: str | None = None) -> list[Element]:
+        if cim_type is None:
+            if len(self) == 0:
+                return []
+            ids = np.random.randint(len(self), size=k) + 1
+            return self.get_many(ids.tolist())
+        rows = self.index.connection.execute(
+            "SELECT rdfid, type, name FROM elements WHERE type = ? "
+            "ORDER BY random() LIMIT ?",
+            (cim_type, k),
+        )
+        return [Element(*row) for row in rows]
+
+
+class SQLiteNameIndex:
+    """
+    NameIndex over the elements table: exact and prefix matches on the index
+    of normalized names, substring matches through a trigram full-text index
+    (or a scan of the names, without FTS5).
+    """
+
+    def __init__(self, catalog: SQLiteCatalog):
+        self.catalog = catalog
+
+    def exact(self, name: str) -> list[Element]:
+        rows = self.catalog.index.connection.execute(
+            "SELECT rdfid, type, name FROM elements WHERE normalized = ? ORDER BY id",
+            (normalize(name),),
+        )
+        return [Element(*row) for row in rows]
+
+    def search(
+        self, query: str, limit: int = 20, cim_type: str | None = None
+    ) -> list[Element]:
+        """
+        Elements whose name matches query: names starting with query, the exact
+        matches first, then names containing it, the shortest first. cim_type
+        optionally restricts the search to the elements of that type, in the
+        queries themselves.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+
+        found: dict[int, None] = {}
+        for (id,) in self._matches(query, cim_type):
+            found[id] = None
+            if len(found) >= limit:
+                break
+        return self.catalog.get_many(list(found))
+
+    def _matches(self, query: str, cim_type: str | None) -> Iterator[tuple[int]]:
+        connection = self.catalog.index.connection
+        prefix = (query, query + "\U0010ffff")
+        if cim_type is None:
+            yield from connection.execute(
+                "SELECT id FROM elements INDEXED BY elements_by_name "
+                "WHERE normalized >= ? AND normalized < ? ORDER BY normalized",
+                prefix,
+            )
+        else:
+            yield from connection.execute(
+                "SELECT id FROM elements INDEXED BY elements_by_type "
+                "WHERE type = ? AND normalized >= ? AND normalized < ? "
+                "ORDER BY normalized",
+                (cim_type, *prefix),
+            )
+        if len(query) < 3:
+            return
+        typed = "" if cim_type is None else " AND type = ?"
+        values = () if cim_type is None else (cim_type,)
+        if self.catalog.searchable:
+            phrase = '"' + query.replace('"', '""') + '"'
+            yield from connection.execute(
+                "SELECT id FROM element_names JOIN elements ON id = element_names.rowid "
+                f"WHERE element_names MATCH ?{typed} "
+                "ORDER BY length(elements.normalized)",
+                (phrase, *values),
+            )
+        else:
+            yield from connection.execute(
+                f"SELECT id FROM elements WHERE instr(normalized, ?) > 0{typed} "
+                "ORDER BY length(normalized)",
+                (query, *values),
+            )
+
+
+def connect(path: Path | str, bulk: bool = False) -> sqlite3.Connection:
+    """
+    :param bulk: whether the connection loads a new database, which is then
+    written without a journal, and otherwise only reads
+    """
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute(f"PRAGMA cache_size = -{CACHE_KIB}")
+    if bulk:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+    else:
+        connection.execute("PRAGMA query_only = ON")
+    return connection
+
+
+def write_meta(connection: sqlite3.Connection, values: dict):
+    connection.executemany(
+        "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+        [(key, str(value)) for key, value in values.items()],
+    )
@@ -0,0 +1,107 @@
+from array import array
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from typing import overload
+
+import numpy as np
+import rdflib as rdf
+from rdflib import term
+from rdflib.util import from_n3
+
+Triple = tuple[term.Node, term.Node, term.Node]
+
+
+def encode_term(node: term.Node) -> str:
+    """
+    Compact, lossless text form of an rdflib term. The first character tells
+    the kind of term: U(RI), B(lank node), L(iteral) for plain literals, or a
+    full N(3) form for typed and language-tagged literals.
+    """
+    if isinstance(node, rdf.URIRef):
+        return "U" + str(node)
+    if isinstance(node, rdf.BNode):
+        return "B" + str(node)
+    if isinstance(node, rdf.Literal) and not node.datatype and not node.language:
+        return "L" + str(node)
+    return "N" + node.n3()
+
+
+def decode_term(text: str) -> term.Node:
+    kind, value = text[0], text[1:]
+    if kind == "U":
+        return rdf.URIRef(value)
+    if kind == "B":
+        return rdf.BNode(value)
+    if kind == "L":
+        return rdf.Literal(value)
+    node = from_n3(value)
+    if not isinstance(node, term.Node):
+        raise TypeError(f"not an encoded term: {text}")
+    return node
+
+
+@dataclass
+class TripleBatch:
+    """
+    Picklable set of triples: each distinct term is encoded once in terms, and
+    triples holds three indexes into it per triple.
+    """
+
+    terms: list[str] = field(default_factory=list)
+    triples: array = field(default_factory=lambda: array("I"))
+    namespaces: list[tuple[str, str]] = field(default_factory=list)
+
+    @classmethod
+    def from_triples(cls, triples: Iterable[Triple]) -> "TripleBatch":
+        batch = cls()
+        ids: dict[term.Node, int] = {}
+        for triple in triples:
+            for node in triple:
+                id = ids.get(node)
+                if id is None:
+                    id = ids[node] = len(batch.terms)
+                    batch.terms.append(encode_term(node))
+                batch.triples.append(id)
+        return batch
+
+    def __iter__(self):
+        nodes = [decode_term(text) for text in self.terms]
+        ids = self.triples
+        for i in range(0, len(ids), 3):
+            yield nodes[ids[i]], nodes[ids[i + 1]], nodes[ids[i + 2]]
+
+    def __len__(self) -> int:
+        return len(self.triples) // 3
+
+
+class StringArray(Sequence[str]):
+    """
+    Strings packed in one UTF-8 buffer: string i is blob[offsets[i] :
+    offsets[i + 1]]. The arrays can be memory-mapped.
+    """
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> "StringArray":
+        encoded = [text.encode() for text in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @overload
+    def __getitem__(self, i: int) -> str: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[str]: ...
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return self.blob[start:stop].tobytes().decode()
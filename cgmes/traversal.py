@@ -0,0 +1,44 @@
+from collections.abc import Callable, Iterable
+
+from loguru import logger
+
+
+def breadth_first(
+    root: str,
+    neighbours: Callable[[list[str]], Iterable[str]],
+    depth: int,
+    max_nodes: int,
+    key: Callable[[str], str] = lambda node: node,
+) -> dict[str, int]:
+    """
+    Visit nodes level by level starting from root.
+
+    :param neighbours: called once per level with the whole frontier
+    :param depth: maximum number of hops from root
+    :param max_nodes: maximum number of nodes returned, root included
+    :param key: identity of a node, nodes with the same key are visited once
+    :return: the visited nodes with their hop distance, nearest first
+    """
+    if max_nodes <= 0 or depth < 0:
+        return {}
+
+    found = {root: 0}
+    seen = {key(root)}
+    frontier = [root]
+    hops = 0
+    while frontier and hops < depth:
+        hops += 1
+        next_frontier = []
+        for node in neighbours(frontier):
+            node_key = key(node)
+            if node_key in seen:
+                continue
+            if len(found) >= max_nodes:
+                logger.warning("max nodes reached. results will be truncated")
+                return found
+            seen.add(node_key)
+            found[node] = hops
+            next_frontier.append(node)
+        frontier = next_frontier
+
+    return found
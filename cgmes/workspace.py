@@ -0,0 +1,218 @@
+import re
+import threading
+import zipfile
+from collections.abc import Callable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from loguru import logger
+from rdflib import term
+
+from .cache import CacheManager
+from .catalog import Catalog
+from .compact import CompactIndex
+from .explorer import FILE_NS, FilePrefix, Graph
+from .files import UnionFileIndex
+from .index import Edge, Index
+from .progress import Progress
+from .sqlite import SQLiteIndex
+
+# boundary profiles of the ENTSO-E boundary set, e.g. ..._ENTSOE_EQBD_001.xml or
+# ..._EQ_BD.xml, shared by all the models of a CGM
+BOUNDARY = re.compile(r"(EQ|TP)_?BD", re.IGNORECASE)
+
+
+def is_boundary(filename: str) -> bool:
+    return BOUNDARY.search(Path(filename).name) is not None
+
+
+def filenames(source: Path | str) -> list[str]:
+    """Names of the CGMES files of a zip or a folder, as loaded from it."""
+    source = Path(source)
+    if source.is_dir():
+        return sorted(f.name for f in source.glob("*.xml"))
+    with zipfile.ZipFile(source) as archive:
+        return archive.namelist()
+
+
+class Workspace:
+    """
+    Several models, e.g. the IGMs of a CGM, sharing one boundary set.
+
+    The boundary profiles are loaded once, from boundary or, without it, from
+    the first model holding some, and left out of every model. Models are
+    loaded when first asked for, or in parallel for their merge, and cached
+    without their boundary profiles. A model, or the merge of all of them, is
+    then a view over the loaded parts (see merge), so switching between them
+    loads nothing again.
+    """
+
+    def __init__(
+        self,
+        models: Mapping[str, Path | str],
+        boundary: Path | str | None = None,
+        cache: CacheManager | None = None,
+        workers: int = 1,
+    ):
+        """
+        :param models: zip files or folders of the models, by name
+        :param boundary: zip file or folder of the boundary set
+        """
+        self.sources = {name: Path(source) for name, source in models.items()}
+        self.boundary_source = Path(boundary) if boundary is not None else None
+        self.cache = cache or CacheManager()
+        self.workers = workers
+        self._loaded: dict[tuple[str, ...], Graph | None] = {}
+        self._locks: dict[tuple[str, ...], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.sources)
+
+    def boundary(self, progress: Progress | None = None) -> Graph | None:
+        """The boundary set, None if no source has one."""
+        progress = progress or Progress()
+
+        def load() -> Graph | None:
+            if self.boundary_source is not None:
+                return self.cache.load(
+                    self.boundary_source,
+                    self.workers,
+                    progress.scoped("boundary: "),
+                )
+            for source in self.sources.values():
+                files = [f for f in filenames(source) if is_boundary(f)]
+                if files:
+                    logger.info(f"using the boundary set of {source}")
+                    return self.cache.load(
+                        source, self.workers, progress.scoped("boundary: "), files
+                    )
+            logger.warning("no boundary set in the workspace")
+            return None
+
+        return self._once(("boundary",), load)
+
+    def part(self, name: str, progress: Progress | None = None) -> Graph:
+        """Model name without its boundary profiles."""
+        progress = progress or Progress()
+        source = self.sources[name]
+
+        def load() -> Graph:
+            files = [f for f in filenames(source) if not is_boundary(f)]
+            return self.cache.load(
+                source, self.workers, progress.scoped(f"{name}: "), files
+            )
+
+        graph = self._once(("part", name), load)
+        assert graph is not None
+        return graph
+
+    def model(self, name: str, progress: Progress | None = None) -> Graph:
+        """Model name with the boundary set."""
+
+        def load() -> Graph:
+            boundary = self.boundary(progress)
+            return merge([self.part(name, progress), *_some(boundary)])
+
+        graph = self._once(("model", name), load)
+        assert graph is not None
+        return graph
+
+    def merged(self, progress: Progress | None = None) -> Graph:
+        """All the models and the boundary set, as one model."""
+
+        def load() -> Graph:
+            with ThreadPoolExecutor(len(self.sources) + 1) as pool:
+                boundary = pool.submit(self.boundary, progress)
+                parts = list(pool.map(lambda n: self.part(n, progress), self.sources))
+                return merge([*parts, *_some(boundary.result())])
+
+        graph = self._once(("merged",), load)
+        assert graph is not None
+        return graph
+
+    def _once(
+        self, key: tuple[str, ...], load: Callable[[], Graph | None]
+    ) -> Graph | None:
+        """load() the first time key is asked for, its result afterwards."""
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._loaded:
+                self._loaded[key] = load()
+            return self._loaded[key]
+
+
+def merge(graphs: list[Graph]) -> Graph:
+    """
+    Graph viewing graphs as one model, without copying their triples: its
+    index looks up each of theirs, and their files are renumbered one after
+    the other. Only the element catalog is copied, to search the model as a
+    whole.
+    """
+    merged = Graph()
+    offsets = []
+    for graph in graphs:
+        offsets.append(len(merged.filenames))
+        for prefix, namespace in graph.graph.namespaces():
+            if not prefix.startswith(FILE_NS):
+                merged.graph.bind(prefix, namespace, override=False)
+        for f in graph.filenames:
+            renamed = FilePrefix(f.filename, str(len(merged.filenames)))
+            merged.filenames.append(renamed)
+            file_namespace = graph.graph.store.namespace(FILE_NS + f.prefix)
+            if file_namespace is not None:
+                merged.graph.bind(FILE_NS + renamed.prefix, file_namespace)
+
+    indexes = []
+    for graph in graphs:
+        assert graph.index is not None
+        indexes.append(graph.index)
+    merged.index = UnionIndex(indexes)
+    merged.files = UnionFileIndex([graph.files for graph in graphs], offsets)
+    merged.catalog = Catalog.build(
+        (rdfid, cim_type, name, offset + file)
+        for graph, offset in zip(graphs, offsets)
+        for rdfid, cim_type, name, file in graph.elements.rows()
+    )
+    return merged
+
+
+class UnionIndex:
+    """Index of several indexes, whose triples are disjoint."""
+
+    def __init__(self, indexes: list[Index]):
+        self.indexes = indexes
+
+    def outgoing(self, s: term.Node) -> list[Edge]:
+        return [edge for index in self.indexes for edge in index.outgoing(s)]
+
+    def incoming(self, o: term.Node) -> list[Edge]:
+        return [edge for index in self.indexes for edge in index.incoming(o)]
+
+    def pairs(self, p: term.Node) -> list[tuple[term.Node, term.Node]]:
+        """(subject, object) of every triple with predicate p."""
+        found = []
+        for index in self.indexes:
+            if isinstance(index, CompactIndex | SQLiteIndex | UnionIndex):
+                found += index.pairs(p)
+            else:
+                found += [
+                    (s, o)
+                    for s in index.subjects()
+                    for q, o in index.outgoing(s)
+                    if q == p
+                ]
+        return found
+
+    def subjects(self) -> Iterator[term.Node]:
+        for index in self.indexes:
+            yield from index.subjects()
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self.indexes)
+
+
+def _some(graph: Graph | None) -> list[Graph]:
+    return [] if graph is None else [graph]
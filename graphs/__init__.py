@@ -1,3 +1,6 @@
-__all__ = ["node_details"]
+__all__ = ["Containment", "Layouts", "Topology", "node_details"]
 
+from .containment import Containment
+from .layout import Layouts
 from .nx import node_details
+from .topology import Topology
@@ -0,0 +1,188 @@
+import numpy as np
+import rdflib as rdf
+from loguru import logger
+from rdflib import RDF
+
+from cgmes.explorer import Graph
+from graphs.triples import pairs, rdfid_of
+
+# links from an element to the element containing it, the first found being
+# followed: equipment and nodes lead to bays and voltage levels, voltage
+# levels to substations
+CONTAINER_PREDICATES = (
+    "VoltageLevel.Substation",
+    "Bay.VoltageLevel",
+    "Equipment.EquipmentContainer",
+    "ConnectivityNode.ConnectivityNodeContainer",
+    "TopologicalNode.ConnectivityNodeContainer",
+    "Terminal.ConductingEquipment",
+    "TransformerEnd.Terminal",
+    "PowerTransformerEnd.PowerTransformer",
+    "RotatingMachine.GeneratingUnit",
+)
+# containers that neighbourhoods are collapsed into, from the smallest
+LEVELS = ("Bay", "VoltageLevel", "Substation")
+# longest chain of containers followed, in case of cycles in broken models
+MAX_DEPTH = 16
+
+
+class Containment:
+    """
+    Containment hierarchy of a model: the parent of each element (its
+    container, or the equipment of a terminal), with the members of each
+    parent stored as CSR arrays over the vertex numbers of rdfids, and the
+    number of elements each one contains, directly or not.
+    """
+
+    def __init__(
+        self,
+        rdfids: list[str],
+        kinds: np.ndarray,
+        types: list[str],
+        parents: np.ndarray,
+    ):
+        """
+        :param kinds: code of the CIM type of each vertex in types
+        :param parents: parent vertex of each vertex, -1 for none
+        """
+        self.rdfids = rdfids
+        self.vertex = {rdfid: i for i, rdfid in enumerate(rdfids)}
+        self.kinds = kinds
+        self.types = types
+        self.parents = parents
+
+        has_parent = np.flatnonzero(parents >= 0)
+        order = has_parent[np.argsort(parents[has_parent], kind="stable")]
+        self.ptr = np.zeros(len(rdfids) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(parents[has_parent], minlength=len(rdfids)), out=self.ptr[1:]
+        )
+        self.children = order.astype(np.int32)
+        self.sizes = _sizes(parents)
+
+    @classmethod
+    def build(cls, graph: Graph) -> "Containment":
+        logger.info("building containment...")
+        assert graph.index is not None
+        cim = graph.graph.store.namespace("cim")
+        if cim is None:
+            return cls([], np.zeros(0, np.int16), [], np.zeros(0, np.int32))
+
+        parent: dict[str, str] = {}
+        for name in CONTAINER_PREDICATES:
+            for s, o in pairs(graph.index, rdf.URIRef(cim + name)):
+                if isinstance(o, rdf.URIRef):
+                    parent.setdefault(rdfid_of(s), rdfid_of(o))
+
+        rdfids = sorted(parent.keys() | set(parent.values()))
+        vertex = {rdfid: i for i, rdfid in enumerate(rdfids)}
+        types: list[str] = []
+        codes: dict[str, int] = {}
+        kinds = np.full(len(rdfids), -1, dtype=np.int16)
+        for s, o in pairs(graph.index, RDF.type):
+            i = vertex.get(rdfid_of(s))
+            if i is None:
+                continue
+            kind = rdfid_of(o)
+            code = codes.get(kind)
+            if code is None:
+                code = codes[kind] = len(types)
+                types.append(kind)
+            kinds[i] = code
+
+        parents = np.full(len(rdfids), -1, dtype=np.int32)
+        for child, container in parent.items():
+            parents[vertex[child]] = vertex[container]
+
+        containment = cls(rdfids, kinds, types, parents)
+        logger.info(
+            f"containment: {len(rdfids)} elements, "
+            f"{int((containment.sizes > 0).sum())} containers"
+        )
+        return containment
+
+    def __contains__(self, rdfid: str) -> bool:
+        return rdfid in self.vertex
+
+    def kind(self, rdfid: str) -> str:
+        i = self.vertex.get(rdfid)
+        if i is None or self.kinds[i] < 0:
+            return ""
+        return self.types[self.kinds[i]]
+
+    def parent(self, rdfid: str) -> str | None:
+        i = self.vertex.get(rdfid)
+        if i is None or self.parents[i] < 0:
+            return None
+        return self.rdfids[self.parents[i]]
+
+    def ancestors(self, rdfid: str) -> list[str]:
+        """Containers of rdfid, from its parent up."""
+        found: list[str] = []
+        i = self.vertex.get(rdfid)
+        while i is not None and self.parents[i] >= 0 and len(found) < MAX_DEPTH:
+            i = int(self.parents[i])
+            found.append(self.rdfids[i])
+        return found
+
+    def members(self, rdfid: str) -> list[str]:
+        """Elements directly in rdfid."""
+        i = self.vertex.get(rdfid)
+        if i is None:
+            return []
+        children = self.children[self.ptr[i] : self.ptr[i + 1]]
+        return [self.rdfids[c] for c in children.tolist()]
+
+    def size(self, rdfid: str) -> int:
+        """Number of elements in rdfid, directly or not."""
+        i = self.vertex.get(rdfid)
+        return 0 if i is None else int(self.sizes[i])
+
+    def collapsible(self, rdfid: str) -> bool:
+        """Whether rdfid is a container of LEVELS holding elements."""
+        return self.kind(rdfid) in LEVELS and self.size(rdfid) > 0
+
+    def representative(self, rdfid: str, level: str) -> str:
+        """
+        The outermost container of rdfid (or rdfid itself) among the LEVELS
+        up to level, rdfid if it is in none.
+        """
+        kinds = LEVELS[: LEVELS.index(level) + 1]
+        found = rdfid
+        for ancestor in self.ancestors(rdfid):
+            if self.kind(ancestor) in kinds:
+                found = ancestor
+        return found
+
+    def containers(self, rdfids: list[str]) -> dict[str, tuple[str | None, str | None]]:
+        """(substation, voltage level) of each rdfid."""
+        result = {}
+        for rdfid in rdfids:
+            substation = voltage_level = None
+            for ancestor in [rdfid, *self.ancestors(rdfid)]:
+                kind = self.kind(ancestor)
+                if kind == "VoltageLevel" and voltage_level is None:
+                    voltage_level = ancestor
+                elif kind == "Substation":
+                    substation = ancestor
+                    break
+            result[rdfid] = (substation, voltage_level)
+        return result
+
+
+def _sizes(parents: np.ndarray) -> np.ndarray:
+    """Number of descendants of each vertex, summed level by level."""
+    depth = np.zeros(len(parents), dtype=np.int32)
+    current = parents.copy()
+    for _ in range(MAX_DEPTH):
+        up = current >= 0
+        if not up.any():
+            break
+        depth[up] += 1
+        current[up] = parents[current[up]]
+
+    sizes = np.zeros(len(parents), dtype=np.int64)
+    for level in range(int(depth.max(initial=0)), 0, -1):
+        inside = np.flatnonzero((depth == level) & (parents >= 0))
+        np.add.at(sizes, parents[inside], sizes[inside] + 1)
+    return sizes
@@ -0,0 +1,263 @@
+import hashlib
+import math
+import zlib
+from collections.abc import Iterable
+
+import numpy as np
+from loguru import logger
+
+from cgmes.lru import LRUCache
+from cgmes.metrics import timed
+from graphs.containment import Containment
+
+FORCE = "force"
+SUBSTATIONS = "substations"
+ALGORITHMS = (FORCE, SUBSTATIONS)
+EDGE_LENGTH = 80.0
+ITERATIONS = 150
+# beyond this many movable nodes, iterations are cut down so that a layout
+# stays under a second
+LARGE = 400
+GRAVITY = 0.05
+LAYOUT_CACHE_SIZE = 256
+
+Position = tuple[float, float]
+Edge = tuple[str, str]
+
+
+def force_directed(
+    nodes: list[str],
+    edges: Iterable[Edge],
+    fixed: dict[str, Position] | None = None,
+    initial: dict[str, Position] | None = None,
+    iterations: int = ITERATIONS,
+    length: float = EDGE_LENGTH,
+) -> dict[str, Position]:
+    """
+    Fruchterman-Reingold layout, computed for all nodes at once with numpy:
+    nodes repel each other, edges pull their ends together, and a weak
+    gravity keeps disconnected parts close.
+
+    :param fixed: nodes that keep their position, and still push the others
+    :param initial: starting positions of the other nodes, which otherwise
+    start at a position derived from their id, so that layouts are
+    reproducible
+    """
+    fixed = fixed or {}
+    initial = initial or {}
+    moved = set(nodes)
+    everything = list(nodes) + [n for n in fixed if n not in moved]
+    index = {node: i for i, node in enumerate(everything)}
+    position = np.array(
+        [
+            fixed.get(node) or initial.get(node) or _seeded(node, length)
+            for node in everything
+        ],
+        dtype=np.float64,
+    )
+    movable = np.array([node not in fixed for node in everything])
+    moving = np.flatnonzero(movable)
+    if len(moving) == 0:
+        return {node: fixed[node] for node in nodes}
+
+    pairs = [(index[s], index[t]) for s, t in edges if s in index and t in index]
+    sources = np.array([s for s, _ in pairs], dtype=np.int64)
+    targets = np.array([t for _, t in pairs], dtype=np.int64)
+    if len(moving) > LARGE:
+        iterations = max(20, iterations * LARGE // len(moving))
+
+    center = position[~movable].mean(axis=0) if (~movable).any() else np.zeros(2)
+    temperature = length * math.sqrt(len(moving)) / 2
+    cooling = temperature / (iterations + 1)
+    x, y = position[:, 0].copy(), position[:, 1].copy()
+    for _ in range(iterations):
+        # repulsion between each moving node and all nodes, as (moving, all)
+        dx = x[moving, None] - x[None, :]
+        dy = y[moving, None] - y[None, :]
+        repulsion = length**2 / np.maximum(dx * dx + dy * dy, 1e-2)
+        move_x = (dx * repulsion).sum(axis=1)
+        move_y = (dy * repulsion).sum(axis=1)
+
+        if len(pairs):
+            ex = x[sources] - x[targets]
+            ey = y[sources] - y[targets]
+            pull = np.sqrt(ex * ex + ey * ey) / length
+            pull_x = np.bincount(targets, ex * pull, len(x))
+            pull_x -= np.bincount(sources, ex * pull, len(x))
+            pull_y = np.bincount(targets, ey * pull, len(y))
+            pull_y -= np.bincount(sources, ey * pull, len(y))
+            move_x += pull_x[moving]
+            move_y += pull_y[moving]
+        gravity = GRAVITY * math.sqrt(len(moving))
+        move_x += gravity * (center[0] - x[moving])
+        move_y += gravity * (center[1] - y[moving])
+
+        size = np.maximum(np.sqrt(move_x * move_x + move_y * move_y), 1e-9)
+        step = np.minimum(size, temperature) / size
+        x[moving] += move_x * step
+        y[moving] += move_y * step
+        temperature -= cooling
+
+    return {node: (float(x[index[node]]), float(y[index[node]])) for node in nodes}
+
+
+def around(
+    parent: Position,
+    nodes: list[str],
+    edges: Iterable[Edge],
+    fixed: dict[str, Position],
+    length: float = EDGE_LENGTH,
+) -> dict[str, Position]:
+    """
+    Positions of nodes added next to parent, the nodes already shown staying
+    where they are: new nodes start on a circle around parent, then move
+    away from the others.
+    """
+    radius = length * max(1.0, len(nodes) / (2 * math.pi) * 0.5)
+    x, y = parent
+    initial = {
+        node: (
+            x + radius * math.cos(2 * math.pi * i / max(len(nodes), 1)),
+            y + radius * math.sin(2 * math.pi * i / max(len(nodes), 1)),
+        )
+        for i, node in enumerate(sorted(nodes))
+    }
+    return force_directed(
+        nodes, edges, fixed=fixed, initial=initial, iterations=ITERATIONS // 3
+    )
+
+
+def hierarchical(
+    nodes: list[str],
+    edges: Iterable[Edge],
+    containers: dict[str, tuple[str | None, str | None]],
+    length: float = EDGE_LENGTH,
+) -> dict[str, Position]:
+    """
+    Nodes grouped by substation, then by voltage level: substations are laid
+    out on a grid, each one holding a row per voltage level (the elements
+    directly in the substation first), elements of a row being laid out by
+    force_directed. Nodes outside any substation are laid out around them.
+
+    :param containers: (substation, voltage level) of nodes
+    """
+    edges = list(edges)
+    rows: dict[str, dict[str, list[str]]] = {}
+    outside = []
+    for node in nodes:
+        substation, voltage_level = containers.get(node, (None, None))
+        if substation is None:
+            outside.append(node)
+            continue
+        rows.setdefault(substation, {}).setdefault(voltage_level or "", []).append(node)
+
+    boxes: list[tuple[str, dict[str, Position], float, float]] = []
+    for substation in sorted(rows):
+        placed: dict[str, Position] = {}
+        top = 0.0
+        width = 0.0
+        for level in sorted(rows[substation]):
+            members = rows[substation][level]
+            inside = set(members)
+            local = force_directed(
+                members, [(s, t) for s, t in edges if s in inside and t in inside]
+            )
+            x0, y0, x1, y1 = _bounds(local.values())
+            for node, (x, y) in local.items():
+                placed[node] = (x - x0, top + y - y0)
+            top += y1 - y0 + length
+            width = max(width, x1 - x0)
+        boxes.append((substation, placed, width, top))
+
+    positions: dict[str, Position] = {}
+    columns = max(1, math.ceil(math.sqrt(len(boxes))))
+    y = 0.0
+    for row in range(0, len(boxes), columns):
+        x = 0.0
+        height = 0.0
+        for _, placed, width, box_height in boxes[row : row + columns]:
+            for node, (px, py) in placed.items():
+                positions[node] = (x + px, y + py)
+            x += width + 2 * length
+            height = max(height, box_height)
+        y += height + length
+
+    if outside:
+        positions |= force_directed(outside, edges, fixed=positions)
+    return positions
+
+
+class Layouts:
+    """
+    Layouts of whole subgraphs, cached by algorithm, nodes and edges, so
+    that showing the same neighbourhood again gives the same picture
+    without computing it again.
+    """
+
+    def __init__(self, cache_size: int = LAYOUT_CACHE_SIZE):
+        self.cache: LRUCache[str, dict[str, Position]] = LRUCache(cache_size)
+
+    @timed("layout.positions", method=True)
+    def positions(
+        self,
+        nodes: list[str],
+        edges: list[Edge],
+        algorithm: str = FORCE,
+        containment: Containment | None = None,
+    ) -> dict[str, Position]:
+        """
+        :param containment: substations and voltage levels of nodes, needed
+        by the SUBSTATIONS layout, which is replaced by the FORCE one without
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(
+                f"unknown layout {algorithm}, expected one of {ALGORITHMS}"
+            )
+        if algorithm == SUBSTATIONS and containment is None:
+            algorithm = FORCE
+        key = _key(algorithm, nodes, edges)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        if algorithm == SUBSTATIONS:
+            assert containment is not None
+            positions = hierarchical(nodes, edges, containment.containers(nodes))
+        else:
+            positions = force_directed(nodes, edges)
+        logger.info(f"{algorithm} layout of {len(nodes)} nodes")
+        self.cache.put(key, positions)
+        return positions
+
+    @timed("layout.around", method=True)
+    def around(
+        self,
+        parent: str,
+        nodes: list[str],
+        edges: list[Edge],
+        fixed: dict[str, Position],
+    ) -> dict[str, Position]:
+        return around(fixed.get(parent, (0.0, 0.0)), nodes, edges, fixed)
+
+
+def _key(algorithm: str, nodes: list[str], edges: list[Edge]) -> str:
+    digest = hashlib.sha1(algorithm.encode())
+    for node in sorted(nodes):
+        digest.update(node.encode() + b"\0")
+    digest.update(b"\1")
+    for s, t in sorted(edges):
+        digest.update(f"{s}\0{t}\0".encode())
+    return digest.hexdigest()
+
+
+def _seeded(node: str, length: float) -> Position:
+    """Starting position of node, the same on every run."""
+    h = zlib.crc32(node.encode())
+    angle = (h & 0xFFFF) / 0xFFFF * 2 * math.pi
+    radius = length * (1 + (h >> 16) / 0xFFFF * 4)
+    return radius * math.cos(angle), radius * math.sin(angle)
+
+
+def _bounds(positions: Iterable[Position]) -> tuple[float, float, float, float]:
+    xs, ys = zip(*positions)
+    return min(xs), min(ys), max(xs), max(ys)
@@ -0,0 +1,223 @@
+from collections import defaultdict
+
+import numpy as np
+import rdflib as rdf
+from loguru import logger
+
+from cgmes.explorer import Graph
+from cgmes.metrics import timed
+from graphs.triples import pairs, rdfid_of
+
+TERMINAL_PREDICATES = (
+    "Terminal.ConductingEquipment",
+    "Terminal.ConnectivityNode",
+    "Terminal.TopologicalNode",
+    "ACDCTerminal.connected",
+)
+SWITCH_OPEN = "Switch.open"
+
+
+class Topology:
+    """
+    Electrical connectivity of a model: an undirected graph over equipment and
+    connectivity nodes (topological nodes for bus-branch models), with an edge
+    per terminal, stored as CSR arrays over the vertex numbers of rdfids.
+
+    Components ignore the state of the network; islands leave out open
+    switches and disconnected terminals.
+    """
+
+    def __init__(
+        self,
+        rdfids: list[str],
+        is_node: np.ndarray,
+        sources: np.ndarray,
+        targets: np.ndarray,
+        closed: np.ndarray,
+        is_open: np.ndarray,
+    ):
+        """
+        :param sources: equipment vertex of each terminal
+        :param targets: node vertex of each terminal
+        :param closed: whether each terminal is connected
+        :param is_open: whether each vertex is an open switch
+        """
+        self.rdfids = rdfids
+        self.vertex = {rdfid: i for i, rdfid in enumerate(rdfids)}
+        self.is_node = is_node
+        self.is_open = is_open
+        self.sources = sources
+        self.targets = targets
+        self.ptr, self.adjacent = _csr(len(rdfids), sources, targets)
+        self.components = _components(self.ptr, self.adjacent, len(rdfids))
+
+        live = closed & ~is_open[sources]
+        live_ptr, live_adjacent = _csr(len(rdfids), sources[live], targets[live])
+        self.islands = _components(live_ptr, live_adjacent, len(rdfids))
+
+    @classmethod
+    def build(cls, graph: Graph) -> "Topology":
+        logger.info("building topology...")
+        assert graph.index is not None
+        cim = graph.graph.store.namespace("cim")
+        if cim is None:
+            return cls.empty()
+
+        terminals: dict[str, dict[str, str]] = defaultdict(dict)
+        for name in TERMINAL_PREDICATES:
+            for s, o in pairs(graph.index, rdf.URIRef(cim + name)):
+                terminals[rdfid_of(s)][name] = (
+                    rdfid_of(o) if isinstance(o, rdf.URIRef) else str(o)
+                )
+        opened = {
+            rdfid_of(s)
+            for s, o in pairs(graph.index, rdf.URIRef(cim + SWITCH_OPEN))
+            if str(o).lower() == "true"
+        }
+
+        rdfids: list[str] = []
+        vertex: dict[str, int] = {}
+        nodes: list[bool] = []
+
+        def number(rdfid: str, node: bool) -> int:
+            i = vertex.get(rdfid)
+            if i is None:
+                i = vertex[rdfid] = len(rdfids)
+                rdfids.append(rdfid)
+                nodes.append(node)
+            return i
+
+        sources, targets, closed = [], [], []
+        for links in terminals.values():
+            equipment = links.get("Terminal.ConductingEquipment")
+            node = links.get("Terminal.ConnectivityNode") or links.get(
+                "Terminal.TopologicalNode"
+            )
+            if equipment is None or node is None:
+                continue
+            sources.append(number(equipment, False))
+            targets.append(number(node, True))
+            closed.append(links.get("ACDCTerminal.connected", "true").lower() == "true")
+
+        is_open = np.zeros(len(rdfids), dtype=bool)
+        for rdfid in opened:
+            if rdfid in vertex:
+                is_open[vertex[rdfid]] = True
+
+        topology = cls(
+            rdfids,
+            np.array(nodes, dtype=bool),
+            np.array(sources, dtype=np.int32),
+            np.array(targets, dtype=np.int32),
+            np.array(closed, dtype=bool),
+            is_open,
+        )
+        logger.info(
+            f"topology: {len(rdfids)} vertices, {len(sources)} terminals, "
+            f"{topology.components.max(initial=-1) + 1} components, "
+            f"{topology.islands.max(initial=-1) + 1} islands"
+        )
+        return topology
+
+    @classmethod
+    def empty(cls) -> "Topology":
+        none = np.zeros(0, dtype=np.int32)
+        no = np.zeros(0, dtype=bool)
+        return cls([], no, none, none, no, no)
+
+    def __contains__(self, rdfid: str) -> bool:
+        return rdfid in self.vertex
+
+    @timed("topology.neighbourhood", method=True)
+    def neighbourhood(self, rdfid: str, hops: int, max_nodes: int) -> dict[str, int]:
+        """
+        Equipment and nodes electrically close to rdfid, with their distance in
+        hops: a hop goes from equipment to the equipment sharing one of its
+        nodes, through that node. At most max_nodes vertices are returned, the
+        nearest first.
+        """
+        start = self.vertex.get(rdfid)
+        if start is None:
+            return {}
+        steps = 2 * hops if not self.is_node[start] else 2 * hops - 1
+        distance = {start: 0}
+        frontier = np.array([start], dtype=np.int32)
+        for step in range(1, steps + 1):
+            reached = np.unique(_neighbours(self.ptr, self.adjacent, frontier))
+            frontier = np.array(
+                [v for v in reached.tolist() if v not in distance], dtype=np.int32
+            )
+            if len(frontier) == 0:
+                break
+            for v in frontier.tolist():
+                if len(distance) >= max_nodes:
+                    logger.info("max nodes reached. results will be truncated")
+                    return self._named(distance)
+                distance[v] = (step + 1) // 2
+        return self._named(distance)
+
+    def edges(self, rdfids: set[str]) -> list[tuple[str, str]]:
+        """(equipment, node) terminal links between rdfids."""
+        inside = np.zeros(len(self.rdfids), dtype=bool)
+        inside[[self.vertex[r] for r in rdfids if r in self.vertex]] = True
+        keep = inside[self.sources] & inside[self.targets]
+        return sorted(
+            {
+                (self.rdfids[s], self.rdfids[t])
+                for s, t in zip(
+                    self.sources[keep].tolist(), self.targets[keep].tolist()
+                )
+            }
+        )
+
+    def component(self, rdfid: str) -> list[str]:
+        return self._members(self.components, rdfid)
+
+    def island(self, rdfid: str) -> list[str]:
+        return self._members(self.islands, rdfid)
+
+    def _members(self, labels: np.ndarray, rdfid: str) -> list[str]:
+        i = self.vertex.get(rdfid)
+        if i is None:
+            return []
+        return [self.rdfids[v] for v in np.flatnonzero(labels == labels[i]).tolist()]
+
+    def _named(self, distance: dict[int, int]) -> dict[str, int]:
+        return {self.rdfids[v]: d for v, d in distance.items()}
+
+
+def _csr(size: int, sources: np.ndarray, targets: np.ndarray):
+    """Symmetric adjacency of the (source, target) edges."""
+    ends = np.concatenate([sources, targets])
+    others = np.concatenate([targets, sources])
+    order = np.argsort(ends, kind="stable")
+    ptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ends, minlength=size), out=ptr[1:])
+    return ptr, others[order].astype(np.int32)
+
+
+def _neighbours(ptr: np.ndarray, adjacent: np.ndarray, frontier: np.ndarray):
+    starts, stops = ptr[frontier], ptr[frontier + 1]
+    counts = stops - starts
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return adjacent[offsets + np.arange(counts.sum())]
+
+
+def _components(ptr: np.ndarray, adjacent: np.ndarray, size: int) -> np.ndarray:
+    """
+    Component number of each vertex, numbered in the order of their first
+    vertex, by label propagation over all the edges at once: each root takes
+    the smallest root across its edges, then vertices jump to the parent of
+    their parent until they point to a root, until no root changes.
+    """
+    sources = np.repeat(np.arange(size, dtype=np.int32), np.diff(ptr))
+    parent = np.arange(size, dtype=np.int32)
+    while True:
+        hooked = parent.copy()
+        np.minimum.at(hooked, parent[sources], parent[adjacent])
+        while not np.array_equal(jumped := hooked[hooked], hooked):
+            hooked = jumped
+        if np.array_equal(hooked, parent):
+            break
+        parent = hooked
+    return np.unique(parent, return_inverse=True)[1].astype(np.int32)
@@ -0,0 +1,21 @@
+import rdflib as rdf
+from rdflib import term
+
+from cgmes.compact import CompactIndex
+from cgmes.index import Index
+from cgmes.sqlite import SQLiteIndex
+from cgmes.workspace import UnionIndex
+
+
+def rdfid_of(node: term.Node) -> str:
+    """RDFID of a URI, whatever the file defining it."""
+    return str(node).rpartition("#")[2]
+
+
+def pairs(index: Index, predicate: rdf.URIRef) -> list[tuple[term.Node, term.Node]]:
+    """(subject, object) of every triple of index with predicate."""
+    if isinstance(index, CompactIndex | SQLiteIndex | UnionIndex):
+        return index.pairs(predicate)
+    return [
+        (s, o) for s in index.subjects() for p, o in index.outgoing(s) if p == predicate
+    ]
@@ -1,14 +1,137 @@
-import sys
+import argparse
+import os
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Explore CGMES files as graphs")
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="CGMES zip files or folders, several making a workspace of models "
+        "sharing a boundary set; with --batch, one zip file, folder, or cached "
+        "snapshot or database",
+    )
+    parser.add_argument(
+        "--boundary",
+        help="zip file or folder of the boundary set shared by the models, by "
+        "default the boundary profiles found in the models",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of processes parsing the CGMES files in parallel",
+    )
+    parser.add_argument(
+        "--cache-dir", default="cache", help="folder where loaded models are cached"
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=float,
+        default=10,
+        help="maximum size of the cache folder, in GB",
+    )
+    parser.add_argument(
+        "--store",
+        choices=["snapshot", "database"],
+        default="snapshot",
+        help="how loaded models are cached: memory-mapped snapshots, or SQLite "
+        "databases queried on demand for models larger than memory",
+    )
+    parser.add_argument(
+        "--reload",
+        type=float,
+        metavar="SECONDS",
+        help="check a zip file for changes that often, and reload its changed "
+        "profiles without restarting",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8050, help="port to listen on")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="number of server processes, sharing the loaded model",
+    )
+    parser.add_argument(
+        "--debug", action="store_true", help="run the Dash development server"
+    )
+    parser.add_argument(
+        "--slow",
+        type=float,
+        default=1.0,
+        help="log queries and callbacks slower than this, in seconds",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        help="folder receiving the cProfile statistics of each callback",
+    )
+    batch_options = parser.add_argument_group(
+        "batch", "write neighbourhoods without starting the explorer"
+    )
+    batch_options.add_argument(
+        "--batch",
+        metavar="IDS",
+        help="file of the RDFIDs to extract, one per line, - for stdin",
+    )
+    batch_options.add_argument(
+        "--depth", type=int, default=2, help="hops from each RDFID (default 2)"
+    )
+    batch_options.add_argument(
+        "--max-nodes",
+        type=int,
+        default=100,
+        help="nodes of a neighbourhood per direction (default 100)",
+    )
+    batch_options.add_argument(
+        "--format",
+        choices=["jsonl", "graphml"],
+        default="jsonl",
+        help="JSON lines, one neighbourhood per line, or one GraphML graph of "
+        "all of them",
+    )
+    batch_options.add_argument("--output", help="file to write, stdout by default")
+    args = parser.parse_args()
 
-import visu
+    if args.batch is not None:
+        if len(args.files) != 1:
+            parser.error("--batch needs exactly one model")
+        import batch
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
+        batch.run(
+            args.files[0],
+            args.batch,
+            output=args.output,
+            depth=args.depth,
+            max_nodes=args.max_nodes,
+            format=args.format,
+            workers=args.workers,
+            cache_dir=args.cache_dir,
+            cache_size=int(args.cache_size * 1e9),
+            store=args.store,
+        )
+        parser.exit()
+
+    import visu
+
+    if not args.files:
         import tkinter.filedialog as fd
 
-        file = fd.askopenfilename(filetypes=[("CGMES files", "*.zip")])
+        files = [fd.askopenfilename(filetypes=[("CGMES files", "*.zip")])]
     else:
-        file = sys.argv[1]
+        files = args.files
 
-    visu.run(file)
+    visu.run(
+        files,
+        workers=args.workers,
+        cache_dir=args.cache_dir,
+        cache_size=int(args.cache_size * 1e9),
+        host=args.host,
+        port=args.port,
+        processes=args.processes,
+        debug=args.debug,
+        slow_seconds=args.slow,
+        profile_dir=args.profile_dir,
+        store=args.store,
+        boundary=args.boundary,
+        reload_seconds=args.reload,
+    )
@@ -0,0 +1,65 @@
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from bench.synthetic import write_model
+from cgmes.cache import INDEX_FILE, CacheManager, member_keys
+
+
+def _change_member(path: Path, member: str):
+    """Rewrite the zip at path with a comment appended to member."""
+    with zipfile.ZipFile(path) as archive:
+        contents = {name: archive.read(name) for name in archive.namelist()}
+    contents[member] += b"<!-- changed -->\n"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in contents.items():
+            archive.writestr(name, content)
+
+
+class LoadMembersTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = Path(folder.name)
+        self.source = write_model(self.folder / "model.zip", 3)
+
+    def test_only_changed_members_are_parsed(self):
+        cache = CacheManager(self.folder / "cache")
+        first = cache.load_members(self.source)
+        self.assertEqual(cache.stats()["misses"], 4)
+
+        _change_member(self.source, "synthetic_SV.xml")
+        second = cache.load_members(self.source, loaded=first)
+        self.assertEqual(cache.stats()["misses"], 5)
+        self.assertEqual(len(second.keys() & first.keys()), 3)
+        self.assertEqual(set(second), set(member_keys(self.source).values()))
+
+    def test_eviction_keeps_the_unchanged_members(self):
+        cache = CacheManager(self.folder / "cache", max_size=1)
+        cache.load_members(self.source)
+        _change_member(self.source, "synthetic_SV.xml")
+
+        # a new process, with none of the members loaded
+        graphs = CacheManager(self.folder / "cache", max_size=1).load_members(
+            self.source
+        )
+        self.assertEqual(len(graphs), 4)
+        for key in member_keys(self.source).values():
+            self.assertTrue((self.folder / "cache" / f"{key}.snapshot").exists())
+
+    def test_eviction_removes_the_lock_files(self):
+        cache = CacheManager(self.folder / "cache", max_size=1)
+        cache.load(self.source)
+        _change_member(self.source, "synthetic_SV.xml")
+        cache.load(self.source)
+
+        folder = self.folder / "cache"
+        snapshots = {path.stem for path in folder.glob("*.snapshot")}
+        self.assertEqual(len(snapshots), 1)
+        locks = {path.stem for path in folder.glob("*.lock")}
+        self.assertEqual(locks, snapshots | {INDEX_FILE})
+
+
+if __name__ == "__main__":
+    unittest.main()
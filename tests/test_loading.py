@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from bench.synthetic import write_model
+from cgmes import load_zip
+from visu.loading import BackgroundModel
+
+
+class BackgroundModelTest(unittest.TestCase):
+    def test_loads_model(self):
+        with tempfile.TemporaryDirectory() as folder:
+            source = write_model(Path(folder) / "model.zip", 2)
+            model = BackgroundModel(lambda progress: load_zip(source)).start()
+            model.wait()
+        self.assertTrue(model.finished)
+        self.assertEqual(model.error, "")
+        self.assertTrue(model.searchable)
+        self.assertIsNotNone(model.containment)
+
+    def test_any_error_finishes_loading(self):
+        def fail(progress):
+            raise MemoryError
+
+        for load in (fail, lambda progress: object()):
+            model = BackgroundModel(load).start()
+            model.wait()
+            self.assertTrue(model.finished)
+            self.assertNotEqual(model.error, "")
+
+    def test_failed_reload_keeps_model(self):
+        with tempfile.TemporaryDirectory() as folder:
+            source = write_model(Path(folder) / "model.zip", 2)
+            loads = [lambda: load_zip(source), lambda: object()]
+            model = BackgroundModel(
+                lambda progress: loads.pop(0)(), changed=lambda: True
+            ).start()
+            model.wait()
+            graph = model.graph
+            self.assertTrue(model.reload_if_changed())
+            model.wait()
+        self.assertTrue(model.finished)
+        self.assertNotEqual(model.error, "")
+        self.assertIs(model.graph, graph)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import re
+import signal
+import socket
+import tempfile
+import time
+import unittest
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import dash
+
+from cgmes.metrics import METRICS, Metrics
+from visu.instrument import serve_metrics, time_requests
+from visu.serve import serve
+
+HOST = "127.0.0.1"
+
+
+def _observe(folder: str, operation: str, times: int):
+    metrics = Metrics()
+    metrics.share(folder)
+    for _ in range(times):
+        metrics.observe(operation, 0.001, lambda: "")
+    metrics.flush()
+
+
+def _serve(folder: str, port: int, processes: int):
+    app = dash.Dash(__name__)
+    app.layout = dash.html.Div()
+
+    @app.server.route("/ping")
+    def ping():
+        return "pong"
+
+    time_requests(app)
+    serve_metrics(app)
+    METRICS.share(folder)
+    serve(app.server, HOST, port, processes)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def _get(port: int, path: str) -> str:
+    with urllib.request.urlopen(f"http://{HOST}:{port}{path}", timeout=10) as r:
+        return r.read().decode()
+
+
+class SharedMetricsTest(unittest.TestCase):
+    def test_processes_are_summed(self):
+        context = multiprocessing.get_context("fork")
+        with tempfile.TemporaryDirectory() as folder:
+            metrics = Metrics()
+            metrics.share(folder)
+            metrics.observe("query", 0.001, lambda: "")
+            workers = [
+                context.Process(target=_observe, args=(folder, "query", times))
+                for times in (2, 3)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+                self.assertEqual(worker.exitcode, 0)
+
+            histogram = metrics.histograms()["query"]
+            self.assertEqual(histogram.count, 6)
+            self.assertIn(
+                'cgmes_operation_seconds_count{operation="query"} 6',
+                metrics.prometheus(),
+            )
+
+    def test_metrics_endpoint_sums_worker_processes(self):
+        port = _free_port()
+        requests = 40
+        context = multiprocessing.get_context("fork")
+        with tempfile.TemporaryDirectory() as folder:
+            server = context.Process(target=_serve, args=(folder, port, 2))
+            server.start()
+            try:
+                for _ in range(100):
+                    try:
+                        _get(port, "/ping")
+                        break
+                    except OSError:
+                        time.sleep(0.1)
+                with ThreadPoolExecutor(8) as pool:
+                    list(pool.map(lambda _: _get(port, "/ping"), range(requests)))
+
+                # each scrape is answered by either worker, and sees them all
+                pattern = re.compile(
+                    r'cgmes_operation_seconds_count\{operation="request /ping"\} (\d+)'
+                )
+                for _ in range(10):
+                    match = pattern.search(_get(port, "/metrics"))
+                    assert match is not None
+                    self.assertEqual(int(match.group(1)), requests + 1)
+                # the server process and both workers
+                self.assertEqual(len(list(Path(folder).glob("*.json"))), 3)
+            finally:
+                assert server.pid is not None
+                os.kill(server.pid, signal.SIGTERM)
+                server.join(10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+import rdflib as rdf
+
+from bench.synthetic import write_model
+from cgmes import load_zip
+from cgmes.explorer import Graph
+from cgmes.reader import CGMESReader
+
+
+def _triples(graph: Graph) -> set:
+    index = graph.index
+    assert index is not None
+    return {(s, p, o) for s in index.subjects() for p, o in index.outgoing(s)}
+
+
+class ReaderTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        cls.source = write_model(Path(cls.folder.name) / "model.zip", 3)
+        with zipfile.ZipFile(cls.source) as archive:
+            archive.extractall(cls.folder.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    def test_same_triples_as_rdflib(self):
+        for path in sorted(Path(self.folder.name).glob("*.xml")):
+            with self.subTest(path.name):
+                base = path.absolute().as_uri()
+                expected = rdf.Graph()
+                expected.parse(path, format="xml", publicID=base)
+                reader = CGMESReader(path, base)
+                self.assertEqual(set(reader), set(expected))
+                self.assertEqual(
+                    dict(reader.namespaces),
+                    {
+                        prefix: str(ns)
+                        for prefix, ns in expected.namespaces()
+                        if prefix in reader.namespaces
+                    },
+                )
+
+    def test_same_model_as_rdflib(self):
+        self.assertEqual(
+            _triples(load_zip(self.source)),
+            _triples(load_zip(self.source, parser="rdflib")),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+
+from visu.sessions import FileSessionStore, SessionStore, new_session_id
+
+
+class SessionStoreTest(unittest.TestCase):
+    def test_sessions_are_kept_by_id(self):
+        store = SessionStore()
+        first, second = new_session_id(), new_session_id()
+        with store.open(first) as session:
+            session.clicked = "a"
+        with store.open(second) as session:
+            self.assertEqual(session.clicked, "")
+        with store.open(first) as session:
+            self.assertEqual(session.clicked, "a")
+        self.assertEqual(len(store), 2)
+
+    def test_least_recently_used_are_dropped(self):
+        store = SessionStore(max_sessions=2)
+        ids = [new_session_id() for _ in range(3)]
+        for session_id in ids:
+            store.get(session_id).clicked = session_id
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get(ids[0]).clicked, "")
+        self.assertEqual(store.get(ids[2]).clicked, ids[2])
+
+    def test_invalid_ids_are_rejected(self):
+        store = SessionStore()
+        for session_id in ["", "x" * 32, new_session_id() + "0", "../session"]:
+            with self.assertRaises(ValueError):
+                store.get(session_id)
+        self.assertEqual(len(store), 0)
+
+    def test_unused_sessions_expire(self):
+        store = SessionStore(ttl=-1)
+        session_id = new_session_id()
+        store.get(session_id).clicked = "a"
+        store.get(new_session_id())
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.get(session_id).clicked, "")
+
+
+class FileSessionStoreTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+
+    def test_sessions_are_shared_through_files(self):
+        session_id = new_session_id()
+        with FileSessionStore(self.folder).open(session_id) as session:
+            session.clicked = "a"
+        # another worker process
+        with FileSessionStore(self.folder).open(session_id) as session:
+            self.assertEqual(session.clicked, "a")
+
+    def test_invalid_ids_are_rejected(self):
+        store = FileSessionStore(self.folder)
+        with self.assertRaises(ValueError), store.open("../session"):
+            pass
+        self.assertEqual(len(store), 0)
+
+    def test_least_recently_used_are_removed(self):
+        store = FileSessionStore(self.folder, max_sessions=2)
+        for _ in range(4):
+            with store.open(new_session_id()):
+                pass
+        # each open first removes the files beyond max_sessions
+        self.assertEqual(len(store), 3)
+        with store.open(new_session_id()):
+            pass
+        self.assertEqual(len(store), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
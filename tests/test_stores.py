@@ -0,0 +1,92 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from bench.synthetic import write_model
+from cgmes import (
+    load_database,
+    load_snapshot,
+    load_zip,
+    save_database,
+    save_snapshot,
+)
+from cgmes.explorer import Graph
+from cgmes.workspace import merge
+
+
+def _triples(graph: Graph) -> set:
+    index = graph.index
+    assert index is not None
+    return {(s, p, o) for s in index.subjects() for p, o in index.outgoing(s)}
+
+
+def _files(graph: Graph) -> dict[str, list[int]]:
+    assert graph.files is not None
+    return {
+        rdfid: sorted(graph.files.files(rdfid))
+        for rdfid, _, _, _ in graph.elements.rows()
+    }
+
+
+class StoresTest(unittest.TestCase):
+    folder: tempfile.TemporaryDirectory
+    source: Path
+    graph: Graph
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        cls.source = write_model(Path(cls.folder.name) / "model.zip", 3)
+        cls.graph = load_zip(cls.source)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    def path(self, name: str) -> Path:
+        return Path(self.folder.name) / f"{self.id()}.{name}"
+
+    def assertSameModel(self, graph: Graph, expected: Graph):
+        self.assertEqual(_triples(graph), _triples(expected))
+        self.assertEqual(
+            sorted(graph.elements.rows()), sorted(expected.elements.rows())
+        )
+        self.assertEqual(_files(graph), _files(expected))
+        self.assertEqual(graph.filenames, expected.filenames)
+
+    def test_snapshot_roundtrip(self):
+        save_snapshot(self.graph, self.path("snapshot"))
+        self.assertSameModel(load_snapshot(self.path("snapshot")), self.graph)
+
+    def test_database_roundtrip(self):
+        save_database(self.graph, self.path("database"))
+        self.assertSameModel(load_database(self.path("database")), self.graph)
+
+    def test_sqlite_backend_snapshot(self):
+        graph = load_zip(
+            self.source, backend="sqlite", database=self.path("sqlite.database")
+        )
+        save_snapshot(graph, self.path("snapshot"))
+        self.assertSameModel(load_snapshot(self.path("snapshot")), self.graph)
+
+    def test_dict_backend_snapshot(self):
+        save_snapshot(load_zip(self.source, backend="dict"), self.path("snapshot"))
+        self.assertSameModel(load_snapshot(self.path("snapshot")), self.graph)
+
+    def merged(self) -> Graph:
+        members = ["synthetic_EQ.xml", "synthetic_TP.xml"], ["synthetic_SV.xml"]
+        return merge([load_zip(self.source, include=m) for m in members])
+
+    def test_merged_snapshot(self):
+        merged = self.merged()
+        save_snapshot(merged, self.path("snapshot"))
+        self.assertSameModel(load_snapshot(self.path("snapshot")), merged)
+
+    def test_merged_database(self):
+        merged = self.merged()
+        save_database(merged, self.path("database"))
+        self.assertSameModel(load_database(self.path("database")), merged)
+
+
+if __name__ == "__main__":
+    unittest.main()
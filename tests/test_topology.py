@@ -0,0 +1,81 @@
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+
+from bench.synthetic import write_model
+from cgmes import load_zip
+from graphs import Topology
+
+
+def _topology(edges: list[tuple[int, int]], size: int, opened=()) -> Topology:
+    """Topology of size vertices, even ones being nodes, with a terminal per edge."""
+    sources = np.array([s for s, _ in edges], dtype=np.int32)
+    targets = np.array([t for _, t in edges], dtype=np.int32)
+    is_open = np.zeros(size, dtype=bool)
+    is_open[list(opened)] = True
+    return Topology(
+        [f"v{i}" for i in range(size)],
+        np.arange(size) % 2 == 0,
+        sources,
+        targets,
+        np.ones(len(edges), dtype=bool),
+        is_open,
+    )
+
+
+def _partition(labels: np.ndarray) -> set[frozenset[int]]:
+    groups: dict[int, set[int]] = {}
+    for vertex, label in enumerate(labels.tolist()):
+        groups.setdefault(label, set()).add(vertex)
+    return {frozenset(group) for group in groups.values()}
+
+
+class TopologyTest(unittest.TestCase):
+    def test_components_match_networkx(self):
+        rng = random.Random(0)
+        for size in (1, 2, 10, 100, 1000):
+            edges = [
+                (rng.randrange(size), rng.randrange(size)) for _ in range(size // 2)
+            ]
+            expected = nx.Graph()
+            expected.add_nodes_from(range(size))
+            expected.add_edges_from(edges)
+            topology = _topology(edges, size)
+            self.assertEqual(
+                _partition(topology.components),
+                set(map(frozenset, nx.connected_components(expected))),
+            )
+            # numbered in the order of their first vertex
+            firsts = [
+                np.flatnonzero(topology.components == c)[0]
+                for c in range(topology.components.max() + 1)
+            ]
+            self.assertEqual(firsts, sorted(firsts))
+
+    def test_open_switches_split_islands(self):
+        # node 0 - switch 1 - node 2 - line 3 - node 4
+        topology = _topology([(1, 0), (1, 2), (3, 2), (3, 4)], 5, opened=[1])
+        self.assertEqual(topology.component("v0"), ["v0", "v1", "v2", "v3", "v4"])
+        self.assertEqual(topology.island("v0"), ["v0"])
+        self.assertEqual(topology.island("v4"), ["v2", "v3", "v4"])
+
+    def test_synthetic_model(self):
+        with tempfile.TemporaryDirectory() as folder:
+            graph = load_zip(write_model(Path(folder) / "model.zip", 4))
+        topology = Topology.build(graph)
+        # substations are linked by lines, in a ring
+        self.assertEqual(topology.components.max(), 0)
+        breaker = next(
+            e.rdfid for e in graph.elements if e.cim_type.endswith("#Breaker")
+        )
+        near = topology.neighbourhood(breaker, 1, 100)
+        self.assertEqual(near[breaker], 0)
+        self.assertTrue(set(near) <= set(topology.component(breaker)))
+
+
+if __name__ == "__main__":
+    unittest.main()
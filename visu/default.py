@@ -1,5 +1,8 @@
-import hashlib
-import pickle
+import functools
+import shutil
+import tempfile
+import zipfile
+from collections.abc import Iterable, Sequence
 from datetime import datetime
 from pathlib import Path
 
@@ -7,104 +10,172 @@ import dash
 import dash_cytoscape as cyto
 import dash_bootstrap_components as dbc
 from dash import ALL, Input, Output, State, dcc, html
+from dash.exceptions import PreventUpdate
 from loguru import logger
 
 import cgmes
+from cgmes.metrics import METRICS, SLOW_SECONDS
+from cgmes.progress import DONE
 import graphs
 from visu import icons
+from visu.elements import ElementSet
+from visu.instrument import Profiler, callbacks, serve_metrics, time_requests
+from visu.loading import BackgroundModel
+from visu.serve import DEFAULT_HOST, DEFAULT_PORT, serve
+from visu.sessions import (
+    MAX_SESSIONS,
+    SESSION_TTL,
+    FileSessionStore,
+    Session,
+    SessionStore,
+    new_session_id,
+)
 
 max_nodes_one_way = 100
+# nodes shown by explorations of both directions at once
+max_nodes_both_ways = 2 * max_nodes_one_way
+# nodes looked at by aggregated explorations, before they are collapsed into
+# their containers
+max_nodes_aggregated = 2000
+max_search_results = 50
+MERGED = "Merged model"
 
 
-def load_cached(pickle_filename, folder: Path | str):
-    folder = Path(folder)
-    if Path(pickle_filename).exists():
-        logger.info("loading cached file")
-        with open(pickle_filename, "rb") as file:
-            return pickle.load(file)
-
-    if folder.is_dir():
-        logger.info("loading folder")
-        graph = cgmes.load_folder(folder)
-    else:
-        logger.info("loading zip")
-        graph = cgmes.load_zip(folder)
+def load_graph(
+    cgmes_file: str,
+    workers: int = 1,
+    cache_dir: Path | str = "cache",
+    cache_size: int | None = None,
+    progress: cgmes.Progress | None = None,
+    store: str = "snapshot",
+) -> cgmes.Graph:
+    start = datetime.now()
 
-    logger.info("saving to cache")
-    with open(pickle_filename, "wb") as file:
-        pickle.dump(graph, file)
+    cache = cgmes.CacheManager(cache_dir, max_size=cache_size, store=store)
+    graph = cache.load(cgmes_file, workers=workers, progress=progress)
 
+    stop = datetime.now()
+    logger.info(f"graph loaded in {stop - start}")
     return graph
 
 
-def md5(filepath: str | Path):
+def open_models(
+    files: Sequence[str],
+    boundary: str | None = None,
+    workers: int = 1,
+    cache_dir: Path | str = "cache",
+    cache_size: int | None = None,
+    store: str = "snapshot",
+) -> dict[str, BackgroundModel]:
     """
-    Compute the md5 checksum of the network file, pypowsybl version and parameters
-    :param filepath: path to a network file
-    :param parameters: parameters of the import
-    :return: the md5 string that identifies uniquely the file import
+    Models of files by name, loaded once started. Several files, or a boundary
+    set, make a workspace: each model shares the boundary set, and the merge of
+    all of them is one more model (MERGED).
+
+    A single zip file is cached member by member (see IncrementalModel), so
+    that it can be reloaded when it changes.
     """
-    hash_md5 = hashlib.md5()
-    with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+    if len(files) == 1 and boundary is None and zipfile.is_zipfile(files[0]):
+        cache = cgmes.CacheManager(cache_dir, max_size=cache_size, store=store)
+        incremental = cgmes.IncrementalModel(files[0], cache, workers)
+        model = BackgroundModel(incremental.load, changed=incremental.changed)
+        return {Path(files[0]).stem: model}
+    if len(files) == 1 and boundary is None:
+        model = BackgroundModel(
+            lambda progress: load_graph(
+                files[0],
+                workers=workers,
+                cache_dir=cache_dir,
+                cache_size=cache_size,
+                progress=progress,
+                store=store,
+            )
+        )
+        return {Path(files[0]).stem: model}
 
+    names: dict[str, str] = {}
+    for f in files:
+        name = Path(f).stem
+        while name in names:
+            name += "'"
+        names[name] = f
+    cache = cgmes.CacheManager(cache_dir, max_size=cache_size, store=store)
+    workspace = cgmes.Workspace(names, boundary, cache, workers)
+    models = {
+        name: BackgroundModel(functools.partial(workspace.model, name))
+        for name in workspace.names
+    }
+    models[MERGED] = BackgroundModel(workspace.merged)
+    return models
 
-def load_graph(cgmes_file: str) -> cgmes.Graph:
-    start = datetime.now()
 
-    tmpdir = Path("cache")
-    tmpdir.mkdir(exist_ok=True)
-    pickle_filename = tmpdir / f"{md5(cgmes_file)}.pickle"
-    graph = load_cached(pickle_filename, cgmes_file)
+def progress_panel(model: BackgroundModel) -> list:
+    if model.error:
+        return [dbc.Alert(f"Loading failed: {model.error}", color="danger")]
 
-    stop = datetime.now()
-    logger.info(f"graph loaded in {stop - start}")
-    return graph
+    stages = model.progress.stages()
+    if model.finished:
+        seconds = sum(stage.seconds or 0 for stage in stages)
+        return [html.Div(f"Model loaded in {seconds:.1f}s", className="small")]
+
+    done = sum(stage.status == DONE for stage in stages)
+    return [
+        dbc.Progress(
+            value=100 * done / max(len(stages), 1),
+            label=f"{done}/{len(stages)}",
+            className="mb-2",
+        ),
+        html.Ul(
+            [
+                html.Li(
+                    f"{stage.name}: {stage.status}"
+                    + (f" ({stage.seconds:.1f}s)" if stage.seconds is not None else "")
+                )
+                for stage in stages
+            ],
+            className="small list-unstyled",
+        ),
+    ]
 
 
 def load_elements(
     graph: cgmes.Graph,
     identifier: str,
-    already_present: list[str] | None = None,
+    already_present: Iterable[str] = (),
     depth=1000,
 ):
-    already_present = already_present or []
+    """
+    Cytoscape elements of the neighbourhood of identifier that are not in
+    already_present: its nodes, and the edges between them and the nodes
+    already present.
+    """
+    already_present = set(already_present)
     identifier = ":" + identifier
-    all = [
-        found.split(":")[1]
-        for found in set(
-            [identifier]
-            + graph.descendants(identifier, depth=depth, max_seen=max_nodes_one_way)
-            + graph.ascendants(identifier, depth=depth, max_seen=max_nodes_one_way)
-        )
-    ]
+    found = graph.neighbourhood(
+        identifier, "out", depth=depth, max_nodes=max_nodes_one_way
+    )
+    found |= graph.neighbourhood(
+        identifier, "in", depth=depth, max_nodes=max_nodes_one_way
+    )
+    all = {nid.split(":")[1] for nid in found}
     logger.info(f"found {len(all)} nodes")
     logger.info(all)
+    return _elements_of(graph, all, already_present)
 
-    all = list(set(all + already_present))
+
+def _elements_of(graph: cgmes.Graph, all: set[str], already_present: set[str]):
+    all |= already_present
 
     logger.info("getting properties...")
-    nodes = {nid: graph.properties(":" + nid) for nid in all}
+    properties = graph.properties_many([":" + nid for nid in all])
+    nodes = {nid: properties[":" + nid] for nid in all}
     logger.info("done visu")
 
-    elements = []
+    elements = ElementSet()
     for identifier, n in nodes.items():
         nodeid = identifier.split(":")[-1]
         if identifier not in already_present:
-            details = graphs.node_details(graph, n)
-            logger.debug("{}:\n n={}\ndetails={}", identifier, n, details)
-            node = {
-                "data": dict(
-                    id=nodeid,
-                    label=f"{details.name}\n[{details.type}]",
-                    description=f"{details}",
-                    type=details.type,
-                ),
-                "classes": details.type,
-            }
-            elements.append(node)
+            elements.add([node_element(graph, n)])
 
         for c in n.children:
             childid = c[1].split(":")[1]
@@ -113,25 +184,313 @@ def load_elements(
             if nodeid in already_present and childid in already_present:
                 continue
 
-            elements.append(dict(data=dict(source=nodeid, target=childid)))
+            elements.add([dict(data=dict(source=nodeid, target=childid))])
+
+    return list(elements)
+
+
+def load_aggregated(
+    graph: cgmes.Graph,
+    containment: graphs.Containment,
+    identifier: str,
+    already_present: Iterable[str] = (),
+    depth=1000,
+):
+    """
+    Like load_elements, but larger neighbourhoods are not truncated: up to
+    max_nodes_aggregated nodes are collapsed into their bays, voltage levels
+    or substations (the smallest containers that fit), shown as single nodes
+    with their number of members. As the neighbourhood spans both directions,
+    it is collapsed beyond max_nodes_both_ways nodes, the most load_elements
+    shows.
+    """
+    already_present = set(already_present)
+    root = ":" + identifier
+    found = graph.neighbourhood(
+        root, "out", depth=depth, max_nodes=max_nodes_aggregated
+    )
+    found |= graph.neighbourhood(
+        root, "in", depth=depth, max_nodes=max_nodes_aggregated
+    )
+    rdfids = list(dict.fromkeys(nid.split(":")[1] for nid in found))
+    logger.info(f"found {len(rdfids)} nodes")
+    if len(rdfids) <= max_nodes_both_ways:
+        return _elements_of(graph, set(rdfids), already_present)
+
+    kept = already_present | {identifier}
+    for level in graphs.containment.LEVELS:
+        representative = {
+            n: n if n in kept else containment.representative(n, level) for n in rdfids
+        }
+        shown = list(dict.fromkeys(representative.values()))
+        if len(shown) <= max_nodes_both_ways:
+            break
+    logger.info(f"collapsed into {len(shown)} nodes at the {level} level")
+    # the nearest ones, if even substations are too many
+    shown = shown[:max_nodes_both_ways]
+    visible = set(shown) | already_present
+    collapsed = {r for r in shown if r not in kept and containment.collapsible(r)}
+
+    properties = graph.properties_many([":" + n for n in visible.union(rdfids)])
+    elements = ElementSet()
+    for r in shown:
+        if r in already_present:
+            continue
+        node = properties[":" + r]
+        if r in collapsed:
+            elements.add([container_element(graph, node, containment.size(r))])
+        else:
+            elements.add([node_element(graph, node)])
+
+    representative |= {n: n for n in already_present}
+    for n, r in representative.items():
+        for _, child in properties[":" + n].children:
+            target = representative.get(child.split(":")[1])
+            if target is None or target == r or target not in visible:
+                continue
+            if r not in visible or (r in already_present and target in already_present):
+                continue
+            elements.add([{"data": {"source": r, "target": target}}])
+    return list(elements)
 
+
+def expand_container(
+    graph: cgmes.Graph,
+    containment: graphs.Containment,
+    container: str,
+    present: ElementSet,
+):
+    """
+    Cytoscape elements of the members of a collapsed container, as children
+    of its compound node, with their edges to the nodes already present.
+    Members that are containers themselves are collapsed.
+    """
+    members = [m for m in containment.members(container) if m not in present]
+    if len(members) > max_nodes_one_way:
+        logger.info(f"{container} has {len(members)} members, showing the first ones")
+        members = members[:max_nodes_one_way]
+    visible = present.node_ids() | set(members)
+
+    properties = graph.properties_many([":" + n for n in visible])
+    elements = ElementSet()
+    for m in members:
+        node = properties[":" + m]
+        if containment.collapsible(m):
+            element = container_element(graph, node, containment.size(m))
+        else:
+            element = node_element(graph, node)
+        element["data"]["parent"] = container
+        elements.add([element])
+
+    def shown(rdfid: str) -> str | None:
+        """rdfid, or the collapsed container showing it."""
+        for candidate in [rdfid, *containment.ancestors(rdfid)]:
+            if candidate in visible:
+                return candidate
+        return None
+
+    new = set(members)
+    for n in visible:
+        for _, child in properties[":" + n].children:
+            target = shown(child.split(":")[1])
+            if target is None or target == n or (n not in new and target not in new):
+                continue
+            elements.add([{"data": {"source": n, "target": target}}])
+    return list(elements)
+
+
+def load_electrical(
+    graph: cgmes.Graph,
+    topology: graphs.Topology,
+    identifier: str,
+    hops: int,
+    already_present: Iterable[str] = (),
+):
+    """
+    Cytoscape elements of the equipment and nodes within hops terminals of
+    identifier, linked through their terminals.
+    """
+    already_present = set(already_present)
+    found = set(topology.neighbourhood(identifier, hops, max_nodes_both_ways))
+    logger.info(f"found {len(found)} electrical nodes")
+
+    properties = graph.properties_many([":" + nid for nid in found - already_present])
+    elements = ElementSet(node_element(graph, n) for n in properties.values())
+    elements.add(
+        {"data": {"source": equipment, "target": node}}
+        for equipment, node in topology.edges(found | already_present)
+        if not (equipment in already_present and node in already_present)
+    )
+    return list(elements)
+
+
+def place(
+    layouts: graphs.Layouts,
+    elements: list[dict],
+    algorithm: str = graphs.layout.FORCE,
+    containment: graphs.Containment | None = None,
+) -> list[dict]:
+    """elements, their nodes positioned by the layout of their subgraph."""
+    nodes = [e["data"]["id"] for e in elements if "source" not in e["data"]]
+    edges = [
+        (e["data"]["source"], e["data"]["target"])
+        for e in elements
+        if "source" in e["data"]
+    ]
+    return _positioned(
+        elements, layouts.positions(nodes, edges, algorithm, containment)
+    )
+
+
+def place_around(
+    layouts: graphs.Layouts,
+    parent: str,
+    elements: list[dict],
+    present: ElementSet,
+) -> list[dict]:
+    """elements added to present, their nodes positioned around parent."""
+    fixed = {
+        n["data"]["id"]: (n["position"]["x"], n["position"]["y"])
+        for n in present.nodes()
+        if "position" in n
+    }
+    nodes = [e["data"]["id"] for e in elements if "source" not in e["data"]]
+    edges = [
+        (e["data"]["source"], e["data"]["target"])
+        for e in elements
+        if "source" in e["data"]
+    ]
+    return _positioned(elements, layouts.around(parent, nodes, edges, fixed))
+
+
+def _positioned(
+    elements: list[dict], positions: dict[str, graphs.layout.Position]
+) -> list[dict]:
+    for e in elements:
+        position = positions.get(e["data"].get("id", ""))
+        if position is not None:
+            e["position"] = {"x": round(position[0], 1), "y": round(position[1], 1)}
     return elements
 
 
-def run(cgmes_file: str):
-    graph = load_graph(cgmes_file)
+def container_element(
+    graph: cgmes.Graph, n: cgmes.explorer.CGMESNode, members: int
+) -> dict:
+    """node_element of a collapsed container, expanded on demand."""
+    element = node_element(graph, n)
+    element["data"] |= {
+        "label": f"{element['data']['label']}\n{members} elements",
+        "members": members,
+        "collapsed": True,
+    }
+    element["classes"] += " collapsed"
+    return element
+
+
+def node_element(graph: cgmes.Graph, n: cgmes.explorer.CGMESNode) -> dict:
+    details = graphs.node_details(graph, n)
+    logger.debug("{}:\n n={}\ndetails={}", n.id, n, details)
+    return {
+        "data": dict(
+            id=n.id.split(":")[-1],
+            label=f"{details.name}\n[{details.type}]",
+            type=details.type,
+        ),
+        "classes": details.type,
+    }
+
+
+def run(
+    cgmes_file: str | Sequence[str],
+    workers: int = 1,
+    cache_dir: Path | str = "cache",
+    cache_size: int | None = None,
+    max_sessions: int = MAX_SESSIONS,
+    session_ttl: float = SESSION_TTL,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    processes: int = 1,
+    debug: bool = False,
+    slow_seconds: float = SLOW_SECONDS,
+    profile_dir: Path | str | None = None,
+    store: str = "snapshot",
+    boundary: str | None = None,
+    reload_seconds: float | None = None,
+):
+    """
+    Serve the explorer of cgmes_file on host:port. The model loads in the
+    background while the app starts, except with several processes: the
+    worker processes are then forked once all the models are loaded, so that
+    they share them, and models are not reloaded. debug runs the Dash
+    development server instead.
+
+    Queries and callbacks are timed, served as Prometheus metrics on
+    /metrics, and those slower than slow_seconds are logged. profile_dir
+    receives the cProfile statistics of each callback.
+
+    store="database" keeps the model in a SQLite file queried on demand
+    instead of a memory-mapped snapshot, for models larger than memory.
+
+    cgmes_file can be several models, e.g. the IGMs of a CGM, sharing the
+    boundary set (see open_models): the first one loads right away, the others
+    when selected (all of them before forking with several processes).
+
+    With reload_seconds, a single zip file is checked that often while the app
+    is open, and reloaded in the background when it changed: only its changed
+    members are parsed, and the current model is served until then.
+    """
+    METRICS.slow = slow_seconds
+    files = [cgmes_file] if isinstance(cgmes_file, str) else list(cgmes_file)
+    models = open_models(files, boundary, workers, cache_dir, cache_size, store)
+    default = next(iter(models))
+    models[default].start()
+    if processes > 1 and not debug:
+        # workers share what is loaded before they are forked, and would each
+        # load their own copy of anything loaded after
+        for model in models.values():
+            model.start().wait()
+        if reload_seconds is not None:
+            logger.warning("models are not reloaded with several processes")
+            reload_seconds = None
     elements = []
 
+    def selected(name: str | None) -> BackgroundModel:
+        """The model of that name, started if it was not."""
+        model = models.get(name or default, models[default]).start()
+        if reload_seconds is not None:
+            model.reload_if_changed(reload_seconds)
+        return model
+
+    def loaded(model: BackgroundModel) -> cgmes.Graph:
+        """The graph of model, or no update until it is loaded."""
+        if model.graph is None:
+            raise PreventUpdate
+        return model.graph
+
     cyto.load_extra_layouts()
 
     app = dash.Dash(external_stylesheets=[dbc.themes.BOOTSTRAP])
+    layouts = graphs.Layouts()
+    callback = callbacks(app, Profiler(profile_dir) if profile_dir else None)
+    time_requests(app)
+    serve_metrics(app)
 
-    state = {
-        "loading_more": False,
-        "clicked": "",
-        "clicked_at": datetime.now(),
-        "resetId": "",
-    }
+    sessions: SessionStore | FileSessionStore
+    sessions_folder: str | None = None
+    metrics_folder: str | None = None
+    if processes > 1 and not debug:
+        sessions_folder = tempfile.mkdtemp(prefix="cgmes-sessions-")
+        sessions = FileSessionStore(sessions_folder, max_sessions, session_ttl)
+        # /metrics sums the workers, whichever of them answers
+        metrics_folder = tempfile.mkdtemp(prefix="cgmes-metrics-")
+        METRICS.share(metrics_folder)
+    else:
+        sessions = SessionStore(max_sessions=max_sessions, ttl=session_ttl)
+
+    def show(session: Session) -> tuple:
+        """Update of the graph elements and types shown to session."""
+        update = session.update_view()
+        return (dash.no_update if update is None else update), session.types()
 
     # @app.callback(Output("graph", "layout", allow_duplicate=True), Input("graph", "layout"),
     #               prevent_initial_call=True)
@@ -139,7 +498,7 @@ def run(cgmes_file: str):
     #     print(layout)
     #     return layout | { "randomize": False }
     #
-    @app.callback(
+    @callback(
         Output("hiddenTypes", "data"),
         Output("graph", "layout", allow_duplicate=True),
         Input({"type": "typeFilter", "index": ALL}, "value"),
@@ -154,16 +513,13 @@ def run(cgmes_file: str):
             layout = layout | {"randomize": False}
         return res, layout
 
-    @app.callback(
+    @callback(
         Output("typeFilterList", "children"),
-        Input("allElements", "data"),
+        Input("viewTypes", "data"),
         Input("hiddenTypes", "data"),
     )
-    def update_filters(elements, hidden_types):
+    def update_filters(types, hidden_types):
         hidden_types = hidden_types or []
-        types = sorted(
-            list(set([e["data"]["type"] for e in elements if "type" in e["data"]]))
-        )
         return [
             html.Li(
                 className="list-group-item",
@@ -184,15 +540,82 @@ def run(cgmes_file: str):
             for t in types
         ]
 
-    @app.callback(
+    @callback(
+        Output("loadingPanel", "children"),
+        Output("searchIdButton", "disabled"),
+        Output("randomButton", "disabled"),
+        Output("searchType", "disabled"),
+        Output("searchType", "options"),
+        Output("dropdownNames", "disabled"),
+        Output("electricalButton", "disabled"),
+        Output("loadingInterval", "disabled"),
+        Output("loadingInterval", "interval"),
+        Input("loadingInterval", "n_intervals"),
+        Input("modelSelect", "value"),
+    )
+    def update_loading(n_intervals, model_name):
+        model = selected(model_name)
+        graph = model.graph
+        types = dash.no_update
+        if graph is not None:
+            types = [
+                {"label": f"{t.split('#')[-1]} ({count})", "value": t}
+                for t, count in sorted(
+                    graph.elements.count_by_type().items(),
+                    key=lambda item: item[0].split("#")[-1],
+                )
+            ]
+        return (
+            progress_panel(model),
+            graph is None,
+            graph is None,
+            graph is None,
+            types,
+            not model.searchable,
+            model.topology is None,
+            # a loaded model is still polled for changes to reload
+            model.finished and reload_seconds is None,
+            1000 * reload_seconds if model.finished and reload_seconds else 500,
+        )
+
+    @callback(
+        Output("graph", "elements", allow_duplicate=True),
+        Output("viewTypes", "data", allow_duplicate=True),
+        Output("loadingInterval", "disabled", allow_duplicate=True),
+        Input("modelSelect", "value"),
+        State("sessionId", "data"),
+        prevent_initial_call=True,
+    )
+    def switch_model(model_name, session_id):
+        """Clear the exploration, which belongs to the previous model."""
+        selected(model_name)
+        with sessions.open(session_id) as session:
+            session.reset_id = ""
+            session.clicked = ""
+            return session.explore([]), session.types(), False
+
+    @callback(
         Output("output", "children"),
         Input("graph", "selectedNodeData"),
+        State("modelSelect", "value"),
         prevent_initial_call=True,
     )
-    def on_hover(data):
+    def on_hover(data, model_name):
         if data:
+            model = selected(model_name)
+            graph = loaded(model)
+            node = graph.properties(":" + data[0]["id"])
+            description = f"{graphs.node_details(graph, node)}"
+            topology = model.topology
+            if topology is not None and data[0]["id"] in topology:
+                description += (
+                    f"- connected component: {len(topology.component(data[0]['id']))}"
+                    f" equipment and nodes\n"
+                    f"- energized island: {len(topology.island(data[0]['id']))}"
+                    f" equipment and nodes\n"
+                )
             return dash.html.Pre(
-                data[0]["description"],
+                description,
                 style={
                     "backgroundColor": "white",
                     "border": 1,
@@ -203,145 +626,204 @@ def run(cgmes_file: str):
         else:
             return ""
 
-    @app.callback(
+    @callback(
         Output("resetButton", "children"),
         Output("resetButton", "disabled"),
         Input("graph", "selectedNodeData"),
+        State("sessionId", "data"),
+        prevent_initial_call=True,
+    )
+    def clickEmpty(data, session_id):
+        with sessions.open(session_id) as session:
+            if not data:
+                session.reset_id = ""
+                return "Select a node", True
+            session.reset_id = data[0]["id"]
+            return f"Reset exploration from {data[0]['label']}", False
+
+    @callback(
+        Output("dropdownNames", "options"),
+        Input("dropdownNames", "search_value"),
+        State("searchType", "value"),
+        State("modelSelect", "value"),
         prevent_initial_call=True,
     )
-    def clickEmpty(data):
-        if not data:
-            state["resetId"] = ""
-            return "Select a node", True
-        state["resetId"] = data[0]["id"]
-        return f"Reset exploration from {data[0]['label']}", False
-
-    @app.callback(
-        Output("allElements", "data"),
+    def search_names(search_value, cim_type, model_name):
+        model = selected(model_name)
+        if not search_value or not model.searchable:
+            return dash.no_update
+        graph = loaded(model)
+        return [
+            {
+                "label": f"{e.name} [{e.cim_type.split('#')[-1]}] {e.rdfid}",
+                "value": e.rdfid,
+            }
+            for e in graph.names.search(
+                search_value, limit=max_search_results, cim_type=cim_type or None
+            )
+        ]
+
+    @callback(
+        Output("graph", "elements", allow_duplicate=True),
+        Output("viewTypes", "data", allow_duplicate=True),
         Output("graph", "layout", allow_duplicate=True),
         Input("graph", "tapNode"),
         Input("resetButton", "n_clicks"),
         Input("searchIdButton", "n_clicks"),
         Input("dropdownNames", "value"),
         Input("autoLayoutButton", "n_clicks"),
+        Input("randomButton", "n_clicks"),
+        Input("electricalButton", "n_clicks"),
         State("searchId", "value"),
-        State("allElements", "data"),
-        State("graph", "layout"),
+        State("searchType", "value"),
+        State("hops", "value"),
+        State("layoutAlgorithm", "value"),
+        State("aggregate", "value"),
+        State("modelSelect", "value"),
+        State("sessionId", "data"),
         prevent_initial_call=True,
     )
     def on_click(
-        node, resetButton, searchIdButton, name, auto_layout, searchId, elements, layout
+        node,
+        resetButton,
+        searchIdButton,
+        name,
+        auto_layout,
+        random_button,
+        electrical_button,
+        searchId,
+        cim_type,
+        hops,
+        algorithm,
+        aggregate,
+        model_name,
+        session_id,
     ):
-        deterministic_layout = initial_graph_layout | {
-            "randomize": False,
-        }
-        random_layout = initial_graph_layout
-
-        if dash.callback_context.triggered[0]["prop_id"] == "autoLayoutButton.n_clicks":
-            return dash.no_update, deterministic_layout | {"updateID": datetime.now()}
-
-        if dash.callback_context.triggered[0]["prop_id"] == "resetButton.n_clicks":
-            if state["clicked"]:
-                if state["resetId"]:
-                    return load_elements(graph, state["resetId"]), random_layout
-
-        if dash.callback_context.triggered[0]["prop_id"] == "dropdownNames.value":
-            el = graph.elem_with_name(name.strip())
-            assert el
-            return load_elements(graph, el.rdfid), random_layout
-
-        if dash.callback_context.triggered[0]["prop_id"] == "searchIdButton.n_clicks":
-            return load_elements(graph, searchId.strip()), random_layout
-
-        if not node:
-            state["clicked"] = ""
-            return dash.no_update, deterministic_layout
-
-        if (
-            state["clicked"] != node["data"]["id"]
-            or (datetime.now() - state["clicked_at"]).total_seconds() > 0.30
-        ):
-            state["clicked"] = node["data"]["id"]
-            state["clicked_at"] = datetime.now()
-            return elements, deterministic_layout
-
-        if state["loading_more"]:
-            return elements, deterministic_layout
-        state["loading_more"] = True
-
-        already_present = []
-        for el in elements:
-            if "id" in el["data"]:
-                already_present.append(el["data"]["id"])
-
-        new_elements = load_elements(
-            graph, node["data"]["id"], already_present=already_present, depth=2
-        )
-        if new_elements:
-            for n in new_elements:
-                n["renderedPosition"] = node["renderedPosition"]
-            new_elements.extend(elements)
-            elements = new_elements
-        state["loading_more"] = False
+        model = selected(model_name)
+        graph = loaded(model)
+        algorithm = algorithm or graphs.layout.FORCE
+        with sessions.open(session_id) as session:
+            unchanged = dash.no_update, dash.no_update
+            trigger = dash.callback_context.triggered[0]["prop_id"]
+
+            def show_explored(elements: list[dict]) -> tuple:
+                elements = place(layouts, elements, algorithm, model.containment)
+                return session.explore(elements), session.types(), preset_layout
+
+            def explore(identifier: str):
+                if aggregate and model.containment is not None:
+                    return show_explored(
+                        load_aggregated(graph, model.containment, identifier)
+                    )
+                return show_explored(load_elements(graph, identifier))
+
+            def expand(container: dict) -> tuple:
+                """Show the members of a collapsed container inside it."""
+                assert model.containment is not None
+                rdfid = container["data"]["id"]
+                members = expand_container(
+                    graph, model.containment, rdfid, session.elements
+                )
+                container["data"]["collapsed"] = False
+                container["classes"] = container["classes"].replace(
+                    "collapsed", "expanded"
+                )
+                session.elements.add(
+                    place_around(layouts, rdfid, members, session.elements)
+                )
+                # the container becomes a compound node: the whole graph is sent
+                # again, since patches cannot change an element in place
+                return (
+                    session.explore(list(session.elements)),
+                    session.types(),
+                    dash.no_update,
+                )
+
+            if trigger == "autoLayoutButton.n_clicks":
+                if not len(session.elements):
+                    return *unchanged, dash.no_update
+                return show_explored(list(session.elements))
+
+            if trigger == "resetButton.n_clicks":
+                if session.clicked:
+                    if session.reset_id:
+                        return explore(session.reset_id)
 
-        return elements, deterministic_layout
+            if trigger == "dropdownNames.value":
+                if not name:
+                    return *unchanged, dash.no_update
+                return explore(name)
 
-    @app.callback(
-        Output("graph", "elements"),
+            if trigger == "randomButton.n_clicks":
+                found = graph.elements.sample(cim_type=cim_type or None)
+                if not found:
+                    return *unchanged, dash.no_update
+                return explore(found[0].rdfid)
+
+            if trigger == "searchIdButton.n_clicks":
+                return explore(searchId.strip())
+
+            if trigger == "electricalButton.n_clicks":
+                if not session.reset_id or model.topology is None:
+                    return *unchanged, dash.no_update
+                elements = load_electrical(
+                    graph, model.topology, session.reset_id, hops or 1
+                )
+                if not elements:
+                    return *unchanged, dash.no_update
+                return show_explored(elements)
+
+            if not node:
+                session.clicked = ""
+                return *unchanged, dash.no_update
+
+            if (
+                session.clicked != node["data"]["id"]
+                or (datetime.now() - session.clicked_at).total_seconds() > 0.30
+            ):
+                session.clicked = node["data"]["id"]
+                session.clicked_at = datetime.now()
+                return *unchanged, dash.no_update
+
+            if session.loading_more:
+                return *unchanged, dash.no_update
+            session.loading_more = True
+
+            try:
+                clicked = session.elements.get(node["data"]["id"])
+                if (
+                    clicked is not None
+                    and clicked["data"].get("collapsed")
+                    and model.containment is not None
+                ):
+                    return expand(clicked)
+                new_elements = load_elements(
+                    graph,
+                    node["data"]["id"],
+                    already_present=session.elements.node_ids(),
+                    depth=1,
+                )
+                session.elements.add(
+                    place_around(
+                        layouts, node["data"]["id"], new_elements, session.elements
+                    )
+                )
+            finally:
+                session.loading_more = False
+
+            return *show(session), dash.no_update
+
+    @callback(
+        Output("graph", "elements", allow_duplicate=True),
         Input("hiddenTypes", "data"),
-        Input("allElements", "data"),
-        State("graph", "elements"),
+        State("sessionId", "data"),
         prevent_initial_call=True,
     )
-    def hide_elements(hidden_types, all_elements, displayed_elements):
-        if not all_elements:
-            return dash.no_update
-        if hidden_types:
-            els = []
-            hidden_ids = [
-                e["data"]["id"]
-                for e in all_elements
-                if "type" in e["data"] and e["data"]["type"] in hidden_types
-            ]
-            for e in all_elements:
-                d = e["data"]
-                if "id" in d and d["id"] not in hidden_ids:
-                    els.append(e)
-                if "source" in d:
-                    if d["source"] not in hidden_ids and d["target"] not in hidden_ids:
-                        els.append(e)
-
-            all_elements = els
-
-        new_els = []
-        all_edge_ids = set(
-            (e["data"]["source"], e["data"]["target"])
-            for e in all_elements
-            if "source" in e["data"]
-        )
-        all_node_ids = set(e["data"]["id"] for e in all_elements if "id" in e["data"])
-        displayed_edge_ids = set(
-            (e["data"]["source"], e["data"]["target"])
-            for e in displayed_elements
-            if "source" in e["data"]
-        )
-        displayed_node_ids = set(
-            e["data"]["id"] for e in displayed_elements if "id" in e["data"]
-        )
-        for e in displayed_elements:
-            d = e["data"]
-            if "id" in d and d["id"] in all_node_ids:
-                new_els.append(e)
-            if "source" in d and (d["source"], d["target"]) in all_edge_ids:
-                new_els.append(e)
-        for e in all_elements:
-            d = e["data"]
-            if "id" in d and d["id"] not in displayed_node_ids:
-                new_els.append(e)
-            if "source" in d and (d["source"], d["target"]) not in displayed_edge_ids:
-                new_els.append(e)
-
-        return new_els
+    def hide_elements(hidden_types, session_id):
+        with sessions.open(session_id) as session:
+            session.hidden_types = hidden_types or []
+            update = session.update_view()
+            return dash.no_update if update is None else update
 
     img_stylesheet = [
         {
@@ -354,12 +836,8 @@ def run(cgmes_file: str):
         for t in icons.Images
     ]
 
-    initial_graph_layout = {
-        "name": "cola",
-        "edgeLength": 64,
-        "maxSimulationTime": 5000,
-        "randomize": False,
-    }
+    # positions are computed by the server, see place
+    preset_layout = {"name": "preset", "fit": True, "animate": False}
 
     # initial_graph_layout = {
     #     "animationDuration": 200,
@@ -373,7 +851,7 @@ def run(cgmes_file: str):
         id="graph",
         # layout={"name": "cose" },
         # layout={"name": "cose-bilkent", "idealEdgeLength": 96, "randomize": True},
-        layout=initial_graph_layout,
+        layout=preset_layout,
         # style={"width": "100%", "height": "1000px"},
         style={
             # "position": "absolute",
@@ -423,7 +901,27 @@ def run(cgmes_file: str):
                 },
             },
         ]
-        + img_stylesheet,
+        + img_stylesheet
+        + [
+            {
+                "selector": "node.collapsed",
+                "style": {
+                    "width": 16,
+                    "height": 16,
+                    "border-width": 3,
+                    "border-style": "double",
+                },
+            },
+            {
+                "selector": ":parent",
+                "style": {
+                    "background-opacity": 0.05,
+                    "text-valign": "top",
+                    "border-width": 1,
+                    "border-style": "dashed",
+                },
+            },
+        ],
         responsive=True,
         boxSelectionEnabled=True,
         wheelSensitivity=0.3,
@@ -433,6 +931,16 @@ def run(cgmes_file: str):
         className="overflow-auto",
         children=[
             html.H2("CGMES Explorer", className="display-8"),
+            dcc.Dropdown(
+                id="modelSelect",
+                options=list(models),
+                value=default,
+                clearable=False,
+                className="mb-3",
+                style={} if len(models) > 1 else {"display": "none"},
+            ),
+            html.Div(id="loadingPanel"),
+            dcc.Interval(id="loadingInterval", interval=500),
             html.Hr(),
             dbc.Button(
                 "Select a node",
@@ -446,13 +954,70 @@ def run(cgmes_file: str):
                     dbc.Input(
                         id="searchId", type="text", placeholder="RDFID", size="20em"
                     ),
-                    dbc.Button("Go to ID", id="searchIdButton", color="primary"),
+                    dbc.Button(
+                        "Go to ID", id="searchIdButton", color="primary", disabled=True
+                    ),
+                ],
+                className="mb-3",
+            ),
+            dbc.InputGroup(
+                [
+                    dcc.Dropdown(
+                        id="searchType",
+                        options=[],
+                        disabled=True,
+                        placeholder="All types",
+                        style={"flex": 1},
+                    ),
+                    dbc.Button(
+                        "Random", id="randomButton", color="primary", disabled=True
+                    ),
                 ],
                 className="mb-3",
             ),
             dcc.Dropdown(
                 id="dropdownNames",
-                options=list(set(e.name for e in graph.elements)),
+                options=[],
+                disabled=True,
+                placeholder="Search by name",
+                className="mb-3",
+            ),
+            dbc.InputGroup(
+                [
+                    dbc.InputGroupText("Hops"),
+                    dbc.Input(id="hops", type="number", min=1, value=2),
+                    dbc.Button(
+                        "Electrical neighbourhood",
+                        id="electricalButton",
+                        color="primary",
+                        disabled=True,
+                    ),
+                ],
+                className="mb-3",
+            ),
+            dbc.InputGroup(
+                [
+                    dbc.InputGroupText("Layout"),
+                    dcc.Dropdown(
+                        id="layoutAlgorithm",
+                        options=[
+                            {"label": "Force-directed", "value": graphs.layout.FORCE},
+                            {
+                                "label": "By substation",
+                                "value": graphs.layout.SUBSTATIONS,
+                            },
+                        ],
+                        value=graphs.layout.FORCE,
+                        clearable=False,
+                        style={"flex": 1},
+                    ),
+                ],
+                className="mb-3",
+            ),
+            dbc.Switch(
+                id="aggregate",
+                label="Group large neighbourhoods by container",
+                value=True,
                 className="mb-3",
             ),
             html.Hr(),
@@ -494,13 +1059,23 @@ def run(cgmes_file: str):
         },
     )
 
-    app.layout = html.Div(
+    # a function, so that each page load gets its own session
+    app.layout = lambda: html.Div(
         [
             sidebar,
             content,
+            dcc.Store(id="sessionId", data=new_session_id()),
             dcc.Store(id="hiddenTypes", data=[]),
-            dcc.Store("allElements", data=elements),
+            dcc.Store(id="viewTypes", data=[]),
         ]
     )
 
-    app.run(debug=True, use_reloader=False)
+    if debug:
+        app.run(debug=True, use_reloader=False, host=host, port=port)
+        return
+    try:
+        serve(app.server, host=host, port=port, processes=processes)
+    finally:
+        for folder in (sessions_folder, metrics_folder):
+            if folder is not None:
+                shutil.rmtree(folder, ignore_errors=True)
@@ -0,0 +1,95 @@
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+Key = str | tuple[str, str]
+
+
+def key(element: dict) -> Key:
+    """Node id, or (source, target) for an edge."""
+    data = element["data"]
+    if "source" in data:
+        return data["source"], data["target"]
+    return data["id"]
+
+
+@dataclass
+class Diff:
+    added: list[dict] = field(default_factory=list)
+    removed: list[Key] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed)
+
+
+class ElementSet:
+    """
+    Cytoscape elements keyed by node id and by (source, target) edge, in
+    insertion order, so that membership, insertion and diffs cost O(1) per
+    element.
+    """
+
+    def __init__(self, elements: Iterable[dict] = ()):
+        self._elements: dict[Key, dict] = {}
+        self.add(elements)
+
+    def add(self, elements: Iterable[dict]) -> list[dict]:
+        """Add elements, returning those that were not there yet."""
+        added = []
+        for element in elements:
+            k = key(element)
+            if k not in self._elements:
+                self._elements[k] = element
+                added.append(element)
+        return added
+
+    def remove(self, keys: Iterable[Key]):
+        for k in keys:
+            self._elements.pop(k, None)
+
+    def get(self, k: Key) -> dict | None:
+        return self._elements.get(k)
+
+    def __contains__(self, k: Key) -> bool:
+        return k in self._elements
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._elements.values())
+
+    def __len__(self) -> int:
+        return len(self._elements)
+
+    def keys(self) -> Iterable[Key]:
+        return self._elements.keys()
+
+    def items(self) -> Iterable[tuple[Key, dict]]:
+        return self._elements.items()
+
+    def nodes(self) -> Iterator[dict]:
+        return (e for k, e in self._elements.items() if not isinstance(k, tuple))
+
+    def node_ids(self) -> set[str]:
+        return {k for k in self._elements if not isinstance(k, tuple)}
+
+    def visible(self, hidden_types: Iterable[str]) -> "ElementSet":
+        """Elements left once nodes of hidden_types, and their edges, are hidden."""
+        hidden_types = set(hidden_types)
+        shown = {
+            k
+            for k, element in self._elements.items()
+            if not isinstance(k, tuple)
+            and element["data"].get("type") not in hidden_types
+        }
+        visible = ElementSet()
+        visible._elements = {
+            k: element
+            for k, element in self._elements.items()
+            if (k[0] in shown and k[1] in shown if isinstance(k, tuple) else k in shown)
+        }
+        return visible
+
+    def diff(self, target: "ElementSet") -> Diff:
+        """Elements to add to and remove from self to get target."""
+        return Diff(
+            added=[element for k, element in target.items() if k not in self],
+            removed=[k for k in self.keys() if k not in target],
+        )
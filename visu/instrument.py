@@ -0,0 +1,108 @@
+import cProfile
+import functools
+import pstats
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import dash
+from flask import Response, g, request
+from loguru import logger
+
+from cgmes.metrics import METRICS, timed
+
+METRICS_PATH = "/metrics"
+
+
+class Profiler:
+    """
+    cProfile statistics of each callback, accumulated over its calls in
+    folder/<callback>.prof (readable with pstats or snakeviz). Only one
+    callback is profiled at a time, since a process has a single profiler.
+    """
+
+    def __init__(self, folder: Path | str):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._stats: dict[str, pstats.Stats] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, f: Callable) -> Callable:
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            with self._lock:
+                profile = cProfile.Profile()
+                try:
+                    return profile.runcall(f, *args, **kwargs)
+                finally:
+                    self._dump(f.__name__, profile)
+
+        return wrapper
+
+    def _dump(self, name: str, profile: cProfile.Profile):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = pstats.Stats(profile)
+        else:
+            stats.add(profile)
+        path = self.folder / f"{name}.prof"
+        stats.dump_stats(path)
+        logger.debug(f"profile of {name} written to {path}")
+
+
+def callbacks(app: dash.Dash, profiler: Profiler | None = None) -> Callable:
+    """
+    Replacement of app.callback timing each callback, as "callback.<name>",
+    and profiling it with profiler if given.
+    """
+
+    def callback(*args, **kwargs):
+        def register(f: Callable) -> Callable:
+            instrumented = timed(f"callback.{f.__name__}")(f)
+            if profiler is not None:
+                instrumented = profiler(instrumented)
+            return app.callback(*args, **kwargs)(instrumented)
+
+        return register
+
+    return callback
+
+
+def time_requests(app: dash.Dash):
+    """
+    Time each HTTP request to the app, as "request <route>": unlike the
+    callbacks, this includes the JSON serialization of their outputs.
+    """
+
+    @app.server.before_request
+    def start():
+        g.request_start = time.perf_counter()
+
+    @app.server.after_request
+    def stop(response: Response) -> Response:
+        start = g.pop("request_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else "unknown"
+            METRICS.observe(
+                f"request {route}",
+                time.perf_counter() - start,
+                lambda: f"{response.status_code}, {response.content_length} bytes",
+            )
+        # visible to the other worker processes once the request is served
+        METRICS.flush()
+        return response
+
+
+def serve_metrics(app: dash.Dash, path: str = METRICS_PATH):
+    """
+    Serve the metrics in the Prometheus text format: those of the process or,
+    once METRICS is shared, of all the worker processes.
+    """
+
+    @app.server.route(path)
+    def metrics():
+        return Response(
+            METRICS.prometheus(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
@@ -0,0 +1,149 @@
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+import xml.sax
+import zipfile
+from collections.abc import Callable
+
+from loguru import logger
+
+import cgmes
+import graphs
+
+NAMES = "names"
+TOPOLOGY = "topology"
+CONTAINMENT = "containment"
+# missing or unreadable files, malformed zip, XML, snapshot or database, and
+# failed worker processes
+SOURCE_ERRORS = (
+    OSError,
+    ValueError,
+    LookupError,
+    RuntimeError,
+    zipfile.BadZipFile,
+    ET.ParseError,
+    xml.sax.SAXException,
+    sqlite3.Error,
+)
+
+
+class BackgroundModel:
+    """
+    Model loaded in a background thread, so that the app can serve pages
+    while it loads. graph is set once the index and the catalog are ready,
+    then names are indexed for search, and the electrical topology and the
+    containment hierarchy are built.
+
+    A model whose source changed can be reloaded the same way, while the
+    current graph keeps being served until the new one is complete.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[cgmes.Progress], cgmes.Graph],
+        changed: Callable[[], bool] | None = None,
+    ):
+        """
+        :param changed: whether the source changed since it was last loaded,
+        for reload_if_changed
+        """
+        self.progress = cgmes.Progress()
+        self.graph: cgmes.Graph | None = None
+        self.topology: graphs.Topology | None = None
+        self.containment: graphs.Containment | None = None
+        self.error = ""
+        # names stay searchable while the model reloads
+        self.searchable = False
+        self._load = load
+        self._changed = changed
+        self._checked = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="loader", daemon=True)
+        self._lock = threading.Lock()
+
+    def start(self) -> "BackgroundModel":
+        """Start loading, unless it already started."""
+        with self._lock:
+            if self._thread.ident is None:
+                self._thread.start()
+        return self
+
+    def wait(self):
+        self._thread.join()
+
+    def reload_if_changed(self, min_seconds: float = 0) -> bool:
+        """
+        Reload the model in the background if its source changed, checking at
+        most once every min_seconds. Whether a reload started.
+        """
+        with self._lock:
+            if (
+                self._changed is None
+                or not self.finished
+                or time.monotonic() - self._checked < min_seconds
+            ):
+                return False
+            self._checked = time.monotonic()
+            try:
+                if not self._changed():
+                    return False
+            except SOURCE_ERRORS as e:
+                # e.g. a zip file being rewritten, checked again next time
+                logger.warning(f"could not check the source of the model: {e}")
+                return False
+            logger.info("source changed, reloading the model")
+            self.progress = cgmes.Progress()
+            self._thread = threading.Thread(
+                target=self._reload, name="reloader", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run(self):
+        try:
+            graph = self._load(self.progress)
+            self._add_stages()
+            self.graph = graph
+            with self.progress.stage(NAMES):
+                graph.build_names()  # before the first search
+            self.searchable = True
+            with self.progress.stage(TOPOLOGY):
+                self.topology = graphs.Topology.build(graph)
+            with self.progress.stage(CONTAINMENT):
+                self.containment = graphs.Containment.build(graph)
+        except Exception as e:  # noqa: BLE001
+            # anything left uncaught would end the thread with neither a model
+            # nor an error, and the page would wait for it forever
+            logger.exception("loading failed")
+            self.error = _message(e)
+
+    def _reload(self):
+        try:
+            graph = self._load(self.progress)
+            self._add_stages()
+            with self.progress.stage(NAMES):
+                graph.build_names()
+            with self.progress.stage(TOPOLOGY):
+                topology = graphs.Topology.build(graph)
+            with self.progress.stage(CONTAINMENT):
+                containment = graphs.Containment.build(graph)
+            self.graph, self.topology, self.containment = graph, topology, containment
+            self.error = ""
+        except Exception as e:  # noqa: BLE001
+            logger.exception("reloading failed, keeping the current model")
+            self.error = _message(e)
+
+    def _add_stages(self):
+        self.progress.add(NAMES)
+        self.progress.add(TOPOLOGY)
+        self.progress.add(CONTAINMENT)
+
+    @property
+    def finished(self) -> bool:
+        loading = self._thread.is_alive()
+        return not loading and (self.containment is not None or bool(self.error))
+
+
+def _message(e: Exception) -> str:
+    """Error shown for e, never empty, e.g. for a MemoryError."""
+    return str(e) or type(e).__name__
@@ -0,0 +1,76 @@
+import os
+import signal
+import socket
+
+from loguru import logger
+from werkzeug.serving import make_server
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8050
+
+
+def serve(app, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, processes: int = 1):
+    """
+    Serve the WSGI app from processes worker processes, each handling requests
+    in threads. Workers are forked once app is ready, so that they share the
+    loaded model copy-on-write; dead workers are replaced until the server is
+    interrupted.
+    """
+    if processes > 1 and not hasattr(os, "fork"):
+        logger.warning("worker processes need fork, serving from a single process")
+        processes = 1
+
+    sock = socket.create_server((host, port), backlog=128)
+    logger.info(f"serving on http://{host}:{port} with {processes} process(es)")
+    if processes == 1:
+        _serve_forever(app, host, port, sock)
+        return
+
+    workers: set[int] = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                _serve_forever(app, host, port, sock)
+            finally:
+                os._exit(0)
+        workers.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(processes):
+        spawn()
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            logger.warning(f"worker {pid} exited ({status}), starting another one")
+            spawn()
+    sock.close()
+
+
+def _serve_forever(app, host: str, port: int, sock: socket.socket):
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
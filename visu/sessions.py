@@ -0,0 +1,233 @@
+import os
+import pickle
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import IO
+
+from dash import Patch
+from loguru import logger
+
+from visu.elements import ElementSet
+
+MAX_SESSIONS = 100
+SESSION_TTL = 3600
+SESSION_ID = re.compile("[0-9a-f]{32}")
+
+
+@dataclass
+class Session:
+    """Exploration state of one browser tab, kept on the server."""
+
+    elements: ElementSet = field(default_factory=ElementSet)
+    hidden_types: list[str] = field(default_factory=list)
+    # elements of the graph component, in its order
+    displayed: ElementSet = field(default_factory=ElementSet)
+    clicked: str = ""
+    clicked_at: datetime = field(default_factory=datetime.now)
+    reset_id: str = ""
+    loading_more: bool = False
+    last_seen: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k != "lock"}
+
+    def __setstate__(self, state):
+        self.__dict__ |= state
+        self.lock = threading.Lock()
+
+    def types(self) -> list[str]:
+        return sorted(
+            {n["data"]["type"] for n in self.elements.nodes() if "type" in n["data"]}
+        )
+
+    def explore(self, elements: list[dict]) -> list[dict]:
+        """Start a new exploration, returning all its visible elements."""
+        self.elements = ElementSet(elements)
+        self.displayed = self.elements.visible(self.hidden_types)
+        return list(self.displayed)
+
+    def update_view(self) -> list[dict] | Patch | None:
+        """
+        Changes bringing the graph component to the visible elements: a Patch
+        removing and appending elements, the whole list when most of it
+        changes, or None if nothing changed.
+        """
+        target = self.elements.visible(self.hidden_types)
+        diff = self.displayed.diff(target)
+        if not diff:
+            return None
+
+        removed = set(diff.removed)
+        indexes = [i for i, k in enumerate(self.displayed.keys()) if k in removed]
+        self.displayed.remove(removed)
+        self.displayed.add(diff.added)
+        if len(removed) > len(self.displayed):
+            return list(self.displayed)
+
+        patch = Patch()
+        for i in reversed(indexes):
+            del patch[i]
+        if diff.added:
+            patch.extend(diff.added)
+        return patch
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _check_id(session_id: str):
+    """
+    Reject ids that new_session_id did not make, as they come from clients.
+    """
+    if not SESSION_ID.fullmatch(session_id):
+        raise ValueError(f"invalid session id {session_id!r}")
+
+
+class SessionStore:
+    """
+    Sessions by id, in memory. The least recently used ones are dropped
+    beyond max_sessions, and any session unused for ttl seconds expires.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open(self, session_id: str) -> Iterator[Session]:
+        """Session of session_id, used by one callback at a time."""
+        session = self.get(session_id)
+        with session.lock:
+            yield session
+
+    def get(self, session_id: str) -> Session:
+        """Session of session_id, a new one if it expired or never existed."""
+        _check_id(session_id)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session()
+                while len(self._sessions) > self.max_sessions:
+                    dropped, _ = self._sessions.popitem(last=False)
+                    logger.info(f"dropping session {dropped}")
+            self._sessions.move_to_end(session_id)
+            session.last_seen = now
+            return session
+
+    def _expire(self, now: float):
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen <= self.ttl:
+                break
+            logger.info(f"session {session_id} expired")
+            del self._sessions[session_id]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class FileSessionStore:
+    """
+    Sessions pickled in folder, so that they are shared by the worker
+    processes of a server. A session file is locked while a callback uses
+    it; the least recently used files are removed beyond max_sessions, and
+    files unused for ttl seconds expire.
+    """
+
+    def __init__(
+        self,
+        folder: Path | str,
+        max_sessions: int = MAX_SESSIONS,
+        ttl: float = SESSION_TTL,
+    ):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+
+    @contextmanager
+    def open(self, session_id: str) -> Iterator[Session]:
+        _check_id(session_id)
+        self._expire()
+        with _locked(self.folder / f"{session_id}.session") as f:
+            f.seek(0)
+            data = f.read()
+            session = pickle.loads(data) if data else Session()
+            yield session
+            f.seek(0)
+            f.truncate()
+            pickle.dump(session, f)
+
+    def _expire(self):
+        now = time.time()
+        files = []
+        for path in self.folder.glob("*.session"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        files.sort()
+        for i, (mtime, path) in enumerate(files):
+            expired = now - mtime > self.ttl
+            if not expired and len(files) - i <= self.max_sessions:
+                break
+            try:
+                _remove_unused(path, now - self.ttl if expired else None)
+            except FileNotFoundError:
+                continue
+
+    def __len__(self) -> int:
+        return len(list(self.folder.glob("*.session")))
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[IO[bytes]]:
+    """
+    path opened and locked exclusively, recreated if it was removed while we
+    were waiting for the lock.
+    """
+    import fcntl  # only used with worker processes, which need a POSIX system
+
+    while True:
+        with open(path, "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            if os.fstat(f.fileno()).st_nlink > 0:
+                yield f
+                return
+
+
+def _remove_unused(path: Path, before: float | None):
+    """
+    Remove the session file path unless it is in use or, with before, saved
+    since then.
+    """
+    import fcntl
+
+    with open(path, "rb") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        if before is not None:
+            if os.fstat(f.fileno()).st_mtime > before:
+                return
+            logger.info(f"session {path.stem} expired")
+        else:
+            logger.info(f"dropping session {path.stem}")
+        path.unlink(missing_ok=True)